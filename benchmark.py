@@ -0,0 +1,227 @@
+import os
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+
+import argparse
+import asyncio
+import json
+import statistics
+import tempfile
+import time
+import tracemalloc
+
+import pygame
+
+from util.framework.globals import G
+from util.framework.utils.io import read_json, read_tjson, write_tjson
+from util.framework.utils.mapfile import write_compiled
+
+STAGES = ['frame', 'gameplay', 'tilemap', 'objects', 'compose']
+
+
+class StageTimer:
+    def __init__(self):
+        self.current = {stage: 0.0 for stage in STAGES}
+        self.frames = {stage: [] for stage in STAGES}
+
+    def wrap(self, stage, func):
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                self.current[stage] += time.perf_counter() - start
+        return timed
+
+    def end_frame(self):
+        # tilemap and object rendering run inside the gameplay update, report gameplay without them
+        self.current['gameplay'] -= self.current['tilemap'] + self.current['objects']
+        for stage in STAGES:
+            self.frames[stage].append(self.current[stage])
+            self.current[stage] = 0.0
+
+    def report(self):
+        report = {}
+        for stage, samples in self.frames.items():
+            ordered = sorted(samples)
+            report[stage] = {
+                'mean_ms': statistics.fmean(samples) * 1000,
+                'median_ms': statistics.median(samples) * 1000,
+                'p95_ms': ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))] * 1000,
+                'max_ms': ordered[-1] * 1000,
+            }
+        return report
+
+
+def load_script(path):
+    # [{"frame": 0, "down": ["d"]}, {"frame": 90, "up": ["d"], "down": ["s"]}, ...]
+    events = {}
+    for step in (read_json(path) if path else []):
+        events.setdefault(step['frame'], []).append(step)
+    return events
+
+
+def post_script_events(steps):
+    for step in steps:
+        for name in step.get('down', []):
+            pygame.event.post(pygame.event.Event(pygame.KEYDOWN, key=pygame.key.key_code(name)))
+        for name in step.get('up', []):
+            pygame.event.post(pygame.event.Event(pygame.KEYUP, key=pygame.key.key_code(name)))
+
+
+def tiled_map(path, scale):
+    # the map repeated scale x scale times, big enough that parsing dominates the load
+    data = read_tjson(path)
+    width, height = data['dimensions']
+    grid_tiles = {}
+    for copy_y in range(scale):
+        for copy_x in range(scale):
+            for loc, layers in data['grid_tiles'].items():
+                pos = (loc[0] + copy_x * width, loc[1] + copy_y * height)
+                grid_tiles[pos] = {layer: dict(tile_data, pos=pos) for layer, tile_data in layers.items()}
+    return {
+        'tile_size': data['tile_size'],
+        'grid_tiles': grid_tiles,
+        'offgrid_tiles': {'objects': {}},
+        'dimensions': (width * scale, height * scale),
+    }
+
+
+def first_view(tilemap, view):
+    # what the first frame needs, the tiles on screen and the walk grid for movement
+    tilemap.stream(view)
+    return tilemap.walkability
+
+
+def measure_load(load, view):
+    tracemalloc.start()
+    try:
+        first_view(load(), view)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+    start = time.perf_counter()
+    tilemap = load()
+    load_time = time.perf_counter() - start
+    start = time.perf_counter()
+    first_view(tilemap, view)
+    view_time = time.perf_counter() - start
+    return {
+        'load_ms': load_time * 1000,
+        'first_view_ms': view_time * 1000,
+        'peak_memory_kb': peak / 1024,
+        'live_tiles': sum(len(layers) for layers in tilemap.grid_tiles.values()),
+    }
+
+
+def run_map_load(view_size, path='data/maps/1.pmap', scale=10):
+    from util.framework.utils.tilemap import Tilemap
+
+    data = tiled_map(path, scale)
+    view = pygame.Rect(0, 0, view_size[0] + 48, view_size[1] + 48)
+    with tempfile.TemporaryDirectory() as folder:
+        pmap = os.path.join(folder, 'large.pmap')
+        pmapc = os.path.join(folder, 'large.pmapc')
+        write_tjson(pmap, data)
+        write_compiled(pmapc, data)
+
+        def load(path, **kwargs):
+            tilemap = Tilemap()
+            if path.endswith('.pmapc'):
+                tilemap.load_compiled(path, **kwargs)
+            else:
+                tilemap.load(path)
+            return tilemap
+
+        report = {
+            'scale': scale,
+            'dimensions': data['dimensions'],
+            'pmap_bytes': os.path.getsize(pmap),
+            'pmapc_bytes': os.path.getsize(pmapc),
+            'pmap': measure_load(lambda: load(pmap), view),
+            'pmapc_eager': measure_load(lambda: load(pmapc, lazy=False), view),
+            'pmapc_lazy': measure_load(lambda: load(pmapc, lazy=True), view),
+        }
+    for name in ('pmapc_eager', 'pmapc_lazy'):
+        report[name]['load_speedup'] = report['pmap']['load_ms'] / report[name]['load_ms']
+        report[name]['peak_memory_ratio'] = report['pmap']['peak_memory_kb'] / report[name]['peak_memory_kb']
+    return report
+
+
+async def run_benchmark(frames=600, dt=1 / 60, script=None, warmup=30, fixed_step=None, dirty_rects=False,
+                        map_scale=None):
+    from main import Main
+
+    game = Main(opengl=False, fps_cap=0, fixed_dt=dt, fixed_step=fixed_step, dirty_rects=dirty_rects)
+    timer = StageTimer()
+    game._update_gameplay = timer.wrap('gameplay', game._update_gameplay)
+    game.tilemap.renderz = timer.wrap('tilemap', game.tilemap.renderz)
+    game.object_collections.renderz = timer.wrap('objects', game.object_collections.renderz)
+    game.renderer.cycle = timer.wrap('compose', game.renderer.cycle)
+    G.window.cycle = timer.wrap('compose', G.window.cycle)
+
+    events = load_script(script)
+    blits = []
+    await G.im.trigger_encounter_start()
+    try:
+        for frame in range(warmup + frames):
+            post_script_events(events.get(frame - warmup, []))
+            start = time.perf_counter()
+            await game.step()
+            timer.current['frame'] = time.perf_counter() - start
+            if frame < warmup:
+                timer.current = {stage: 0.0 for stage in STAGES}
+                continue
+            timer.end_frame()
+            blits.append(game.renderer.blit_count)
+    finally:
+        await G.im.trigger_encounter_end()
+
+    report = {
+        'frames': frames,
+        'dt': dt,
+        'fixed_step': fixed_step,
+        'dirty_rects': dirty_rects,
+        'script': script,
+        'stages': timer.report(),
+        'blits_per_frame': statistics.fmean(blits) if blits else 0,
+        'player_position': [round(v, 4) for v in game.player.position],
+    }
+    if map_scale:
+        report['map_load'] = run_map_load(game.display_surface.get_size(), scale=map_scale)
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Headless benchmark of Main.game_update')
+    parser.add_argument('--frames', type=int, default=600)
+    parser.add_argument('--dt', type=float, default=1 / 60)
+    parser.add_argument('--warmup', type=int, default=30)
+    parser.add_argument('--fixed-step', type=float, default=None, help='simulate at this fixed tick rate')
+    parser.add_argument('--dirty-rects', action='store_true', help='redraw and present only changed regions')
+    parser.add_argument('--map-scale', type=int, default=None,
+                        help='also time loading data/maps/1.pmap tiled this many times per side, .pmap against .pmapc')
+    parser.add_argument('--script', default=None, help='JSON list of scripted key presses per frame')
+    parser.add_argument('--out', default=None, help='write the JSON report here instead of stdout')
+    args = parser.parse_args()
+
+    pygame.init()
+    try:
+        report = asyncio.run(run_benchmark(frames=args.frames, dt=args.dt, script=args.script, warmup=args.warmup,
+                                           fixed_step=args.fixed_step, dirty_rects=args.dirty_rects,
+                                           map_scale=args.map_scale))
+    finally:
+        pygame.quit()
+
+    output = json.dumps(report, indent=4)
+    if args.out:
+        with open(args.out, 'w') as f:
+            f.write(output)
+    else:
+        print(output)
+
+
+if __name__ == '__main__':
+    main()
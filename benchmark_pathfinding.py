@@ -0,0 +1,249 @@
+import argparse
+import json
+import statistics
+import time
+import tracemalloc
+
+import numpy as np
+
+from util.framework.utils.flowfield import FlowField
+from util.framework.utils.hierarchy import HierarchicalPathfinder
+from util.framework.utils.pathfinding import PathGrid, astar, jps, smooth_path
+
+
+class GridMap:
+    # just enough of Tilemap for the grid based navigators
+    def __init__(self, walkable, tile_size=(16, 16)):
+        self.walkability = walkable
+        self.tile_size = tile_size
+        self.dimensions = (walkable.shape[1], walkable.shape[0])
+
+        self.walk_listeners = []
+
+    def add_walk_listener(self, callback):
+        self.walk_listeners.append(callback)
+
+    def remove_walk_listener(self, callback):
+        self.walk_listeners.remove(callback)
+
+    def set_walkable(self, grid_pos, walkable):
+        self.walkability[grid_pos[1], grid_pos[0]] = walkable
+        for callback in self.walk_listeners:
+            callback(grid_pos, walkable)
+
+
+def synthetic_map(size, density=0.15, rooms=True, seed=0):
+    # scattered blockers, optionally cut by long walls with doorways so routes have to detour
+    rng = np.random.default_rng(seed)
+    walkable = rng.random((size, size)) >= density
+    if rooms:
+        spacing = max(8, size // 8)
+        for line in range(spacing, size, spacing):
+            walkable[line, :] = False
+            walkable[:, line] = False
+            for door in rng.integers(0, size, size // 4):
+                walkable[line, door] = True
+                walkable[door, line] = True
+    return walkable
+
+
+def random_queries(walkable, count, seed=0):
+    rng = np.random.default_rng(seed + 1)
+    open_cells = np.argwhere(walkable)
+    picks = open_cells[rng.integers(0, len(open_cells), (count, 2))]
+    return [((int(a[1]), int(a[0])), (int(b[1]), int(b[0]))) for a, b in picks]
+
+
+def path_cost(path):
+    return sum(1.0 if a[0] == b[0] or a[1] == b[1] else 2 ** 0.5 for a, b in zip(path, path[1:]))
+
+
+def summarize(samples):
+    ordered = sorted(samples)
+    return {
+        'mean_ms': statistics.fmean(samples) * 1000,
+        'median_ms': statistics.median(samples) * 1000,
+        'p95_ms': ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))] * 1000,
+        'max_ms': ordered[-1] * 1000,
+    }
+
+
+def run_benchmark(size=512, queries=50, density=0.15, rooms=True, seed=0, hierarchical=False, cluster_size=16):
+    walkable = synthetic_map(size, density=density, rooms=rooms, seed=seed)
+    grid = PathGrid(walkable)
+    searches = {'astar': lambda s, g, stats: astar(grid, s, g, stats=stats),
+                'jps': lambda s, g, stats: jps(grid, s, g, stats=stats)}
+
+    results = {name: {'times': [], 'expanded': [], 'costs': []} for name in searches}
+    smooth_times = []
+    for start, goal in random_queries(walkable, queries, seed=seed):
+        for name, search in searches.items():
+            stats = {}
+            t = time.perf_counter()
+            path = search(start, goal, stats)
+            results[name]['times'].append(time.perf_counter() - t)
+            results[name]['expanded'].append(stats.get('expanded', 0))
+            results[name]['costs'].append(path_cost(path) if path else None)
+            if name == 'jps' and path:
+                t = time.perf_counter()
+                smooth_path(grid, path)
+                smooth_times.append(time.perf_counter() - t)
+
+    report = {
+        'size': size,
+        'queries': queries,
+        'density': density,
+        'walkable_ratio': float(walkable.mean()),
+        'found': sum(cost is not None for cost in results['astar']['costs']),
+        'costs_match': all(a == b or (a is not None and b is not None and abs(a - b) < 1e-6)
+                           for a, b in zip(results['astar']['costs'], results['jps']['costs'])),
+    }
+    for name, result in results.items():
+        report[name] = summarize(result['times'])
+        report[name]['mean_expanded'] = statistics.fmean(result['expanded'])
+    if smooth_times:
+        report['smooth'] = summarize(smooth_times)
+    report['flowfield'] = run_flowfield(walkable, steps=min(queries, 20), seed=seed)
+    if hierarchical:
+        report['hierarchical'] = run_hierarchical(walkable, random_queries(walkable, queries, seed=seed),
+                                                  results['astar'], cluster_size=cluster_size, seed=seed)
+    return report
+
+
+def peak_memory(func):
+    tracemalloc.start()
+    try:
+        func()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def retained_memory(build):
+    tracemalloc.start()
+    try:
+        kept = build()
+        current = tracemalloc.get_traced_memory()[0]
+        del kept
+        return current
+    finally:
+        tracemalloc.stop()
+
+
+def build_graph(walkable, cluster_size):
+    hierarchy = HierarchicalPathfinder(GridMap(walkable.copy()), cluster_size=cluster_size)
+    hierarchy.precompute()
+    # cluster grids are a cache of the walk grid, the graph is what stays resident
+    hierarchy.cluster_grids.clear()
+    return hierarchy
+
+
+def run_hierarchical(walkable, queries, flat, cluster_size=16, seed=0):
+    tilemap = GridMap(walkable.copy())
+    hierarchy = HierarchicalPathfinder(tilemap, cluster_size=cluster_size)
+
+    t = time.perf_counter()
+    hierarchy.precompute()
+    precompute_time = time.perf_counter() - t
+    graph_memory = retained_memory(lambda: build_graph(walkable, cluster_size))
+
+    times = []
+    ratios = []
+    for (start, goal), flat_cost in zip(queries, flat['costs']):
+        t = time.perf_counter()
+        path = hierarchy.find_path(start, goal)
+        times.append(time.perf_counter() - t)
+        if path and flat_cost:
+            ratios.append(path_cost(path) / flat_cost)
+
+    sample = queries[:min(5, len(queries))]
+    grid = PathGrid(walkable)
+    flat_memory = max(peak_memory(lambda: astar(grid, start, goal)) for start, goal in sample)
+    query_memory = max(peak_memory(lambda: hierarchy.find_path(start, goal)) for start, goal in sample)
+
+    # one tile toggled, only that cluster's borders and the costs inside it and its neighbours are rebuilt
+    rng = np.random.default_rng(seed + 3)
+    rebuild_times = []
+    for _ in range(10):
+        x, y = (int(v) for v in rng.integers(0, walkable.shape[0], 2))
+        tilemap.set_walkable((x, y), not tilemap.walkability[y, x])
+        t = time.perf_counter()
+        hierarchy.precompute()
+        rebuild_times.append(time.perf_counter() - t)
+
+    report = hierarchy.stats()
+    report.update({
+        'cluster_size': cluster_size,
+        'precompute_ms': precompute_time * 1000,
+        'graph_memory_kb': graph_memory / 1024,
+        'flat_grid_memory_kb': len(grid.cells) / 1024,
+        'query': summarize(times),
+        'flat_astar_query': summarize(flat['times']),
+        'query_peak_memory_kb': query_memory / 1024,
+        'flat_astar_peak_memory_kb': flat_memory / 1024,
+        'mean_cost_ratio': statistics.fmean(ratios) if ratios else None,
+        'tile_change_refresh': summarize(rebuild_times),
+    })
+    return report
+
+
+def run_flowfield(walkable, steps=20, seed=0):
+    # a goal wandering cell by cell, the way a chased player drags the field along
+    rng = np.random.default_rng(seed + 2)
+    field = FlowField(GridMap(walkable))
+    open_cells = np.argwhere(walkable)
+    y, x = (int(v) for v in open_cells[len(open_cells) // 2])
+
+    full_times = []
+    incremental_times = []
+    for _ in range(steps):
+        field.dirty = True
+        t = time.perf_counter()
+        field.set_goal(((x + 0.5) * 16, (y + 0.5) * 16))
+        full_times.append(time.perf_counter() - t)
+
+        dx, dy = (int(v) for v in rng.integers(-1, 2, 2))
+        if 0 <= x + dx < walkable.shape[1] and 0 <= y + dy < walkable.shape[0] and walkable[y + dy, x + dx]:
+            x += dx
+            y += dy
+        t = time.perf_counter()
+        field.set_goal(((x + 0.5) * 16, (y + 0.5) * 16))
+        incremental_times.append(time.perf_counter() - t)
+
+    agents = open_cells[rng.integers(0, len(open_cells), 1000)][:, ::-1] * 16 + 8
+    t = time.perf_counter()
+    field.directions_at(agents)
+    lookup = time.perf_counter() - t
+
+    return {
+        'full': summarize(full_times),
+        'goal_moved': summarize(incremental_times),
+        'lookup_1000_agents_ms': lookup * 1000,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='A*, JPS, HPA* and flow fields on synthetic grid maps')
+    parser.add_argument('--size', type=int, default=512)
+    parser.add_argument('--queries', type=int, default=50)
+    parser.add_argument('--density', type=float, default=0.15, help='fraction of randomly blocked cells')
+    parser.add_argument('--no-rooms', action='store_true', help='skip the walls with doorways')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--hpa', action='store_true', help='also compare hierarchical pathfinding against flat A*')
+    parser.add_argument('--cluster-size', type=int, default=16)
+    parser.add_argument('--out', default=None, help='write the JSON report here instead of stdout')
+    args = parser.parse_args()
+
+    report = run_benchmark(size=args.size, queries=args.queries, density=args.density, rooms=not args.no_rooms,
+                           seed=args.seed, hierarchical=args.hpa, cluster_size=args.cluster_size)
+
+    output = json.dumps(report, indent=4)
+    if args.out:
+        with open(args.out, 'w') as f:
+            f.write(output)
+    else:
+        print(output)
+
+
+if __name__ == '__main__':
+    main()
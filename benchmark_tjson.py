@@ -0,0 +1,99 @@
+import argparse
+import json
+import statistics
+import time
+
+from util.framework.utils import io
+
+
+def legacy_hook(obj):
+    # the hook as it was before tuple keys were parsed with precompiled patterns
+    if type(obj) == dict:
+        for key in list(obj):
+            if (type(key) == str) and (key.translate({ord(k): None for k in ' (),t\0'}).isalnum()) and (key.find(',') != -1) and (key[:2] == 't\0'):
+                new_key = tuple(int(v) for v in key.translate({ord(k): None for k in ' ()t\0'}).split(','))
+                obj[new_key] = obj[key]
+                del obj[key]
+    return obj
+
+
+def legacy_decode(text):
+    return json.loads(text, object_hook=legacy_hook)
+
+
+def legacy_encode(data):
+    return json.dumps(io.tuple_change_keys(data, io.tuplestrkey))
+
+
+def summarize(samples):
+    ordered = sorted(samples)
+    return {
+        'mean_ms': statistics.fmean(samples) * 1000,
+        'median_ms': statistics.median(samples) * 1000,
+        'p95_ms': ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))] * 1000,
+    }
+
+
+def time_calls(func, arg, repeat):
+    samples = []
+    for _ in range(repeat):
+        t = time.perf_counter()
+        func(arg)
+        samples.append(time.perf_counter() - t)
+    return summarize(samples)
+
+
+def decode_without_orjson(text):
+    orjson = io.orjson
+    io.orjson = None
+    try:
+        return io.tjson_decode(text)
+    finally:
+        io.orjson = orjson
+
+
+def run_benchmark(path='data/maps/1.pmap', repeat=200):
+    text = io.read_f(path)
+    data = legacy_decode(text)
+
+    report = {
+        'path': path,
+        'bytes': len(text),
+        'repeat': repeat,
+        'orjson': io.orjson is not None,
+        'decode_matches': io.tjson_decode(text) == data and decode_without_orjson(text) == data,
+        'encode_matches': io.tjson_encode(data) == legacy_encode(data),
+        'round_trip_identical': io.tjson_encode(io.tjson_decode(text)) == text,
+    }
+    cases = [('legacy_decode', legacy_decode, text), ('decode', decode_without_orjson, text),
+             ('legacy_encode', legacy_encode, data), ('encode', io.tjson_encode, data)]
+    if io.orjson:
+        cases.append(('decode_orjson', io.tjson_decode, text))
+    for name, func, arg in cases:
+        report[name] = time_calls(func, arg, repeat)
+    report['decode_speedup'] = report['legacy_decode']['mean_ms'] / report['decode']['mean_ms']
+    if io.orjson:
+        report['decode_orjson_speedup'] = report['legacy_decode']['mean_ms'] / report['decode_orjson']['mean_ms']
+    report['encode_speedup'] = report['legacy_encode']['mean_ms'] / report['encode']['mean_ms']
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description='tjson decode/encode against the previous codec')
+    parser.add_argument('--path', default='data/maps/1.pmap')
+    parser.add_argument('--repeat', type=int, default=200)
+    parser.add_argument('--out', default=None, help='write the JSON report here instead of stdout')
+    args = parser.parse_args()
+
+    report = run_benchmark(path=args.path, repeat=args.repeat)
+
+    output = json.dumps(report, indent=4)
+    if args.out:
+        with open(args.out, 'w') as f:
+            f.write(output)
+    else:
+        print(output)
+
+
+if __name__ == '__main__':
+    main()
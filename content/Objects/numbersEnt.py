@@ -28,7 +28,7 @@ class NumbersEntity(Interactor, CMSEntity):
         try:
             if self.numbers and self._on_spell_use(self.numbers):
                 self.numbers.damage += 1
-                self.numbers.to_yaml()
+                self.numbers.mark_dirty()
                 print(f"Damage increased to: {self.numbers.damage}")
 
                 self._cooldown_coroutine = self.start_coroutine(self._action_with_cooldown())
@@ -9,6 +9,9 @@ from util.framework.core.object.AssetLibrary import AssetLibrary
 from util.framework.globals import G
 from util.framework.utils.yaml import auto_load_all
 from util.framework.utils.tilemap import Tilemap
+from util.framework.utils.pathfinding import Pathfinder
+from util.framework.utils.flowfield import FlowFieldManager
+from util.framework.utils.profiler import profiler
 from util.hooks import gen_hook
 
 from scripts import *
@@ -19,25 +22,29 @@ DISPLAY_SIZE = (340, 220)
 FPS_CAP = 60
 TILE_SIZE = (16, 16)
 CAMERA_SLOWNESS = 5
+INTERACTION_MANIFEST = 'data/interactions.json'
 
 
 class Main(Game):
-    def __init__(self):
+    def __init__(self, opengl=True, fps_cap=FPS_CAP, fixed_dt=None, gpu_world=False, fixed_step=None,
+                 max_catch_up=5, dirty_rects=False):
         super().__init__()
 
         data = auto_load_all()
         G.register('data', data)
 
-        self.window = self.add_component(WindowComponent, dimensions=WINDOW_SIZE, caption="Template", fps_cap=FPS_CAP,
-                                         opengl=True)
+        self.window = self.add_component(WindowComponent, dimensions=WINDOW_SIZE, caption="Template", fps_cap=fps_cap,
+                                         opengl=opengl, fixed_dt=fixed_dt, fixed_step=fixed_step,
+                                         max_catch_up=max_catch_up, dirty_rects=dirty_rects)
         self.camera = self.add_component(CameraComponent, size=DISPLAY_SIZE, pos=(0, 0), slowness=CAMERA_SLOWNESS)
-        self.renderer = self.add_component(RenderComponent)
-        self.mgl = self.add_component(MGLComponent)
+        self.renderer = self.add_component(RenderComponent, dirty_rects=dirty_rects)
+        self.dirty_rects = dirty_rects
+        self.mgl = self.add_component(MGLComponent) if opengl else None
         self.input = self.add_component(InputComponent)
         self.mouse = self.add_component(MouseComponent)
         self.assets = self.add_component(AssetsComponent, spritesheet_path="data/images/spritesheets")
 
-        self.im = InteractorManager()
+        self.im = InteractorManager(manifest_path=INTERACTION_MANIFEST)
 
         self.im.add_interactor('AssetLibrary', AssetLibrary, 'data/images/entities')
         asset_library = self.im.get_interactor('AssetLibrary')
@@ -52,15 +59,23 @@ class Main(Game):
 
         self.tilemap = Tilemap(tile_size=TILE_SIZE)
         self.tilemap.load('data/maps/1.pmap', spawn_hook=gen_hook())
+        self.pathfinder = Pathfinder(self.tilemap)
+        G.register('pathfinder', self.pathfinder)
+        self.flowfields = FlowFieldManager(self.tilemap)
+        G.register('flowfields', self.flowfields)
 
         self.background_surface = pygame.Surface(DISPLAY_SIZE, pygame.SRCALPHA)
         self.display_surface = pygame.Surface(DISPLAY_SIZE, pygame.SRCALPHA)
         self.ui_surface = pygame.Surface(DISPLAY_SIZE, pygame.SRCALPHA)
 
         self.renderer.add_surface('background', self.background_surface)
-        self.renderer.add_surface('default', self.display_surface)
+        self.renderer.add_surface('default', self.display_surface, clear_color=(255, 255, 255))
         self.renderer.add_surface('ui', self.ui_surface)
 
+        if self.mgl and gpu_world and self.mgl.enable_world_renderer(DISPLAY_SIZE, atlas=self.assets.atlas):
+            # tiles go straight to the gpu from atlas pages, baked chunks would be re-uploaded every frame
+            self.tilemap.use_chunk_cache = False
+
         self.player = PlayerEntity((100, 150))
         self.object_collections.register(self.player, 'entities')
 
@@ -79,25 +94,37 @@ class Main(Game):
             await G.im.trigger_encounter_end()
 
     async def game_update(self):
-        self.display_surface.fill((255, 255, 255))
-        self.ui_surface.fill((0, 0, 0, 0))
-        self.background_surface.fill((0, 0, 0, 0))
+        G.profiler.begin_frame()
+        if not self.dirty_rects:
+            self.display_surface.fill((255, 255, 255))
+            self.ui_surface.fill((0, 0, 0, 0))
+            self.background_surface.fill((0, 0, 0, 0))
 
         self._update_gameplay()
         pygame.display.set_caption((str(round(G.window.fps, 1))))
 
         if G.input.pressed(pygame.K_e):
             await self._handle_action()
+        if G.input.pressed(pygame.K_F3):
+            G.profiler.toggle()
 
         surface_dict = {'default': self.display_surface, 'ui': self.ui_surface, 'background': self.background_surface}
-        self.renderer.cycle(surface_dict)
+        if self.dirty_rects:
+            # the flush repaints the ui layer, so the overlay goes on after it
+            self.renderer.cycle(surface_dict)
+            self.renderer.mark_drawn('ui', G.profiler.draw_overlay(self.ui_surface))
+        else:
+            G.profiler.draw_overlay(self.ui_surface)
+            self.renderer.cycle(surface_dict)
 
         window_surfaces = {'surface': self.display_surface, 'bg_surf': self.background_surface,
                            'ui_surf': self.ui_surface}
         G.window.cycle(window_surfaces)
 
         await G.input.update()
+        G.profiler.end_frame()
 
+    @profiler.profile('main.update_gameplay')
     def _update_gameplay(self):
         self.camera.set_target(self.player)
         G.camera.update()
@@ -110,11 +137,18 @@ class Main(Game):
         )
 
         self.object_collections.update(view_area=visible_rect)
-        self.player.physics_update(self.tilemap)
+        self.flowfields.update()
+        for _ in range(G.window.consume_steps()):
+            self._fixed_update(G.window.sim_dt)
+        self.pathfinder.update()
 
         self.tilemap.renderz(visible_rect, offset=self.camera)
         self.object_collections.renderz(layer_group='game', camera_offset=self.camera)
 
+    def _fixed_update(self, fixed_dt):
+        self.player.physics_update(self.tilemap)
+        G.im.fixed_update(fixed_dt)
+
     async def _handle_action(self):
         numbers_entity = G.im.get_interactor('NumbersEntity')
         if numbers_entity:
@@ -0,0 +1,24 @@
+import os
+import sys
+
+import pytest
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+@pytest.fixture(scope='session')
+def assets():
+    # tiles look their images up in G.assets, so anything building a Tilemap needs the real spritesheets
+    import pygame
+    from util.framework.core.assets.assets import AssetsComponent
+    from util.framework.core.component import Component
+    from util.framework.globals import G
+
+    pygame.init()
+    pygame.display.set_mode((1, 1))
+    root = Component()
+    root.add_component(AssetsComponent, spritesheet_path=os.path.join(ROOT, 'data/images/spritesheets'))
+    return G.assets
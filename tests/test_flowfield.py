@@ -0,0 +1,80 @@
+import gc
+
+import numpy as np
+import pytest
+
+from benchmark_pathfinding import GridMap, random_queries, synthetic_map
+from util.framework.utils.flowfield import FlowField, FlowFieldManager
+
+
+class Target:
+    def __init__(self, center):
+        self.center = center
+
+
+def world(cell):
+    return (cell[0] * 16 + 8, cell[1] * 16 + 8)
+
+
+def assert_same_field(field, tilemap, goal):
+    fresh = FlowField(tilemap)
+    fresh.set_goal(world(goal))
+    np.testing.assert_allclose(field.distance, fresh.distance)
+    # ties between equally short neighbours may break either way, the step has to cost the same
+    np.testing.assert_allclose(downhill(field), downhill(fresh))
+    fresh.release()
+
+
+def downhill(field):
+    height, width = field.distance.shape
+    y, x = np.mgrid[:height, :width]
+    step_x = np.clip(x + np.sign(np.round(field.direction_x, 6)).astype(int), 0, width - 1)
+    step_y = np.clip(y + np.sign(np.round(field.direction_y, 6)).astype(int), 0, height - 1)
+    return field.distance[step_y, step_x]
+
+
+@pytest.mark.parametrize('seed', [0, 1, 2])
+def test_incremental_goal_moves_match_full_builds(seed):
+    tilemap = GridMap(synthetic_map(48, density=0.2, seed=seed))
+    field = FlowField(tilemap)
+    rng = np.random.default_rng(seed)
+    for start, goal in random_queries(tilemap.walkability, 20, seed=seed):
+        field.set_goal(world(start))
+        assert_same_field(field, tilemap, start)
+        field.set_goal(world(goal))
+        assert_same_field(field, tilemap, goal)
+
+        # walkability edits between moves have to fall back to a full build
+        cell = (int(rng.integers(48)), int(rng.integers(48)))
+        tilemap.set_walkable(cell, not tilemap.walkability[cell[1], cell[0]])
+    assert field.incremental_builds
+    assert field.full_builds
+    field.release()
+    assert not tilemap.walk_listeners
+
+
+def test_manager_shares_fields_and_drops_collected_targets():
+    tilemap = GridMap(synthetic_map(16, density=0.0, rooms=False))
+    manager = FlowFieldManager(tilemap)
+    target = Target(world((3, 3)))
+    field = manager.follow(target)
+    assert manager.follow(target) is field
+    assert manager.follow(Target(world((3, 3)))) is not field
+    gc.collect()
+    assert manager.stats()['fields'] == 1
+
+    target.center = world((5, 4))
+    manager.update()
+    assert field.goal == (5, 4)
+    assert manager.stats()['incremental_builds'] == 1
+
+    del target
+    gc.collect()
+    assert not manager.fields
+    assert not tilemap.walk_listeners
+
+    target = Target(world((1, 1)))
+    manager.follow(target)
+    manager.unfollow(target)
+    assert not manager.fields
+    assert not tilemap.walk_listeners
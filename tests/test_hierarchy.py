@@ -0,0 +1,81 @@
+import numpy as np
+import pytest
+
+from benchmark_pathfinding import GridMap, random_queries, synthetic_map
+from util.framework.utils.hierarchy import HierarchicalPathfinder, path_cost
+from util.framework.utils.pathfinding import PathGrid, astar
+
+
+def assert_valid(grid, path, start, goal):
+    assert path[0] == start and path[-1] == goal
+    for a, b in zip(path, path[1:]):
+        dx, dy = b[0] - a[0], b[1] - a[1]
+        assert max(abs(dx), abs(dy)) == 1
+        assert grid.walkable(b)
+        if dx and dy:
+            assert grid.walkable((a[0] + dx, a[1])) and grid.walkable((a[0], a[1] + dy))
+
+
+@pytest.mark.parametrize('cluster_size', [8, 16])
+@pytest.mark.parametrize('seed', [0, 1])
+def test_reachability_matches_astar(cluster_size, seed):
+    walkable = synthetic_map(64, density=0.3, seed=seed)
+    grid = PathGrid(walkable)
+    hierarchy = HierarchicalPathfinder(GridMap(walkable), cluster_size=cluster_size)
+    for start, goal in random_queries(walkable, 60, seed=seed):
+        expected = astar(grid, start, goal)
+        path = hierarchy.find_path(start, goal)
+        assert (path is None) == (expected is None)
+        if path:
+            assert_valid(grid, path, start, goal)
+            assert path_cost(path) >= path_cost(expected) - 1e-9
+
+
+def walled_map(assets):
+    from util.framework.utils.tilemap import Tile, Tilemap
+
+    # four 8x8 clusters in a row, the second one split inside by a wall with a gap at (11, 4)
+    # and closed off on its right border by another with a gap at (15, 2)
+    tilemap = Tilemap(dimensions=(32, 8))
+    for x in range(32):
+        for y in range(8):
+            if (x, y) in ((11, 4), (15, 2)) or x not in (11, 15):
+                tilemap.insert(Tile('walk_zone', pos=(x, y), layer=0))
+    return tilemap
+
+
+def test_dirty_cluster_rebuilt_after_grid_delete_and_insert(assets):
+    from util.framework.utils.tilemap import Tile
+
+    tilemap = walled_map(assets)
+    hierarchy = HierarchicalPathfinder(tilemap, cluster_size=8)
+    hierarchy.precompute()
+    far = hierarchy.intra[(3, 0)]
+
+    def route(through):
+        path = hierarchy.find_path((1, 1), (30, 6))
+        assert path is not None and through in path
+        assert_valid(PathGrid(tilemap.walkability), path, (1, 1), (30, 6))
+        assert not hierarchy.dirty
+
+    route((15, 2))
+    tilemap.grid_delete((15, 2), layer=0)
+    assert hierarchy.dirty == {(1, 0)}
+    assert hierarchy.find_path((1, 1), (30, 6)) is None
+    assert astar(PathGrid(tilemap.walkability), (1, 1), (30, 6)) is None
+    assert hierarchy.rebuilds == 1
+    # only the changed cluster and its neighbours lose their edges
+    assert hierarchy.intra.get((3, 0)) is far
+
+    # a gap where the border had none needs a new transition
+    tilemap.insert(Tile('walk_zone', pos=(15, 6), layer=0))
+    route((15, 6))
+    assert hierarchy.rebuilds == 2
+
+    # closing and reopening the inner wall needs fresh costs inside the cluster
+    tilemap.grid_delete((11, 4), layer=0)
+    assert hierarchy.find_path((1, 1), (30, 6)) is None
+    tilemap.insert(Tile('walk_zone', pos=(11, 4), layer=0))
+    route((11, 4))
+    assert hierarchy.rebuilds == 4
+    hierarchy.release()
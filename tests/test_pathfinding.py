@@ -0,0 +1,104 @@
+import numpy as np
+import pytest
+
+from benchmark_pathfinding import GridMap, path_cost, random_queries, synthetic_map
+from util.framework.utils.pathfinding import PathGrid, Pathfinder, astar, jps, line_cells, smooth_path
+
+
+def assert_valid(grid, path, start, goal):
+    assert path[0] == start and path[-1] == goal
+    for a, b in zip(path, path[1:]):
+        dx, dy = b[0] - a[0], b[1] - a[1]
+        assert max(abs(dx), abs(dy)) == 1
+        assert grid.walkable(b)
+        if dx and dy:
+            # both cells beside a diagonal step have to be open
+            assert grid.walkable((a[0] + dx, a[1])) and grid.walkable((a[0], a[1] + dy))
+
+
+@pytest.mark.parametrize('seed', [0, 1, 2])
+@pytest.mark.parametrize('rooms', [True, False])
+def test_jps_costs_match_astar(seed, rooms):
+    walkable = synthetic_map(64, density=0.25, rooms=rooms, seed=seed)
+    grid = PathGrid(walkable)
+    for start, goal in random_queries(walkable, 40, seed=seed):
+        expected = astar(grid, start, goal)
+        path = jps(grid, start, goal)
+        if expected is None:
+            assert path is None
+            continue
+        assert_valid(grid, expected, start, goal)
+        assert_valid(grid, path, start, goal)
+        assert path_cost(path) == pytest.approx(path_cost(expected))
+
+
+def test_no_corner_cutting():
+    # the only diagonal between the two open cells squeezes past two blocked corners
+    walkable = np.array([
+        [1, 0, 1],
+        [0, 1, 0],
+        [1, 0, 1],
+    ], dtype=bool)
+    grid = PathGrid(walkable)
+    for search in (astar, jps):
+        assert search(grid, (0, 0), (1, 1)) is None
+        assert search(grid, (0, 0), (2, 2)) is None
+
+    walkable = synthetic_map(48, density=0.35, rooms=False, seed=5)
+    grid = PathGrid(walkable)
+    for start, goal in random_queries(walkable, 40, seed=5):
+        for search in (astar, jps):
+            path = search(grid, start, goal)
+            if path:
+                assert_valid(grid, path, start, goal)
+                # smoothing may only skip cells it can see across, corners included
+                smoothed = smooth_path(grid, path)
+                for a, b in zip(smoothed, smoothed[1:]):
+                    assert all(grid.walkable(cell) for cell in line_cells(a, b))
+
+
+def corridor():
+    walkable = np.zeros((5, 9), dtype=bool)
+    walkable[1, 1:8] = True
+    walkable[3, 1:8] = True
+    walkable[1:4, 1] = True
+    walkable[1:4, 7] = True
+    return GridMap(walkable)
+
+
+def test_pathfinder_cache_drops_paths_through_closed_cells():
+    tilemap = corridor()
+    finder = Pathfinder(tilemap, smooth=False)
+    path = finder.find_path((2, 1), (6, 1))
+    assert path == [(x, 1) for x in range(2, 7)]
+    assert finder.find_path((2, 1), (6, 1)) is path
+    assert finder.cache_hits == 1
+
+    # a cell off the route leaves the entry alone
+    tilemap.set_walkable((4, 3), False)
+    assert finder.find_path((2, 1), (6, 1)) is path
+    assert finder.searches == 1
+
+    tilemap.set_walkable((4, 1), False)
+    assert ((2, 1), (6, 1)) not in finder.cache
+    assert finder.find_path((2, 1), (6, 1)) is None
+    assert finder.searches == 2
+    finder.release()
+
+
+def test_pathfinder_cache_retries_failed_searches_when_a_cell_opens():
+    tilemap = corridor()
+    tilemap.set_walkable((4, 1), False)
+    tilemap.set_walkable((4, 3), False)
+    finder = Pathfinder(tilemap, smooth=False)
+    assert finder.find_path((2, 1), (6, 1)) is None
+    assert finder.find_path((2, 1), (6, 1)) is None
+    assert finder.searches == 1
+
+    tilemap.set_walkable((4, 3), True)
+    path = finder.find_path((2, 1), (6, 1))
+    assert finder.searches == 2
+    assert (4, 3) in path
+    assert_valid(finder.path_grid, path, (2, 1), (6, 1))
+    finder.release()
+    assert not tilemap.walk_listeners
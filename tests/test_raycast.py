@@ -0,0 +1,86 @@
+import math
+
+import numpy as np
+import pytest
+
+from util.framework.utils.raycast import RAY_BLOCKING, RAY_SOLID, SolidGrid, VisibilityCache, raycast, raycast_many
+
+TILE_SIZE = (16, 16)
+
+
+def random_grid(seed, size=24, density=0.2):
+    rng = np.random.default_rng(seed)
+    grid = SolidGrid(size, size)
+    blocked = rng.random((size, size)) < density
+    for y, x in np.argwhere(blocked):
+        grid.set((int(x), int(y)), RAY_BLOCKING if (x + y) % 3 else RAY_BLOCKING | RAY_SOLID)
+    return grid, blocked
+
+
+@pytest.mark.parametrize('seed', [0, 1, 2])
+def test_raycast_many_matches_raycast(seed):
+    grid, _ = random_grid(seed)
+    rng = np.random.default_rng(seed + 10)
+    count = 300
+    origins = rng.uniform(-20, 24 * 16 + 20, (count, 2))
+    directions = rng.uniform(-1, 1, (count, 2))
+    # axis aligned, exact diagonal and zero length rays take the special cases
+    directions[:20, 1] = 0
+    directions[20:40, 0] = 0
+    directions[40:60] = [1, -1]
+    directions[60:65] = 0
+    max_dist = rng.uniform(0, 300, count)
+
+    for mask in (RAY_BLOCKING, RAY_SOLID):
+        distances, cells, normals, points = raycast_many(grid, TILE_SIZE, origins, directions, max_dist, mask=mask)
+        for i in range(count):
+            hit = raycast(grid, TILE_SIZE, origins[i], directions[i], max_dist[i], mask=mask)
+            if hit is None:
+                assert math.isinf(distances[i])
+                continue
+            assert distances[i] == pytest.approx(hit.distance)
+            assert tuple(cells[i]) == hit.cell
+            assert tuple(normals[i]) == hit.normal
+            assert tuple(points[i]) == pytest.approx(hit.point)
+
+
+@pytest.mark.parametrize('seed', [0, 1, 2])
+def test_shadowcast_is_symmetric(seed):
+    grid, blocked = random_grid(seed)
+    cache = VisibilityCache(capacity=1024)
+    open_cells = [(int(x), int(y)) for y, x in np.argwhere(~blocked)]
+    seen = {cell: cache.get(grid, cell, 8) for cell in open_cells}
+    for a in open_cells:
+        for b in seen[a]:
+            if b in seen:
+                assert a in seen[b], (a, b)
+
+
+def test_shadowcast_open_field_is_a_disc():
+    grid = SolidGrid(30, 30)
+    for origin in ((15, 15), (0, 0), (29, 4)):
+        expected = {(x, y) for x in range(30) for y in range(30)
+                    if (x - origin[0]) ** 2 + (y - origin[1]) ** 2 <= 64}
+        assert VisibilityCache().get(grid, origin, 8) == expected
+
+
+def test_visibility_cache_follows_grid_version():
+    grid = SolidGrid(16, 16)
+    cache = VisibilityCache()
+    before = cache.get(grid, (2, 8), 10)
+    assert (12, 8) in before
+    assert cache.get(grid, (2, 8), 10) is before
+    assert (cache.hits, cache.misses) == (1, 1)
+
+    # writing the flags a cell already has is not a change
+    grid.set((6, 8), 0)
+    assert cache.get(grid, (2, 8), 10) is before
+
+    grid.set((6, 8), RAY_BLOCKING)
+    after = cache.get(grid, (2, 8), 10)
+    assert cache.misses == 2
+    assert (6, 8) in after and (12, 8) not in after
+
+    grid.set((6, 8), 0)
+    assert cache.get(grid, (2, 8), 10) == before
+    assert cache.misses == 3
@@ -0,0 +1,104 @@
+import numpy as np
+import pygame
+import pytest
+
+moderngl = pytest.importorskip('moderngl')
+
+from util.framework.components.mgl import MGLComponent
+from util.framework.utils.atlas import TextureAtlas
+
+SIZE = (96, 64)
+
+
+@pytest.fixture(scope='module')
+def mgl():
+    pygame.init()
+    try:
+        ctx = moderngl.create_standalone_context(backend='egl')
+    except Exception as e:
+        pytest.skip(f"no standalone gl context: {e}")
+    component = MGLComponent(ctx=ctx)
+    yield component
+    ctx.release()
+
+
+def random_sprites(rng, count):
+    sprites = []
+    for i in range(count):
+        w, h = (int(v) for v in rng.integers(1, 24, 2))
+        pixels = rng.integers(0, 256, (w, h, 4), dtype=np.uint8)
+        if i % 4 == 3:
+            surf = pygame.Surface((w, h))
+            pygame.surfarray.pixels3d(surf)[:] = pixels[..., :3]
+        else:
+            surf = pygame.Surface((w, h), pygame.SRCALPHA)
+            pygame.surfarray.pixels3d(surf)[:] = pixels[..., :3]
+            pygame.surfarray.pixels_alpha(surf)[:] = pixels[..., 3] if i % 2 else 255
+        if i % 3 == 0:
+            surf.set_alpha(int(rng.integers(0, 256)))
+        sprites.append((surf, (int(rng.integers(-8, SIZE[0])), int(rng.integers(-8, SIZE[1])))))
+    return sprites
+
+
+def compare(world, sprites, clear_color):
+    world.clear_color = clear_color
+    cpu = pygame.Surface(SIZE, pygame.SRCALPHA)
+    cpu.fill(clear_color)
+    for surf, pos in sprites:
+        cpu.blit(surf, pos)
+
+    world.draw('default', pygame.Surface(SIZE), [(0, i, surf, pos, 0) for i, (surf, pos) in enumerate(sprites)])
+    gpu = world.read('default')
+    assert np.array_equal(pygame.surfarray.array3d(gpu), pygame.surfarray.array3d(cpu))
+    assert np.array_equal(pygame.surfarray.array_alpha(gpu), pygame.surfarray.array_alpha(cpu))
+
+
+@pytest.mark.parametrize('clear_color', [(255, 255, 255, 255), (40, 90, 160, 255), (0, 0, 0, 0), (30, 60, 90, 120)])
+def test_matches_cpu_blits(mgl, clear_color):
+    world = mgl.enable_world_renderer(SIZE)
+    compare(world, random_sprites(np.random.default_rng(7), 150), clear_color)
+
+
+def test_matches_cpu_blits_from_atlas(mgl):
+    atlas = TextureAtlas(page_size=(128, 128))
+    sprites = [(atlas.view(i, surf), pos) if surf.get_flags() & pygame.SRCALPHA else (surf, pos)
+               for i, (surf, pos) in enumerate(random_sprites(np.random.default_rng(3), 60))]
+    world = mgl.enable_world_renderer(SIZE, atlas=atlas)
+    compare(world, sprites, (0, 0, 0, 0))
+
+
+def test_opaque_sprites_share_a_draw_call(mgl):
+    world = mgl.enable_world_renderer(SIZE)
+    tile = pygame.Surface((16, 16), pygame.SRCALPHA)
+    tile.fill((30, 200, 60, 255))
+    queue = [(0, i, tile, (i * 5 % 90, i * 3 % 60), 0) for i in range(40)]
+    world.draw('default', pygame.Surface(SIZE), queue)
+    assert world.draw_calls == 1
+
+    shadow = pygame.Surface((16, 16), pygame.SRCALPHA)
+    shadow.fill((0, 0, 0, 100))
+    world.begin_frame()
+    world.draw('default', pygame.Surface(SIZE), queue + [(1, 40, shadow, (0, 0), 0), (1, 41, shadow, (8, 8), 0)])
+    assert world.draw_calls == 3
+
+
+def test_static_sprites_upload_once(mgl):
+    world = mgl.enable_world_renderer(SIZE)
+    sprite = pygame.Surface((8, 8), pygame.SRCALPHA)
+    sprite.fill((200, 40, 40, 255))
+    queue = [(0, 0, sprite, (4, 4), 0)]
+
+    world.begin_frame()
+    world.draw('default', pygame.Surface(SIZE), queue)
+    assert world.uploads == 1
+    for _ in range(3):
+        world.begin_frame()
+        world.draw('default', pygame.Surface(SIZE), queue)
+        assert world.uploads == 0
+
+    sprite.fill((40, 40, 200, 255))
+    world.mark_dirty(sprite)
+    world.begin_frame()
+    world.draw('default', pygame.Surface(SIZE), queue)
+    assert world.uploads == 1
+    assert world.read('default').get_at((6, 6)) == (40, 40, 200, 255)
@@ -16,10 +16,20 @@ class EntityComponentDefinition:
             setattr(self, key, value)
 
 
+def component_types(component_class: Type[EntityComponentDefinition]) -> List[Type[EntityComponentDefinition]]:
+    return [c for c in component_class.__mro__ if issubclass(c, EntityComponentDefinition)]
+
+
 class CMSEntity:
     def __init__(self, entity_id: str = None):
         self.id = entity_id or self.__class__.__name__
         self.cms_components: List[EntityComponentDefinition] = []
+        self._components_by_type: Dict[Type, EntityComponentDefinition] = {}
+        self._cms_table: Optional['CMSTable'] = None
+
+    @property
+    def archetype(self) -> frozenset:
+        return frozenset(type(component) for component in self.cms_components)
 
     def define(self, component_class: Type[T], **kwargs) -> T:
         existing = self.get(component_class)
@@ -28,6 +38,11 @@ class CMSEntity:
 
         component = component_class(**kwargs)
         self.cms_components.append(component)
+        for component_type in component_types(component_class):
+            self._components_by_type.setdefault(component_type, component)
+
+        if self._cms_table is not None:
+            self._cms_table.reindex(self)
         return component
 
     def is_a(self, component_class: Type[T], out_component: List[T] = None) -> bool:
@@ -37,6 +52,11 @@ class CMSEntity:
         return component is not None
 
     def get(self, component_class: Type[T]) -> Optional[T]:
+        component = self._components_by_type.get(component_class)
+        if component is not None:
+            return component
+
+        # mixins that are not EntityComponentDefinitions are not in the index
         for component in self.cms_components:
             if isinstance(component, component_class):
                 return component
@@ -80,12 +100,73 @@ class CMSTable(Generic[E]):
         self.entities: List[E] = []
         self.entity_map: Dict[str, E] = {}
 
+        # component type (and its bases) -> {id(entity): entity}, in registration order
+        self.type_index: Dict[Type, Dict[int, E]] = {}
+        # exact component set -> {id(entity): entity}
+        self.archetypes: Dict[frozenset, Dict[int, E]] = {}
+        self.entity_archetypes: Dict[int, frozenset] = {}
+        self.versions: Dict[Type, int] = {}
+        self.query_cache: Dict[Tuple[Type, ...], Tuple[Tuple[int, ...], List[tuple]]] = {}
+
     def add(self, entity: E) -> None:
         if not entity.id:
             entity.id = entity.__class__.__name__
 
         self.entities.append(entity)
         self.entity_map[entity.id] = entity
+        entity._cms_table = self
+        self.reindex(entity)
+
+    def _touch(self, archetype: frozenset) -> None:
+        for component_class in archetype:
+            for component_type in component_types(component_class):
+                self.versions[component_type] = self.versions.get(component_type, 0) + 1
+
+    def reindex(self, entity: E) -> None:
+        key = id(entity)
+        old = self.entity_archetypes.get(key, frozenset())
+        new = entity.archetype
+        if old == new:
+            return
+
+        if old:
+            bucket = self.archetypes[old]
+            del bucket[key]
+            if not bucket:
+                del self.archetypes[old]
+        if new:
+            if new not in self.archetypes:
+                self.archetypes[new] = {}
+            self.archetypes[new][key] = entity
+        self.entity_archetypes[key] = new
+
+        for component_class in new - old:
+            for component_type in component_types(component_class):
+                if component_type not in self.type_index:
+                    self.type_index[component_type] = {}
+                self.type_index[component_type][key] = entity
+
+        self._touch(old ^ new)
+
+    def with_component(self, component_class: Type) -> List[E]:
+        return list(self.type_index.get(component_class, {}).values())
+
+    def query(self, *component_classes: Type) -> List[tuple]:
+        versions = tuple(self.versions.get(c, 0) for c in component_classes)
+        cached = self.query_cache.get(component_classes)
+        if cached and cached[0] == versions:
+            return cached[1]
+
+        result = []
+        if component_classes:
+            buckets = [self.type_index.get(c, {}) for c in component_classes]
+            smallest = min(buckets, key=len)
+            for key, entity in smallest.items():
+                if all(key in bucket for bucket in buckets):
+                    result.append((entity, *(entity.get(c) for c in component_classes)))
+
+        self.query_cache[component_classes] = (versions, result)
+        return result
 
     def get_all(self) -> List[E]:
         return self.entities
@@ -200,13 +281,21 @@ class CMS:
         if not cls._initialized:
             cls.init()
 
-        result = []
-        for entity in cls._entities.get_all():
-            component = entity.get(component_class)
-            if component:
-                result.append((entity, component))
+        return list(cls._entities.query(component_class))
 
-        return result
+    @classmethod
+    def query(cls, *component_classes: Type[EntityComponentDefinition]) -> List[tuple]:
+        if not cls._initialized:
+            cls.init()
+
+        return cls._entities.query(*component_classes)
+
+    @classmethod
+    def archetypes(cls) -> Dict[frozenset, List[CMSEntity]]:
+        if not cls._initialized:
+            cls.init()
+
+        return {archetype: list(bucket.values()) for archetype, bucket in cls._entities.archetypes.items()}
 
     @classmethod
     def find_component_class(cls, class_name: str) -> Optional[Type[EntityComponentDefinition]]:
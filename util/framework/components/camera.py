@@ -17,8 +17,9 @@ class CameraComponent(Component):
 
     @property
     def target(self):
-        return (self.target_entity.center[0] - self.size[0] // 2,
-                self.target_entity.center[1] - self.size[1] // 2)
+        center = getattr(self.target_entity, 'render_center', None) or self.target_entity.center
+        return (center[0] - self.size[0] // 2,
+                center[1] - self.size[1] // 2)
 
     def set_target(self, target):
         self.target_entity = target
@@ -2,6 +2,7 @@ import asyncio
 import pygame
 from util.framework.globals import G
 from util.framework.core.component import Component
+from util.framework.core.scheduler import FrameScheduler
 
 
 class Game(Component):
@@ -11,13 +12,21 @@ class Game(Component):
 
         G.initialize()
         G.register('game', self)
+        self.scheduler = FrameScheduler()
+        G.register('scheduler', self.scheduler)
         self.e = G
 
     async def run(self):
         running = True
         while running and self.active:
-            await self.game_update()
-            await asyncio.sleep(0.001)
+            await self.step()
+
+    async def step(self):
+        await self.game_update()
+        window = getattr(G, 'window', None)
+        self.scheduler.tick(window.dt if window else 0)
+        # a single yield lets every coroutine the scheduler woke this frame run
+        await asyncio.sleep(0)
 
     async def game_update(self):
         pass
\ No newline at end of file
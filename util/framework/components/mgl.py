@@ -1,5 +1,7 @@
 from array import array
+import weakref
 import moderngl
+import numpy as np
 import pygame
 from util.framework.globals import G
 from util.framework.core.component import Component
@@ -26,6 +28,347 @@ void main() {
 }
 '''
 
+world_vert_shader = '''
+#version 330
+uniform vec2 target_size;
+in vec2 corner;
+in vec4 dest;
+in vec2 src;
+in vec2 blend;
+flat out vec2 dest_origin;
+flat out vec2 src_origin;
+flat out ivec2 sprite_blend;
+void main() {
+  dest_origin = dest.xy;
+  src_origin = src;
+  sprite_blend = ivec2(blend);
+  // row 0 of the target stays row 0 of the texture, like an uploaded pygame surface
+  gl_Position = vec4((dest.xy + corner * dest.zw) / target_size * 2.0 - 1.0, 0.0, 1.0);
+}
+'''
+
+# SDL's integer blits, evaluated per pixel against a snapshot of the target so the result is byte for byte
+# what Surface.blit produces: per-pixel alpha uses dC + (((sC - dC) * sA + sC) >> 8) with sA scaled by the
+# surface alpha, an opaque surface with set_alpha uses dC + (((sC - dC) * alpha) >> 8) and comes out opaque
+world_frag_shader = '''
+#version 330
+uniform sampler2D page;
+uniform sampler2D snapshot;
+flat in vec2 dest_origin;
+flat in vec2 src_origin;
+flat in ivec2 sprite_blend;
+out vec4 f_color;
+void main() {
+  ivec4 s = ivec4(round(texelFetch(page, ivec2(src_origin + floor(gl_FragCoord.xy - dest_origin)), 0) * 255.0));
+  ivec4 d = ivec4(round(texelFetch(snapshot, ivec2(gl_FragCoord.xy), 0) * 255.0));
+  int alpha = sprite_blend.x;
+  ivec4 color;
+  if (sprite_blend.y == 1) {
+    int a = s.a * alpha / 255;
+    if (d.a == 0) {
+      color = ivec4(s.rgb, a);
+    } else {
+      color = ivec4(d.rgb + (((s.rgb - d.rgb) * a + s.rgb) >> 8), a + d.a - a * d.a / 255);
+    }
+  } else if (alpha == 255) {
+    color = ivec4(s.rgb, 255);
+  } else {
+    color = ivec4(d.rgb + (((s.rgb - d.rgb) * alpha) >> 8), 255);
+  }
+  f_color = vec4(color) / 255.0;
+}
+'''
+
+INSTANCE_FIELDS = 8
+
+
+class TexturePool:
+    def __init__(self, mgl_component, double_buffer=False):
+        self.mgl = mgl_component
+        self.double_buffer = double_buffer
+        # id(surface) -> [surface weakref, size, textures, active index]
+        self.entries = {}
+        self.allocations = 0
+        self.uploads = 0
+
+    def _allocate(self, surface):
+        textures = []
+        for _ in range(2 if self.double_buffer else 1):
+            tex = self.mgl.pg2tx(surface)
+            if tex is None:
+                self._release_textures(textures)
+                return None
+            textures.append(tex)
+            self.allocations += 1
+            self.uploads += 1
+
+        entry = [weakref.ref(surface), surface.get_size(), textures, 0]
+        self.entries[id(surface)] = entry
+        return textures[0]
+
+    def _release_textures(self, textures):
+        for tex in textures:
+            try:
+                if not tex.mglo.released:
+                    tex.release()
+            except AttributeError:
+                pass
+
+    def get(self, surface):
+        entry = self.entries.get(id(surface))
+        if entry is not None and (entry[0]() is not surface or entry[1] != surface.get_size()):
+            self.release(surface)
+            entry = None
+
+        if entry is None:
+            return self._allocate(surface)
+
+        # with two textures the upload goes to the one the previous frame did not sample
+        entry[3] = (entry[3] + 1) % len(entry[2])
+        tex = self.mgl.pg2tx_update(entry[2][entry[3]], surface)
+        if tex is None:
+            self.release(surface)
+            return self._allocate(surface)
+        self.uploads += 1
+        return tex
+
+    def release(self, surface):
+        entry = self.entries.pop(id(surface), None)
+        if entry is not None:
+            self._release_textures(entry[2])
+
+    def prune(self):
+        for surface_id, entry in list(self.entries.items()):
+            if entry[0]() is None:
+                self._release_textures(entry[2])
+                del self.entries[surface_id]
+
+    def clear(self):
+        for entry in self.entries.values():
+            self._release_textures(entry[2])
+        self.entries = {}
+
+    def reset_counters(self):
+        self.allocations = 0
+        self.uploads = 0
+
+
+class WorldRenderer:
+    def __init__(self, mgl_component, size, atlas=None, groups=('default',), clear_color=(255, 255, 255, 255)):
+        self.mgl = mgl_component
+        self.ctx = mgl_component.ctx
+        self.size = tuple(size)
+        self.atlas = atlas
+        self.groups = set(groups)
+        self.clear_color = clear_color
+        self.active = True
+
+        self.program = self.ctx.program(vertex_shader=world_vert_shader, fragment_shader=world_frag_shader)
+        self.program['target_size'].value = self.size
+        self.corners = self.ctx.buffer(data=array('f', [0.0, 0.0, 1.0, 0.0, 0.0, 1.0, 1.0, 1.0]))
+        self.capacity = 256
+        self.instances = self.ctx.buffer(reserve=self.capacity * INSTANCE_FIELDS * 4, dynamic=True)
+        self.vao = self.ctx.vertex_array(self.program, [
+            (self.corners, '2f', 'corner'),
+            (self.instances, '4f 2f 2f/i', 'dest', 'src', 'blend'),
+        ])
+        self.snapshot = self.ctx.texture(self.size, 4)
+        self.snapshot.filter = (moderngl.NEAREST, moderngl.NEAREST)
+        # the run that last drew each pixel, a run being the sprites drawn since the last snapshot
+        self.runs = np.zeros(self.size[::-1], dtype=np.int64)
+        self.run = 0
+
+        self.targets = {}
+        self.drawn = {}
+        self.pages = {}
+        # id(surface) -> [surface weakref, size, texture, opaque, version] for sprites that are not atlas views
+        self.loose = {}
+        self.versions = {}
+        # (page, x, y) -> whether every pixel of that atlas region has full alpha
+        self.opaque_regions = {}
+
+        self.draw_calls = 0
+        self.sprites = 0
+        self.uploads = 0
+
+    def target(self, group):
+        if group not in self.targets:
+            texture = self.ctx.texture(self.size, 4)
+            texture.filter = (moderngl.NEAREST, moderngl.NEAREST)
+            self.targets[group] = (texture, self.ctx.framebuffer(color_attachments=[texture]))
+        return self.targets[group]
+
+    def handles(self, group, queue):
+        if not self.active or group not in self.groups:
+            return False
+        # blend modes and colorkeys only exist on the cpu path
+        for entry in queue:
+            if entry[4] or entry[2].get_colorkey() is not None:
+                return False
+        return True
+
+    def upload(self, surface, texture=None):
+        data = pygame.image.tobytes(surface, 'RGBA')
+        self.uploads += 1
+        if texture is not None and texture.size == surface.get_size():
+            texture.write(data)
+            return texture
+        if texture is not None:
+            texture.release()
+        texture = self.ctx.texture(surface.get_size(), 4, data)
+        texture.filter = (moderngl.NEAREST, moderngl.NEAREST)
+        return texture
+
+    def page_texture(self, index):
+        page = self.atlas.pages[index]
+        entry = self.pages.get(index)
+        if entry is None or entry[1] != page.version:
+            entry = (self.upload(page.surface, entry[0] if entry else None), page.version)
+            self.pages[index] = entry
+        return entry[0]
+
+    def loose_texture(self, surface):
+        entry = self.loose.get(id(surface))
+        if entry is not None and entry[0]() is not surface:
+            entry[2].release()
+            entry = None
+        if entry is None:
+            entry = [weakref.ref(surface), None, None, False, None]
+            self.loose[id(surface)] = entry
+        version = self.versions.get(id(surface), 0)
+        if entry[1] != surface.get_size() or entry[4] != version:
+            entry[1] = surface.get_size()
+            entry[2] = self.upload(surface, entry[2])
+            entry[3] = self.opaque_pixels(surface)
+            entry[4] = version
+        return entry[2]
+
+    def mark_dirty(self, surface):
+        # a sprite drawn into in place keeps its id, so its texture is only uploaded again when asked
+        self.versions[id(surface)] = self.versions.get(id(surface), 0) + 1
+
+    def opaque_pixels(self, surface):
+        return not surface.get_masks()[3] or pygame.surfarray.array_alpha(surface).min() == 255
+
+    def opaque(self, surface, region):
+        if surface.get_alpha() not in (None, 255):
+            return False
+        if region is None:
+            return self.loose[id(surface)][3]
+        key = (region.page, region.rect.x, region.rect.y)
+        if key not in self.opaque_regions:
+            self.opaque_regions[key] = self.opaque_pixels(surface)
+        return self.opaque_regions[key]
+
+    def prune(self):
+        for surface_id, entry in list(self.loose.items()):
+            if entry[0]() is None:
+                entry[2].release()
+                del self.loose[surface_id]
+                self.versions.pop(surface_id, None)
+
+    def sprite_info(self, surface):
+        region = self.atlas.region_for(surface) if self.atlas else None
+        if region:
+            texture = self.page_texture(region.page)
+            src = (region.rect.x, region.rect.y)
+        else:
+            texture = self.loose_texture(surface)
+            src = (0, 0)
+        alpha = surface.get_alpha()
+        # get_flags() reports SRCALPHA for any surface with set_alpha, only the mask says it has per-pixel alpha
+        blend = (255 if alpha is None else alpha, 1 if surface.get_masks()[3] else 0)
+        return texture, src + blend, self.opaque(surface, region)
+
+    def batches(self, queue):
+        batches = []
+        infos = {}
+        current = None
+        runs = self.runs
+        run = self.run
+        width, height = self.size
+        for entry in queue:
+            surface = entry[2]
+            x, y = int(entry[3][0]), int(entry[3][1])
+            w, h = surface.get_size()
+            x0, y0, x1, y1 = max(x, 0), max(y, 0), min(x + w, width), min(y + h, height)
+            if x0 >= x1 or y0 >= y1:
+                continue
+
+            info = infos.get(id(surface))
+            if info is None:
+                info = infos[id(surface)] = self.sprite_info(surface)
+
+            # a translucent sprite over pixels drawn in this run has to see them, so it starts a new one;
+            # opaque sprites replace whatever is below them and never read the snapshot
+            fresh = current is None or (not info[2] and (runs[y0:y1, x0:x1] == run).any())
+            if fresh:
+                run += 1
+            runs[y0:y1, x0:x1] = run
+
+            if fresh or current[0] is not info[0]:
+                current = (info[0], [], fresh)
+                batches.append(current)
+            current[1].append((x, y, w, h) + info[1])
+        self.run = run
+        return batches
+
+    def draw(self, group, surface, queue):
+        texture, framebuffer = self.target(group)
+        previous = self.ctx.fbo
+        framebuffer.use()
+        framebuffer.clear(*[c / 255 for c in self.clear_color])
+
+        batches = self.batches(queue)
+        self.program['page'].value = 0
+        self.program['snapshot'].value = 1
+        for page, instances, fresh in batches:
+            if fresh:
+                self.ctx.copy_framebuffer(self.snapshot, framebuffer)
+            if len(instances) > self.capacity:
+                self.capacity = len(instances) * 2
+                self.instances.orphan(self.capacity * INSTANCE_FIELDS * 4)
+            self.instances.write(np.array(instances, dtype='f4').tobytes())
+            page.use(0)
+            self.snapshot.use(1)
+            self.vao.render(moderngl.TRIANGLE_STRIP, vertices=4, instances=len(instances))
+            self.draw_calls += 1
+            self.sprites += len(instances)
+        if previous:
+            previous.use()
+
+        self.drawn[id(surface)] = texture
+        return texture
+
+    def texture_for(self, surface):
+        return self.drawn.get(id(surface))
+
+    def begin_frame(self):
+        self.prune()
+        self.drawn = {}
+        self.draw_calls = 0
+        self.sprites = 0
+        self.uploads = 0
+
+    def read(self, group='default'):
+        texture, framebuffer = self.target(group)
+        return pygame.image.frombytes(framebuffer.read(components=4), self.size, 'RGBA')
+
+    def release(self):
+        for texture, framebuffer in self.targets.values():
+            framebuffer.release()
+            texture.release()
+        for texture, _ in self.pages.values():
+            texture.release()
+        for entry in self.loose.values():
+            entry[2].release()
+        self.snapshot.release()
+        self.targets = {}
+        self.pages = {}
+        self.loose = {}
+        self.versions = {}
+        self.opaque_regions = {}
+
 
 class RenderObject:
     def __init__(self, frag_shader, vert_shader=None, default_ro=False, vao_args=['2f 2f', 'vert', 'texcoord'],
@@ -53,8 +396,7 @@ class RenderObject:
             buffer = self.mgl.quad_buffer
 
         self.vao = self.mgl.ctx.vertex_array(self.program, [(buffer, *vao_args)])
-        self.temp_textures = []
-        self.textures = {}
+        self.texture_pool = self.mgl.texture_pool
         self.debug = False
 
     def update(self, uniforms={}):
@@ -80,17 +422,11 @@ class RenderObject:
         processed_uniforms = {}
 
         for name, value in uniforms.items():
-            if isinstance(value, pygame.Surface):
+            if isinstance(value, pygame.Surface) and self.mgl.world and self.mgl.world.texture_for(value):
+                processed_uniforms[name] = self.mgl.world.texture_for(value)
+            elif isinstance(value, pygame.Surface):
                 try:
-                    if id(value) in self.textures:
-                        tex = self.textures[id(value)]
-                        self.mgl.pg2tx_update(tex, value)
-                    else:
-                        tex = self.mgl.pg2tx(value)
-                        self.textures[id(value)] = tex
-
-                    processed_uniforms[name] = tex
-                    self.temp_textures.append(tex)
+                    processed_uniforms[name] = self.texture_pool.get(value)
                 except Exception as e:
                     print(f"Error with create tex for {name}: {e}")
             else:
@@ -109,22 +445,16 @@ class RenderObject:
             self.vao.render(mode=moderngl.TRIANGLE_STRIP)
         except Exception as e:
             print(f"Error with rendering: {e}")
-        finally:
-            for tex in self.temp_textures:
-                try:
-                    if tex and not tex.mglo.released:
-                        tex.release()
-                except AttributeError:
-                    pass
-            self.temp_textures = []
 
 
 class MGLComponent(Component):
-    def __init__(self):
+    def __init__(self, double_buffer_textures=False, ctx=None):
         super().__init__()
+        self.texture_pool = TexturePool(self, double_buffer=double_buffer_textures)
+        self.world = None
 
         try:
-            self.ctx = moderngl.create_context(require=330)
+            self.ctx = ctx or moderngl.create_context(require=330)
 
             self.quad_buffer = self.ctx.buffer(data=array('f', [
                 -1.0, 1.0, 0.0, 0.0,
@@ -148,6 +478,17 @@ class MGLComponent(Component):
             print(f"Error with ModernGL initialization: {e}")
             self.initialized = False
 
+    def enable_world_renderer(self, size, atlas=None, groups=('default',), clear_color=(255, 255, 255, 255)):
+        if not self.initialized:
+            return None
+
+        try:
+            self.world = WorldRenderer(self, size, atlas=atlas, groups=groups, clear_color=clear_color)
+        except Exception as e:
+            print(f"World renderer error: {e}")
+            self.world = None
+        return self.world
+
     def default_ro(self):
         if not self.initialized:
             print("ModernGL not initialized!")
@@ -1,15 +1,55 @@
+import time
+from collections import Counter
+
+import pygame
+
 from util.framework.globals import G
 from util.framework.core.component import Component
+from util.framework.utils.profiler import profiler
+
+
+def merge_rects(rects):
+    merged = []
+    for rect in rects:
+        rect = pygame.Rect(rect)
+        i = rect.collidelist(merged)
+        while i != -1:
+            rect.union_ip(merged.pop(i))
+            i = rect.collidelist(merged)
+        merged.append(rect)
+    return merged
 
 
 class RenderComponent(Component):
-    def __init__(self):
+    def __init__(self, dirty_rects=False, full_redraw_ratio=0.5):
         super().__init__()
         self.surfaces = {}
         self.render_order = []
+        self.render_queue = {}
+        self.seq = 0
+
+        self.draw_calls = 0
+        self.blit_count = 0
+        self.sort_time = 0
+
+        # surfaces keep last frame's contents and only regions whose blits changed are redrawn
+        self.dirty_mode = dirty_rects
+        self.full_redraw_ratio = full_redraw_ratio
+        self.clear_colors = {}
+        # group -> (keys, entries, rects) drawn last frame, entries hold the surfaces so ids stay unique
+        self.previous = {}
+        self.pending = {}
+        self.direct = {}
+        self.full = set()
+        # union of this frame's redrawn regions across groups, in surface coordinates
+        self.dirty_rects = []
 
-    def add_surface(self, name, surface):
+    def add_surface(self, name, surface, clear_color=(0, 0, 0, 0)):
         self.surfaces[name] = surface
+        self.clear_colors[name] = clear_color
+        self.full.add(name)
+        if name not in self.render_queue:
+            self.render_queue[name] = []
         if name not in self.render_order:
             self.render_order.append(name)
 
@@ -19,11 +59,28 @@ class RenderComponent(Component):
     def get_surface(self, name):
         return self.surfaces.get(name)
 
+    def invalidate(self, group=None):
+        self.full.update(self.surfaces if group is None else [group])
+
+    def mark_dirty(self, group, rect):
+        if rect:
+            self.pending.setdefault(group, []).append(pygame.Rect(rect))
+
+    def mark_drawn(self, group, rect):
+        # for drawing straight onto a layer after flush, the area is composited now and erased next frame
+        if rect and group in self.surfaces:
+            rect = pygame.Rect(rect).clip(self.surfaces[group].get_rect())
+            self.direct.setdefault(group, []).append(rect)
+            self.dirty_rects = merge_rects(self.dirty_rects + [rect])
+
+    @profiler.profile('render.cycle')
     def cycle(self, surfaces={}):
         for name, surface in surfaces.items():
             self.surfaces[name] = surface
 
-        mgl = G.mgl
+        self.flush()
+
+        mgl = getattr(G, 'mgl', None)
         if mgl:
             window_comp = G.window
             if window_comp and window_comp.render_object:
@@ -34,6 +91,10 @@ class RenderComponent(Component):
             render_object.render(uniforms=surfaces)
             return
 
+        if self.dirty_mode:
+            # layers persist between frames, the window composites them over the dirty regions instead
+            return
+
         if 'default' in self.surfaces:
             main_surface = self.surfaces['default']
 
@@ -48,6 +109,95 @@ class RenderComponent(Component):
             if 'ui' in self.surfaces:
                 main_surface.blit(self.surfaces['ui'], (0, 0))
 
-    def blit(self, surface, pos, z=0, group='default'):
-        if group in self.surfaces:
-            self.surfaces[group].blit(surface, pos)
\ No newline at end of file
+    def blit(self, surface, pos, z=0, group='default', flags=0):
+        if group in self.render_queue:
+            self.render_queue[group].append((z, self.seq, surface, pos, flags))
+            self.seq += 1
+
+    def flush(self):
+        self.draw_calls = 0
+        self.blit_count = 0
+
+        start = time.perf_counter()
+        for queue in self.render_queue.values():
+            # seq is unique, so the sort never falls through to comparing surfaces
+            queue.sort()
+        self.sort_time = time.perf_counter() - start
+
+        mgl = getattr(G, 'mgl', None)
+        world = mgl.world if mgl else None
+        if world:
+            world.begin_frame()
+
+        dirty_rects = []
+        for group, queue in self.render_queue.items():
+            if world and group in self.surfaces and world.handles(group, queue):
+                draw_calls = world.draw_calls
+                world.draw(group, self.surfaces[group], queue)
+                self.draw_calls += world.draw_calls - draw_calls
+                self.blit_count += len(queue)
+            elif self.dirty_mode and group in self.surfaces:
+                dirty_rects.extend(self.flush_dirty(group, self.surfaces[group], queue))
+            elif queue and group in self.surfaces:
+                self.surfaces[group].blits([(entry[2], entry[3], None, entry[4]) for entry in queue], doreturn=False)
+                self.draw_calls += 1
+                self.blit_count += len(queue)
+            queue.clear()
+        self.seq = 0
+        self.dirty_rects = merge_rects(dirty_rects)
+
+    def flush_dirty(self, group, surface, queue):
+        keys = [(id(entry[2]), entry[3][0], entry[3][1], entry[4]) for entry in queue]
+        rects = [pygame.Rect(entry[3], entry[2].get_size()) for entry in queue]
+        bounds = surface.get_rect()
+
+        changed = self.pending.pop(group, []) + self.direct.pop(group, [])
+        full = group in self.full or group not in self.previous
+        if not full:
+            prev_keys, prev_entries, prev_rects = self.previous[group]
+            if keys != prev_keys:
+                prev_counts = Counter(prev_keys)
+                counts = Counter(keys)
+                if prev_counts == counts:
+                    # same blits in a different z order
+                    full = True
+                else:
+                    removed = prev_counts - counts
+                    added = counts - prev_counts
+                    for key, rect in zip(prev_keys, prev_rects):
+                        if removed[key]:
+                            removed[key] -= 1
+                            changed.append(rect)
+                    for key, rect in zip(keys, rects):
+                        if added[key]:
+                            added[key] -= 1
+                            changed.append(rect)
+
+        self.previous[group] = (keys, [entry[2] for entry in queue], rects)
+
+        if not full:
+            changed = [rect.clip(bounds) for rect in merge_rects(changed)]
+            changed = [rect for rect in changed if rect.w and rect.h]
+            area = sum(rect.w * rect.h for rect in changed)
+            full = area > bounds.w * bounds.h * self.full_redraw_ratio
+
+        clear_color = self.clear_colors.get(group, (0, 0, 0, 0))
+        if full:
+            self.full.discard(group)
+            surface.fill(clear_color)
+            if queue:
+                surface.blits([(entry[2], entry[3], None, entry[4]) for entry in queue], doreturn=False)
+                self.draw_calls += 1
+                self.blit_count += len(queue)
+            return [bounds]
+
+        for rect in changed:
+            surface.set_clip(rect)
+            surface.fill(clear_color, rect)
+            indices = rect.collidelistall(rects)
+            if indices:
+                surface.blits([(queue[i][2], queue[i][3], None, queue[i][4]) for i in indices], doreturn=False)
+                self.draw_calls += 1
+                self.blit_count += len(indices)
+        surface.set_clip(None)
+        return changed
\ No newline at end of file
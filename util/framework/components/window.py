@@ -1,11 +1,14 @@
 import time
+from collections import deque
+
 import pygame
 from util.framework.globals import G
 from util.framework.core.component import Component
+from util.framework.utils.profiler import profiler
 
 class WindowComponent(Component):
     def __init__(self, dimensions=(640, 480), caption='pygpen window', flags=0, fps_cap=60, dt_cap=1, opengl=False,
-                 frag_path=None):
+                 frag_path=None, fixed_dt=None, fixed_step=None, max_catch_up=5, dirty_rects=False):
         super().__init__()
         self.opengl = opengl
         self.frag_path = frag_path
@@ -15,12 +18,23 @@ class WindowComponent(Component):
             self.flags = self.flags | pygame.DOUBLEBUF | pygame.OPENGL
         self.fps_cap = fps_cap
         self.dt_cap = dt_cap
+        self.fixed_dt = fixed_dt
+        self.fixed_step = fixed_step
+        self.max_catch_up = max_catch_up
+        self.accumulator = 0.0
+        self.alpha = 1.0
+        self.dropped_steps = 0
         self.background_color = (0, 0, 0)
         self.time = time.time()
         self.start_time = time.time()
         self.runtime_ = self.time - self.start_time
         self.frames = 0
-        self.frame_log = []
+        self.frame_log = deque(maxlen=60)
+
+        # software only, composite and present just the regions the renderer redrew
+        self.dirty_mode = dirty_rects and not opengl
+        self.full_redraw = True
+        self.update_rects = []
 
         pygame.init()
         pygame.display.set_caption(caption)
@@ -51,7 +65,7 @@ class WindowComponent(Component):
 
     def initialize_opengl(self):
         if self.opengl and not self.initialized_opengl:
-            mgl = G.mgl
+            mgl = getattr(G, 'mgl', None)
             if mgl and mgl.initialized:
                 if not self.frag_path:
                     self.render_object = mgl.default_ro()
@@ -69,6 +83,29 @@ class WindowComponent(Component):
     def fps(self):
         return len(self.frame_log) / sum(self.frame_log) if self.frame_log else 0
 
+    @property
+    def sim_dt(self):
+        return self.fixed_step if self.fixed_step else self.dt
+
+    def consume_steps(self):
+        if not self.fixed_step:
+            self.alpha = 1.0
+            return 1
+
+        self.accumulator += self.dt
+        steps = int(self.accumulator // self.fixed_step)
+        if steps > self.max_catch_up:
+            # too far behind to catch up, drop the backlog instead of spiralling
+            self.dropped_steps += steps - self.max_catch_up
+            steps = self.max_catch_up
+            self.accumulator = self.accumulator % self.fixed_step + steps * self.fixed_step
+        self.accumulator -= steps * self.fixed_step
+        self.alpha = self.accumulator / self.fixed_step
+        return steps
+
+    def invalidate(self):
+        self.full_redraw = True
+
     def start_transition(self, alternative=False):
         if not alternative:
             if self.open:
@@ -112,6 +149,7 @@ class WindowComponent(Component):
                         self.e_transition = 0.0
                         self.e_transitioning = False
 
+    @profiler.profile('window.cycle')
     def cycle(self, uniforms):
         if self.debug:
             print(f"Window.cycle: OpenGL={self.opengl}, have surfs: {list(uniforms.keys())}")
@@ -140,19 +178,27 @@ class WindowComponent(Component):
                 if self.debug:
                     print("use default pygame render_object")
                 self._fallback_render(uniforms)
+        elif self.dirty_mode:
+            self._dirty_render(uniforms)
         else:
             self._fallback_render(uniforms)
 
         self.update_transition()
-        pygame.display.flip()
+        if self.dirty_mode:
+            if self.update_rects:
+                pygame.display.update(self.update_rects)
+        else:
+            pygame.display.flip()
 
         self.clock.tick(self.fps_cap)
-        self.dt = min(time.time() - self.last_frame, self.dt_cap)
+        if self.fixed_dt:
+            self.dt = self.fixed_dt
+        else:
+            self.dt = min(time.time() - self.last_frame, self.dt_cap)
         self.frame_log.append(self.dt)
-        self.frame_log = self.frame_log[-60:]
         self.last_frame = time.time()
 
-        mgl = G.mgl
+        mgl = getattr(G, 'mgl', None)
         if mgl and mgl.initialized:
             try:
                 mgl.ctx.clear(*[self.background_color[i] / 255 for i in range(3)], 1.0)
@@ -163,6 +209,42 @@ class WindowComponent(Component):
         self.frames += 1
         self.runtime_ = self.time - self.start_time
 
+    def _dirty_render(self, uniforms):
+        self.update_rects = []
+        surface = uniforms.get('surface')
+        if not surface:
+            return
+
+        screen_w, screen_h = self.screen.get_size()
+        scale = min(screen_w / surface.get_width(), screen_h / surface.get_height())
+        x = (screen_w - int(surface.get_width() * scale)) // 2
+        y = (screen_h - int(surface.get_height() * scale)) // 2
+
+        render = getattr(G, 'render', None)
+        if self.full_redraw or render is None:
+            self.screen.fill(self.background_color)
+            rects = [surface.get_rect()]
+            self.update_rects.append(self.screen.get_rect())
+            self.full_redraw = False
+        else:
+            rects = render.dirty_rects
+
+        # same stacking as RenderComponent.cycle, where the background group is blitted over default
+        layers = [layer for layer in (surface, uniforms.get('bg_surf'), uniforms.get('ui_surf')) if layer]
+        for rect in rects:
+            dest = pygame.Rect(x + int(rect.left * scale), y + int(rect.top * scale), 0, 0)
+            dest.size = (x + int(rect.right * scale) - dest.x, y + int(rect.bottom * scale) - dest.y)
+            self.screen.fill(self.background_color, dest)
+            for layer in layers:
+                try:
+                    if scale == 1:
+                        self.screen.blit(layer, dest, rect)
+                    else:
+                        self.screen.blit(pygame.transform.scale(layer.subsurface(rect), dest.size), dest)
+                except Exception as e:
+                    print(f"Transform error: {e}")
+            self.update_rects.append(dest)
+
     def _fallback_render(self, uniforms):
         self.screen.fill(self.background_color)
 
@@ -1,5 +1,5 @@
 class Animation:
-    def __init__(self, images, config=None, hard_copy=False):
+    def __init__(self, images, config=None, hard_copy=False, regions=None):
         if not config:
             config = {}
 
@@ -15,8 +15,10 @@ class Animation:
             self.config['durations'] = [0.1 for i in range(len(images))]
 
         self.images = images
+        self.regions = regions
         if hard_copy:
             self.images = [img.copy() for img in self.images]
+            self.regions = None
 
         self.frame = 0
         self.frame_time = 0
@@ -24,7 +26,7 @@ class Animation:
         self.finished = False
 
     def copy(self):
-        new_animation = Animation(self.images, config=self.config.copy())
+        new_animation = Animation(self.images, config=self.config.copy(), regions=self.regions)
         new_animation.frame = self.frame
         new_animation.frame_time = self.frame_time
         new_animation.paused = self.paused
@@ -38,6 +40,12 @@ class Animation:
     def img(self):
         return self.images[max(min(len(self.images) - 1, self.frame), 0)]
 
+    @property
+    def region(self):
+        if self.regions is None:
+            return None
+        return self.regions[max(min(len(self.images) - 1, self.frame), 0)]
+
     def update(self, dt):
         if not self.paused:
             self.frame_time += dt * self.config['rate']
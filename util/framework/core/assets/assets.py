@@ -3,13 +3,16 @@ from util.framework.core.component import Component
 from util.framework.utils.assets import load_img_directory
 from util.framework.utils.io import read_tjson
 from util.framework.core.assets.spritesheets import load_spritesheets
+from util.framework.utils.atlas import TextureAtlas
 
 
 class AssetsComponent(Component):
-    def __init__(self, spritesheet_path=None, colorkey=(0, 0, 0)):
+    def __init__(self, spritesheet_path=None, colorkey=(0, 0, 0), atlas_page_size=(1024, 1024)):
         super().__init__()
         self.spritesheet_path = spritesheet_path
+        self.atlas = TextureAtlas(page_size=atlas_page_size)
         self.spritesheets = load_spritesheets(spritesheet_path, colorkey=colorkey) if spritesheet_path else {}
+        self.pack_spritesheets()
         self.autotile_config = self.parse_autotile_config(
             read_tjson(spritesheet_path + '/autotile.json')) if spritesheet_path else {}
         self.custom_tile_renderers = {}
@@ -18,6 +21,15 @@ class AssetsComponent(Component):
     def load_folder(self, path, alpha=False, colorkey=None):
         self.images[path.split('/')[-1]] = load_img_directory(path, alpha=alpha, colorkey=colorkey)
 
+    def pack_spritesheets(self):
+        for group, spritesheet in self.spritesheets.items():
+            regions = self.atlas.pack({(group, tile_id): img for tile_id, img in spritesheet['assets'].items()})
+            spritesheet['regions'] = {}
+            for (_, tile_id), region in regions.items():
+                if region:
+                    spritesheet['regions'][tile_id] = region
+                    spritesheet['assets'][tile_id] = region.surface
+
     def enable(self, *args, **kwargs):
         pass
 
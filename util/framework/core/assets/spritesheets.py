@@ -1,11 +1,16 @@
+import hashlib
 import os
 
+import numpy as np
 import pygame
 
-from util.framework.utils.io import read_tjson, write_tjson
+from util.framework.utils.io import read_tjson, write_tjson, read_json, write_json
 from util.framework.utils.gfx import clip
 from util.framework.utils.assets import load_img_directory
 
+CACHE_FILE = '.spritesheet_cache.json'
+
+
 def load_spritesheet_config(path):
     if os.path.isfile(path):
         config = read_tjson(path, loose=True)
@@ -14,51 +19,95 @@ def load_spritesheet_config(path):
     write_tjson(path, config)
     return config
 
-def parse_spritesheet(surf, split_color=(0, 255, 255)):
-    row_start = None
+
+def spritesheet_pixels(surf):
+    # rgba like surf.get_at, surfaces without per-pixel alpha read as opaque
+    pixels = np.empty(surf.get_size() + (4,), dtype=np.uint8)
+    pixels[..., :3] = pygame.surfarray.array3d(surf)
+    pixels[..., 3] = pygame.surfarray.array_alpha(surf)
+    return pixels
+
+
+def marker_color(split_color):
+    # a Color compared with an rgb tuple only matches when it is opaque
+    return tuple(split_color) + (255,) * (4 - len(split_color))
+
+
+def spritesheet_hash(path, split_color=(0, 255, 255)):
+    # keyed on the file itself, so a cache hit never has to decode and copy the pixels
+    with open(path, 'rb') as f:
+        digest = hashlib.sha1(f.read())
+    digest.update(repr(marker_color(split_color)).encode())
+    return digest.hexdigest()
+
+
+def find_tile_rects(pixels, split_color=(0, 255, 255)):
+    # pixels is a (width, height, 4) array, markers are indexed [x, y] like surf.get_at
+    marker = np.all(pixels == np.array(marker_color(split_color), dtype=pixels.dtype), axis=2)
+    rects = []
     loc = [0, 0]
-    tiles = {}
-    for y in range(surf.get_height() - 1):
-        c1 = surf.get_at((1, y))
-        c2 = surf.get_at((1, y + 1))
-        c3 = surf.get_at((0, y + 1))
-        if (c1 == split_color) and (c2 != split_color) and (c3 == split_color):
+
+    edge = marker[0, 1:]
+    guide = marker[1]
+    row_starts = guide[:-1] & ~guide[1:] & edge
+    row_ends = ~guide[:-1] & guide[1:] & edge
+
+    row_start = None
+    for y in np.flatnonzero(row_starts | row_ends):
+        if row_starts[y]:
             row_start = y
-        if (c1 != split_color) and (c2 == split_color) and (c3 == split_color) and row_start != None:
-            row_bounds_y = (row_start, y)
+        if row_ends[y] and row_start is not None:
+            line = marker[:, row_start + 1]
+            col_starts = line[:-1] & ~line[1:]
+            col_ends = ~line[:-1] & line[1:]
+
             col_start = None
-            for x in range(surf.get_width() - 1):
-                c1 = surf.get_at((x, row_bounds_y[0] + 1))
-                c2 = surf.get_at((x + 1, row_bounds_y[0] + 1))
-                if (c1 == split_color) and (c2 != split_color):
+            for x in np.flatnonzero(col_starts | col_ends):
+                if col_starts[x]:
                     col_start = x
-                if (c1 != split_color) and (c2 == split_color) and col_start != None:
-                    col_bounds_x = (col_start, x)
+                if col_ends[x] and col_start is not None:
                     if col_start == 0:
-                        tile_bounds_y = row_bounds_y
+                        tile_end = y
                     else:
-                        y2 = row_start
-                        while True:
-                            c1 = surf.get_at((col_start + 1, y2))
-                            c2 = surf.get_at((col_start + 1, y2 + 1))
-                            if (c1 != split_color) and (c2 == split_color):
-                                break
-                            y2 += 1
-                        tile_bounds_y = (row_start, y2)
-                    rect = pygame.Rect(col_bounds_x[0] + 1, tile_bounds_y[0] + 1, col_bounds_x[1] - col_bounds_x[0], tile_bounds_y[1] - tile_bounds_y[0])
-                    tiles[tuple(loc)] = clip(surf, rect)
+                        column = marker[col_start + 1, row_start:]
+                        tile_end = row_start + np.flatnonzero(~column[:-1] & column[1:])[0]
+                    rects.append(((loc[0], loc[1]), (int(col_start) + 1, int(row_start) + 1, int(x - col_start),
+                                                     int(tile_end - row_start))))
                     loc[0] += 1
                     col_start = None
             loc[1] += 1
             loc[0] = 0
             row_start = None
-    return tiles
+    return rects
+
+
+def parse_spritesheet(surf, split_color=(0, 255, 255), rects=None):
+    if rects is None:
+        rects = find_tile_rects(spritesheet_pixels(surf), split_color=split_color)
+    return {tuple(loc): clip(surf, pygame.Rect(*rect)) for loc, rect in rects}
+
+
+def cached_tile_rects(surf, path, name, cache, split_color=(0, 255, 255)):
+    sheet_hash = spritesheet_hash(path, split_color=split_color)
+    if name in cache and cache[name]['hash'] == sheet_hash:
+        return [(tuple(entry[:2]), tuple(entry[2:])) for entry in cache[name]['tiles']], False
+
+    rects = find_tile_rects(spritesheet_pixels(surf), split_color=split_color)
+    cache[name] = {'hash': sheet_hash, 'tiles': [list(loc) + list(rect) for loc, rect in rects]}
+    return rects, True
+
 
 def load_spritesheets(path, split_color=(0, 255, 255), colorkey=(0, 0, 0)):
     spritesheets = load_img_directory(path, colorkey=colorkey)
+    cache_path = path + '/' + CACHE_FILE
+    cache = read_json(cache_path)
+    cache_changed = False
     for spritesheet in spritesheets:
+        rects, changed = cached_tile_rects(spritesheets[spritesheet], path + '/' + spritesheet + '.png', spritesheet,
+                                           cache, split_color=split_color)
+        cache_changed = cache_changed or changed
         spritesheets[spritesheet] = {
-            'assets': parse_spritesheet(spritesheets[spritesheet], split_color=split_color),
+            'assets': parse_spritesheet(spritesheets[spritesheet], split_color=split_color, rects=rects),
             'config': load_spritesheet_config(path + '/' + spritesheet + '.json'),
         }
         for tile in spritesheets[spritesheet]['assets']:
@@ -66,4 +115,6 @@ def load_spritesheets(path, split_color=(0, 255, 255), colorkey=(0, 0, 0)):
                 spritesheets[spritesheet]['config'][tile] = {'offset': (0, 0)}
             if 'offset' not in spritesheets[spritesheet]['config'][tile]:
                 spritesheets[spritesheet]['config'][tile]['offset'] = (0, 0)
-    return spritesheets
\ No newline at end of file
+    if cache_changed:
+        write_json(cache_path, cache)
+    return spritesheets
@@ -2,6 +2,12 @@ from abc import ABC, abstractmethod
 
 
 class BaseInteraction:
+    _registered = []
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        BaseInteraction._registered.append(cls)
+
     def __init__(self):
         self._enabled = True
 
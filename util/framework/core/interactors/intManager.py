@@ -1,9 +1,11 @@
 import inspect
 import asyncio
+import os
 
 from util.framework.globals import G
 from util.framework.core.interactors.interactor import Interactor, InteractorState
 from util.framework.core.interactors.intRegistry import InteractionRegistry
+from util.framework.utils.yaml import persistence
 
 term_colors = {
     'RED': '\033[91m',
@@ -28,8 +30,9 @@ class OnEncounterStartInt:
 
 
 class InteractorManager(Interactor):
-    def __init__(self):
+    def __init__(self, manifest_path=None):
         super().__init__()
+        self.manifest_path = manifest_path
         self.interactors = {}
         self._pending_start = []
         self._encounter_interactors = set()
@@ -49,9 +52,19 @@ class InteractorManager(Interactor):
 
     def _load_auto_interactions(self):
         try:
-            self.start_interactions = InteractionRegistry.get_encounter_start_instances()
-            self.end_interactions = InteractionRegistry.get_encounter_end_instances()
-            self.update_interactions = InteractionRegistry.get_encounter_update_instances()
+            manifest = {}
+            if self.manifest_path and os.path.exists(self.manifest_path):
+                manifest = InteractionRegistry.load_manifest(self.manifest_path)
+
+            instances = InteractionRegistry.get_instances()
+            self.start_interactions = instances['start']
+            self.end_interactions = instances['end']
+            self.update_interactions = instances['update']
+
+            if self.manifest_path:
+                modules = sorted({i.__class__.__module__ for bucket in instances.values() for i in bucket})
+                if modules != manifest.get('modules'):
+                    InteractionRegistry.write_manifest(self.manifest_path)
 
             print(f"\033[92mLoaded auto-discovered interactions:\033[0m")
             print(f"\033[92m - {len(self.start_interactions)} encounter start interactions\033[0m")
@@ -116,10 +129,12 @@ class InteractorManager(Interactor):
                 interactor.update(dt)
 
         if self._encounter_active:
-            self.update_encounter()
+            self.start_coroutine(self.update_encounter())
 
-        self._loop.call_soon(self._loop.stop)
-        self._loop.run_forever()
+    def fixed_update(self, fixed_dt):
+        for interactor in self.interactors.values():
+            if interactor.enabled and interactor.state == InteractorState.ACTIVE:
+                interactor.fixed_update(fixed_dt)
 
     async def trigger_encounter_start(self, args=None):
         self._encounter_active = True
@@ -150,6 +165,7 @@ class InteractorManager(Interactor):
                 self.start_coroutine(interaction.on_encounter_end(args))
 
         self.dispatch_event("encounter_end", args)
+        persistence.flush()
 
     async def update_encounter(self, args=None):
         if not self._encounter_active:
@@ -1,38 +1,42 @@
+import importlib
 import inspect
-import sys
 from .intBase import BaseInteraction, IOnEncounterStart, IOnEncounterUpdate, IOnEncounterEnd
+from util.framework.utils.io import read_json, write_json
+
+INTERFACES = {
+    'start': IOnEncounterStart,
+    'update': IOnEncounterUpdate,
+    'end': IOnEncounterEnd,
+}
 
 
 class InteractionRegistry:
     @classmethod
     def find_all_interactions(cls, base_type=BaseInteraction):
-        interactions = []
-
-        for module_name, module in list(sys.modules.items()):
-            if module is None:
-                continue
-            for _, obj in inspect.getmembers(module, inspect.isclass):
-                if (issubclass(obj, base_type) and
-                        obj != base_type and
-                        not inspect.isabstract(obj)):
-                    interactions.append(obj)
+        # subclasses register themselves in BaseInteraction.__init_subclass__, abstractness is only known afterwards
+        return [i for i in BaseInteraction._registered
+                if issubclass(i, base_type) and i is not base_type and not inspect.isabstract(i)]
 
-        return interactions
+    @classmethod
+    def bucket_interactions(cls):
+        buckets = {kind: [] for kind in INTERFACES}
+        for interaction in cls.find_all_interactions():
+            for kind, interface in INTERFACES.items():
+                if issubclass(interaction, interface):
+                    buckets[kind].append(interaction)
+        return buckets
 
     @classmethod
     def find_encounter_start_interactions(cls):
-        all_interactions = cls.find_all_interactions()
-        return [i for i in all_interactions if issubclass(i, IOnEncounterStart)]
+        return cls.bucket_interactions()['start']
 
     @classmethod
     def find_encounter_update_interactions(cls):
-        all_interactions = cls.find_all_interactions()
-        return [i for i in all_interactions if issubclass(i, IOnEncounterUpdate)]
+        return cls.bucket_interactions()['update']
 
     @classmethod
     def find_encounter_end_interactions(cls):
-        all_interactions = cls.find_all_interactions()
-        return [i for i in all_interactions if issubclass(i, IOnEncounterEnd)]
+        return cls.bucket_interactions()['end']
 
     @classmethod
     def create_instances(cls, interaction_classes):
@@ -41,6 +45,16 @@ class InteractionRegistry:
             instances.append(interaction_class())
         return instances
 
+    @classmethod
+    def get_instances(cls):
+        buckets = cls.bucket_interactions()
+        shared = {}
+        for classes in buckets.values():
+            for interaction_class in classes:
+                if interaction_class not in shared:
+                    shared[interaction_class] = interaction_class()
+        return {kind: [shared[i] for i in classes] for kind, classes in buckets.items()}
+
     @classmethod
     def get_encounter_start_instances(cls):
         classes = cls.find_encounter_start_interactions()
@@ -54,4 +68,25 @@ class InteractionRegistry:
     @classmethod
     def get_encounter_update_instances(cls):
         classes = cls.find_encounter_update_interactions()
-        return cls.create_instances(classes)
\ No newline at end of file
+        return cls.create_instances(classes)
+
+    @classmethod
+    def load_manifest(cls, path):
+        manifest = read_json(path)
+        for module_name in manifest.get('modules', []):
+            try:
+                importlib.import_module(module_name)
+            except ImportError as e:
+                print(f"\033[91mCould not import interaction module {module_name}: {e}\033[0m")
+        return manifest
+
+    @classmethod
+    def write_manifest(cls, path):
+        buckets = cls.bucket_interactions()
+        manifest = {
+            'modules': sorted({i.__module__ for classes in buckets.values() for i in classes}),
+            'interactions': {kind: [f"{i.__module__}.{i.__qualname__}" for i in classes]
+                             for kind, classes in buckets.items()},
+        }
+        write_json(path, manifest)
+        return manifest
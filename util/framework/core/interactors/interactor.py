@@ -141,22 +141,51 @@ class Interactor(Component):
         for timer_name in list(self._timers.keys()):
             self.cancel_timer(timer_name)
 
+    @property
+    def scheduler(self):
+        return getattr(G, 'scheduler', None)
+
+    async def next_frame(self):
+        await self.frames(1)
+
+    async def frames(self, n=1):
+        if self.scheduler:
+            await self.scheduler.frames(n)
+        else:
+            for _ in range(max(1, n)):
+                await asyncio.sleep(0.016)
+
+    async def until(self, predicate):
+        if self.scheduler:
+            await self.scheduler.until(predicate)
+        else:
+            while not predicate():
+                await asyncio.sleep(0.01)
+
     async def wait_for_seconds(self, seconds):
-        await asyncio.sleep(seconds)
+        if self.scheduler:
+            await self.scheduler.sleep(seconds)
+        else:
+            await asyncio.sleep(seconds)
 
     async def wait_until(self, predicate):
-        while not predicate():
-            await asyncio.sleep(0.01)
+        await self.until(predicate)
 
     async def wait_while(self, predicate):
-        while predicate():
-            await asyncio.sleep(0.01)
+        await self.until(lambda: not predicate())
 
     def set_timer(self, name, seconds, callback, repeat=False):
-        if name in self._timers:
-            task = self._timers[name]
-            self.stop_coroutine(task)
-            del self._timers[name]
+        self.cancel_timer(name)
+
+        if self.scheduler:
+            def fire():
+                if not repeat and self._timers.get(name) is timer:
+                    del self._timers[name]
+                callback()
+
+            timer = self.scheduler.call_later(seconds, fire, repeat=repeat)
+            self._timers[name] = timer
+            return timer
 
         async def timer_coroutine():
             try:
@@ -178,9 +207,11 @@ class Interactor(Component):
 
     def cancel_timer(self, name):
         if name in self._timers:
-            task = self._timers[name]
-            self.stop_coroutine(task)
-            del self._timers[name]
+            timer = self._timers.pop(name)
+            if isinstance(timer, asyncio.Task):
+                self.stop_coroutine(timer)
+            else:
+                timer.cancel()
             return True
         return False
 
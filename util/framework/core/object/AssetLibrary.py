@@ -5,14 +5,20 @@ import json
 from ..interactors.interactor import Interactor
 from ...utils import load_img_directory, read_json, write_json
 from ..assets.animation import Animation
+from ...globals import G
+from ...utils.atlas import TextureAtlas
 
 
 class ObjectData:
-    def __init__(self, settings, resources=None):
+    def __init__(self, settings, resources=None, atlas=None):
         self.specs = settings
         self.settings = settings
         self.resources = resources or {}
         self.sequences = {}
+        self.atlas = atlas
+
+        if atlas:
+            self.pack_resources(self.resources, settings['uid'])
 
         for sequence_name, sequence_config in self.specs.get('sequences', {}).items():
             sequence_images = []
@@ -41,17 +47,32 @@ class ObjectData:
                 sequence_images = [item[1] for item in sorted_items]
 
             if sequence_images:
+                regions = [atlas.region_for(img) for img in sequence_images] if atlas else None
                 self.sequences[sequence_name] = Animation(
                     sequence_images,
-                    config=sequence_config
+                    config=sequence_config,
+                    regions=regions if regions and all(regions) else None
                 )
 
+    def pack_resources(self, resources, prefix):
+        surfaces = {}
+        for name, value in resources.items():
+            if isinstance(value, pygame.Surface):
+                surfaces[prefix + '/' + name] = value
+            elif isinstance(value, dict):
+                self.pack_resources(value, prefix + '/' + name)
+
+        for key, region in self.atlas.pack(surfaces).items():
+            if region:
+                resources[key.split('/')[-1]] = region.surface
+
 
 class AssetLibrary(Interactor):
     def __init__(self, directory=None):
         super().__init__()
         self.directory = directory
         self.assets = {}
+        self.atlas = G.assets.atlas if getattr(G, 'assets', None) else TextureAtlas()
         if directory:
             self.initialize(directory)
 
@@ -94,4 +115,4 @@ class AssetLibrary(Interactor):
                     pass
 
             resources = load_img_directory(object_path, colorkey=settings.get('transparency', [0, 0, 0]))
-            self.assets[settings['uid']] = ObjectData(settings, resources)
\ No newline at end of file
+            self.assets[settings['uid']] = ObjectData(settings, resources, atlas=self.atlas)
\ No newline at end of file
@@ -87,80 +87,139 @@ class ObjectSectors(Interactor):
     def initialize(self):
         self.sectors = {}
         self.entity_locations = {}
+        self.collection_members = {}
         self.visible_objects = {}
 
     def total_objects(self):
-        return sum([len(self.sectors[sector]) for sector in self.sectors])
+        return len(self.entity_locations)
+
+    def sector_of(self, position):
+        return (int(position[0] // self.sector_size), int(position[1] // self.sector_size))
 
     def register(self, entity, collection_name='main'):
         if id(entity) not in self.entity_locations:
-            sector_coords = (int(entity.position[0] // self.sector_size), int(entity.position[1] // self.sector_size))
+            sector_coords = self.sector_of(entity.position)
             if sector_coords not in self.sectors:
-                self.sectors[sector_coords] = []
-            self.sectors[sector_coords].append(entity)
+                self.sectors[sector_coords] = {}
+            self.sectors[sector_coords][id(entity)] = entity
             self.entity_locations[id(entity)] = sector_coords
             entity._collection = collection_name
+            entity._sectors = self
+            if collection_name not in self.collection_members:
+                self.collection_members[collection_name] = {}
+            self.collection_members[collection_name][id(entity)] = entity
             if collection_name not in self.visible_objects:
                 self.visible_objects[collection_name] = []
 
     def unregister(self, entity):
-        if id(entity) in self.entity_locations:
-            self.sectors[self.entity_locations[id(entity)]].remove(entity)
-            del self.entity_locations[id(entity)]
+        entity_id = id(entity)
+        if entity_id in self.entity_locations:
+            sector_coords = self.entity_locations.pop(entity_id)
+            sector = self.sectors[sector_coords]
+            del sector[entity_id]
+            if not sector:
+                del self.sectors[sector_coords]
+            self.collection_members.get(entity._collection, {}).pop(entity_id, None)
+            entity._sectors = None
+
+    def relocate(self, entity):
+        entity_id = id(entity)
+        old_coords = self.entity_locations.get(entity_id)
+        if old_coords is None:
+            return False
+
+        new_coords = self.sector_of(entity.position)
+        if new_coords == old_coords:
+            return False
+
+        sector = self.sectors[old_coords]
+        del sector[entity_id]
+        if not sector:
+            del self.sectors[old_coords]
+
+        if new_coords not in self.sectors:
+            self.sectors[new_coords] = {}
+        self.sectors[new_coords][entity_id] = entity
+        self.entity_locations[entity_id] = new_coords
+        return True
 
     def remove_collection(self, collection_name):
         if collection_name not in self.visible_objects:
             return
 
-        entities_to_remove = []
-        for entity_id, sector_coords in self.entity_locations.items():
-            for entity in self.sectors[sector_coords]:
-                if hasattr(entity, '_collection') and entity._collection == collection_name:
-                    entities_to_remove.append(entity)
-
-        for entity in entities_to_remove:
+        for entity in list(self.collection_members.get(collection_name, {}).values()):
             self.unregister(entity)
 
         self.visible_objects[collection_name] = []
 
     def purge(self):
+        for sector in self.sectors.values():
+            for entity in sector.values():
+                entity._sectors = None
+
         self.sectors = {}
         self.entity_locations = {}
+        self.collection_members = {}
 
         for collection_name in self.visible_objects:
             self.visible_objects[collection_name] = []
 
+    def sector_range(self, rect):
+        return (range(int(rect.top // self.sector_size), int(rect.bottom // self.sector_size + 1)),
+                range(int(rect.left // self.sector_size), int(rect.right // self.sector_size + 1)))
+
+    def query_rect(self, rect, collection_name=None):
+        rows, columns = self.sector_range(rect)
+        results = []
+        for y in rows:
+            for x in columns:
+                sector = self.sectors.get((x, y))
+                if not sector:
+                    continue
+                for entity in sector.values():
+                    if collection_name is not None and entity._collection != collection_name:
+                        continue
+                    if rect.collidepoint(entity.position[0], entity.position[1]):
+                        results.append(entity)
+        return results
+
+    def query_radius(self, center, radius, collection_name=None):
+        rows = range(int((center[1] - radius) // self.sector_size), int((center[1] + radius) // self.sector_size + 1))
+        columns = range(int((center[0] - radius) // self.sector_size),
+                        int((center[0] + radius) // self.sector_size + 1))
+        radius_sq = radius * radius
+        results = []
+        for y in rows:
+            for x in columns:
+                sector = self.sectors.get((x, y))
+                if not sector:
+                    continue
+                for entity in sector.values():
+                    if collection_name is not None and entity._collection != collection_name:
+                        continue
+                    dx = entity.position[0] - center[0]
+                    dy = entity.position[1] - center[1]
+                    if dx * dx + dy * dy <= radius_sq:
+                        results.append(entity)
+        return results
+
     def refresh_visible(self, view_rect):
         for collection_name in self.visible_objects:
             self.visible_objects[collection_name] = []
 
-        # Calculate sector coordinates from view rectangle
-        start_y = int(view_rect.top // self.sector_size)
-        end_y = int(view_rect.bottom // self.sector_size + 1)
-        start_x = int(view_rect.left // self.sector_size)
-        end_x = int(view_rect.right // self.sector_size + 1)
-
-        # Process all sectors within view
-        for y in range(start_y, end_y):
-            for x in range(start_x, end_x):
-                sector_coords = (x, y)
-                if sector_coords in self.sectors:
-                    for entity in self.sectors[sector_coords]:
-                        # Check if entity moved to a new sector
-                        new_coords = (int(entity.position[0] // self.sector_size),
-                                      int(entity.position[1] // self.sector_size))
-                        if self.entity_locations[id(entity)] != new_coords:
-                            # Update entity sector location
-                            old_coords = self.entity_locations[id(entity)]
-                            self.entity_locations[id(entity)] = new_coords
-
-                            # Remove from old sector
-                            self.sectors[old_coords].remove(entity)
-
-                            # Add to new sector
-                            if new_coords not in self.sectors:
-                                self.sectors[new_coords] = []
-                            self.sectors[new_coords].append(entity)
-
-                        # Add to visible objects for this collection
-                        self.visible_objects[entity._collection].append(entity)
\ No newline at end of file
+        rows, columns = self.sector_range(view_rect)
+        moved = []
+
+        for y in rows:
+            for x in columns:
+                sector = self.sectors.get((x, y))
+                if not sector:
+                    continue
+                for entity in sector.values():
+                    # movers report through relocate(); this catches objects whose position was set directly
+                    if self.sector_of(entity.position) != (x, y):
+                        moved.append(entity)
+                    self.visible_objects[entity._collection].append(entity)
+
+        for entity in moved:
+            self.relocate(entity)
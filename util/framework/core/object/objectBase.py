@@ -1,9 +1,14 @@
 import pygame
 from util.framework.globals import G
 from util.framework.core.component import Component
+from util.framework.utils.gfx import SurfaceCache
 
 ADJACENT_DIRS = [(1, 0), (0, 1), (-1, 0), (0, -1)]
 
+# shared by all objects, so a crowd in the same pose pays for one transform
+TRANSFORM_CACHE = SurfaceCache(max_entries=1024)
+OUTLINE_CACHE = SurfaceCache(max_entries=256)
+
 WALKABLE_TILES = [
    'walk_zone',
 ]
@@ -53,6 +58,31 @@ class Object(Component):
        self.show = True
        self.modified = False
        self.highlight = None
+       self._sectors = None
+       self._render_key = None
+       self._render_img = None
+       self._placeholder = None
+
+   def reset(self, position, depth=0):
+       self.position = list(position)
+       self.depth = depth
+       initial = self.specs.get('initial', 'idle/down')
+       self.set_state(initial if initial in self.sequences else list(self.sequences.keys())[0], override=True)
+       self.transparency = 255
+       self.resize = [1, 1]
+       self.angle = 0
+       self.mirror = [False, False]
+       self.show = True
+       self.modified = False
+       self.highlight = None
+
+   def on_release(self):
+       if self._sectors is not None:
+           self._sectors.unregister(self)
+       # a pooled object comes back as someone else, agents must not keep chasing it
+       flowfields = getattr(G, 'flowfields', None)
+       if flowfields:
+           flowfields.unfollow(self)
 
    @property
    def center(self):
@@ -62,6 +92,14 @@ class Object(Component):
    def hitbox(self):
        return pygame.Rect(*self.position, *self.dimensions)
 
+   @property
+   def render_position(self):
+       return self.position
+
+   @property
+   def render_center(self):
+       return pygame.Rect(*self.render_position, *self.dimensions).center
+
    @property
    def offset_coords(self):
        res_offset = self.specs[self.source_type][self.state]['offset']
@@ -74,31 +112,65 @@ class Object(Component):
            return self.sequence.img
        return None
 
+   @property
+   def region(self):
+       if self.source_type == 'sequences':
+           return self.sequence.region
+       return None
+
    @property
    def render_image(self):
        src_img = self.source_image
        if src_img is None:
-           placeholder = pygame.Surface(self.dimensions)
-           placeholder.fill((255, 0, 255))
-           return placeholder
+           if self._placeholder is None or self._placeholder.get_size() != tuple(self.dimensions):
+               self._placeholder = pygame.Surface(self.dimensions)
+               self._placeholder.fill((255, 0, 255))
+           return self._placeholder
 
+       transform = (tuple(self.resize), tuple(self.mirror), self.angle, self.transparency)
+       if self.resize != [1, 1] or self.angle:
+           self.modified = True
+
+       key = (src_img, transform)
+       if self._render_key is not None and self._render_key[0] is src_img and self._render_key[1] == transform:
+           return self._render_img
+
+       img = TRANSFORM_CACHE.get(src_img, transform)
+       if img is None:
+           img = TRANSFORM_CACHE.put(src_img, transform, self.transform_image(src_img))
+       self._render_key = key
+       self._render_img = img
+       return img
+
+   def transform_image(self, src_img):
        img = src_img
        orig_size = img.get_size()
        if self.resize != [1, 1]:
            img = pygame.transform.scale(img, (int(self.resize[0] * orig_size[0]),
                                               int(self.resize[1] * orig_size[1])))
-           self.modified = True
        if any(self.mirror):
            img = pygame.transform.flip(img, self.mirror[0], self.mirror[1])
        if self.angle:
            img = pygame.transform.rotate(img, self.angle)
-           self.modified = True
        if self.transparency != 255:
            if img == src_img:
                img = img.copy()
            img.set_alpha(self.transparency)
        return img
 
+   def outline_image(self, img):
+       key = (tuple(self.highlight), self.transparency)
+       outline = OUTLINE_CACHE.get(img, key)
+       if outline is None:
+           outline = pygame.mask.from_surface(img).to_surface(setcolor=self.highlight, unsetcolor=(0, 0, 0, 0))
+           outline.set_alpha(self.transparency)
+           OUTLINE_CACHE.put(img, key, outline)
+       return outline
+
+   def report_move(self):
+       if self._sectors is not None:
+           self._sectors.relocate(self)
+
    def set_state(self, state, override=False):
        if not override and (self.state == state):
            return
@@ -109,16 +181,17 @@ class Object(Component):
 
    def draw_position(self, camera_offset=(0, 0)):
        img_dims = self.render_image.get_size()
+       position = self.render_position
        if (not self.modified) or self.specs['centered']:
            center_shift = (img_dims[0] // 2, img_dims[1] // 2) if self.specs['centered'] else (0, 0)
-           return (self.position[0] - camera_offset[0] + self.offset_coords[0] - center_shift[0],
-                   self.position[1] - camera_offset[1] + self.offset_coords[1] - center_shift[1])
+           return (position[0] - camera_offset[0] + self.offset_coords[0] - center_shift[0],
+                   position[1] - camera_offset[1] + self.offset_coords[1] - center_shift[1])
        else:
            raw_dims = self.source_image.get_size()
            size_delta = (img_dims[0] - raw_dims[0], img_dims[1] - raw_dims[1])
            auto_shift = [-size_delta[0] // 2, -size_delta[1] // 2]
-           return (self.position[0] - camera_offset[0] + self.offset_coords[0] + auto_shift[0],
-                   self.position[1] - camera_offset[1] + self.offset_coords[1] + auto_shift[1])
+           return (position[0] - camera_offset[0] + self.offset_coords[0] + auto_shift[0],
+                   position[1] - camera_offset[1] + self.offset_coords[1] + auto_shift[1])
 
    def tick(self, delta):
        super().update()
@@ -132,20 +205,31 @@ class Object(Component):
    def renderz(self, camera_offset=(0, 0), group='game'):
        if self.show:
            pos = self.draw_position(camera_offset)
+           img = self.render_image
            if self.highlight:
-               outline = pygame.mask.from_surface(self.render_image).to_surface(setcolor=self.highlight,
-                                                                                unsetcolor=(0, 0, 0, 0))
-               outline.set_alpha(self.transparency)
+               outline = self.outline_image(img)
                for shift in ADJACENT_DIRS:
                    G.render.blit(outline, (pos[0] + shift[0], pos[1] + shift[1]),
                                  z=self.depth - 0.000001)
-           G.render.blit(self.render_image, pos, z=self.depth)
+           G.render.blit(img, pos, z=self.depth)
 
 
 class MovingObject(Object):
     def __init__(self, position, depth=0):
+        self._batch = None
+        self._batch_index = None
         super().__init__(position, depth=depth)
-        self.prev_pos = (0, 0)
+        self.reset_physics(position)
+        self.initialize()
+
+    def reset(self, position, depth=0):
+        super().reset(position, depth=depth)
+        # a pooled mover comes back exactly as a new one would, including what initialize() tunes
+        self.reset_physics(position)
+        self.initialize()
+
+    def reset_physics(self, position):
+        self.prev_pos = tuple(position)
         self.speed = [0, 0]
         self.acceleration = [0, 0]
         self.size = [16, 16]
@@ -161,7 +245,12 @@ class MovingObject(Object):
         self.no_collide = False
         self.walkable_only = True
         self.collision_offsets = [5, 0, -8, -5]
-        self.initialize()
+
+    def on_release(self):
+        super().on_release()
+        # a pooled mover left in the batch would keep being integrated while it sits in the pool
+        if self._batch is not None:
+            self._batch.unregister(self)
 
     @property
     def rebound_factors(self):
@@ -177,9 +266,36 @@ class MovingObject(Object):
     def rect(self):
         return pygame.Rect(*self.prev_pos, *self.size)
 
+    @property
+    def render_position(self):
+        window = getattr(G, 'window', None)
+        if not (window and window.fixed_step):
+            return self.position
+        # blend the last two simulation ticks by how far the accumulator is into the next one
+        alpha = window.alpha
+        return [self.prev_pos[0] + (self.position[0] - self.prev_pos[0]) * alpha,
+                self.prev_pos[1] + (self.position[1] - self.prev_pos[1]) * alpha]
+
+    @property
+    def render_center(self):
+        window = getattr(G, 'window', None)
+        if not (window and window.fixed_step):
+            return self.center
+        return pygame.Rect(*self.render_position, *self.size).center
+
     def initialize(self):
         pass
 
+    def probe_points(self, new_position):
+        left_offset, top_offset, right_offset, bottom_offset = self.collision_offsets
+        return [
+            (new_position[0] - left_offset, new_position[1] - top_offset),
+            (new_position[0] + self.size[0] + right_offset, new_position[1] - top_offset),
+            (new_position[0] - left_offset, new_position[1] + self.size[1] + bottom_offset),
+            (new_position[0] + self.size[0] + right_offset, new_position[1] + self.size[1] + bottom_offset),
+            (new_position[0] + self.size[0] // 2, new_position[1] + self.size[1] // 2),
+        ]
+
     def check_walkable_collision(self, new_position, level_map):
         if not self.walkable_only:
             return True
@@ -196,29 +312,8 @@ class MovingObject(Object):
                 new_position[1] + self.size[1] + bottom_offset > world_height):
             return False
 
-        corners = [
-            (new_position[0] - left_offset, new_position[1] - top_offset),
-            (new_position[0] + self.size[0] + right_offset, new_position[1] - top_offset),
-            (new_position[0] - left_offset, new_position[1] + self.size[1] + bottom_offset),
-            (new_position[0] + self.size[0] + right_offset, new_position[1] + self.size[1] + bottom_offset)
-        ]
-
-        center = (new_position[0] + self.size[0] // 2, new_position[1] + self.size[1] // 2)
-        corners.append(center)
-
-        for corner in corners:
-            grid_x = int(corner[0] // level_map.tile_size[0])
-            grid_y = int(corner[1] // level_map.tile_size[1])
-
-            if (grid_x, grid_y) in level_map.grid_tiles:
-                found_walkable = False
-                for layer, tile in level_map.grid_tiles[(grid_x, grid_y)].items():
-                    if tile.group in WALKABLE_TILES:
-                        found_walkable = True
-                        break
-                if not found_walkable:
-                    return False
-            else:
+        for point in self.probe_points(new_position):
+            if not level_map.walkable_at(point):
                 return False
 
         return True
@@ -226,8 +321,19 @@ class MovingObject(Object):
     def behavior_update(self):
         pass
 
+    def follow_flow(self, target, speed):
+        direction = G.flowfields.follow(target).direction_at(self.center)
+        self.speed[0] = direction[0] * speed
+        self.speed[1] = direction[1] * speed
+        return direction
+
     def physics_update(self, level_map):
-        delta = G.window.dt
+        if self._batch is not None:
+            # integration happens for all batched movers at once in BatchPhysicsSystem.update
+            self.behavior_update()
+            return
+
+        delta = G.window.sim_dt
         self.behavior_update()
         if self.delta_move[0] * -self.auto_mirror > 0:
             self.mirror[0] = True
@@ -246,9 +352,15 @@ class MovingObject(Object):
         self.delta_move = [0, 0]
         self.pass_through = max(0, self.pass_through - delta)
 
+    def teleport(self, position):
+        # moves outside the simulation, interpolating from the old spot would drag the sprite across the map
+        self.position = list(position)
+        self.prev_pos = tuple(position)
+        self.report_move()
+
     def apply_impulse(self, vector):
-        self.delta_move[0] += vector[0] * G.window.dt
-        self.delta_move[1] += vector[1] * G.window.dt
+        self.delta_move[0] += vector[0] * G.window.sim_dt
+        self.delta_move[1] += vector[1] * G.window.sim_dt
 
     def move_with_physics(self, movement, level_map):
         self.collision_list = []
@@ -277,4 +389,6 @@ class MovingObject(Object):
             self.handle_collisions((0, movement[1]), tiles)
             self.position[0] += movement[0]
             tiles = level_map.nearby_grid_physics(self.center)
-            self.handle_collisions((movement[0], 0), tiles)
\ No newline at end of file
+            self.handle_collisions((movement[0], 0), tiles)
+
+        self.report_move()
\ No newline at end of file
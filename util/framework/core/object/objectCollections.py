@@ -2,6 +2,8 @@ import pygame
 from util.framework.core.interactors.interactor import Interactor
 from util.framework.core.object.ObjectSectors import ObjectSectors
 from util.framework import G
+from util.framework.utils.profiler import profiler
+from util.framework.core.pool import pools
 
 
 class ObjectCollections(Interactor):
@@ -27,6 +29,12 @@ class ObjectCollections(Interactor):
                     self.collections[collection] = []
                 self.collections[collection].append(game_object)
 
+    def spawn(self, object_type, collection, *args, **kwargs):
+        game_object = pools.acquire(object_type, *args, **kwargs)
+        self.register(game_object, collection)
+        return game_object
+
+    @profiler.profile('objects.update')
     def update(self, collection=None, release_lock=True, view_area=pygame.Rect(0, 0, 100, 100)):
         time_delta = G.window.dt if hasattr(G, 'window') else 0.016
 
@@ -43,6 +51,7 @@ class ObjectCollections(Interactor):
                         self.collections[collection].remove(game_object)
                         if collection in self.spatial_collections:
                             self.object_sectors.unregister(game_object)
+                        pools.release(game_object)
         else:
             for collection in self.collections:
                 self.update(collection, release_lock=False)
@@ -63,6 +72,7 @@ class ObjectCollections(Interactor):
             for collection in self.collections:
                 self.render(surface, collection=collection, camera_offset=camera_offset)
 
+    @profiler.profile('objects.renderz')
     def renderz(self, collection=None, layer_group='main', camera_offset=(0, 0)):
         if collection:
             if collection in self.collections:
@@ -0,0 +1,100 @@
+from util.framework.globals import G
+
+
+class ObjectPool:
+    def __init__(self, factory, reset=None, max_size=None):
+        self.factory = factory
+        # reset(obj, *args, **kwargs) re-initializes a recycled object, defaults to obj.reset(*args, **kwargs)
+        self.reset = reset
+        self.max_size = max_size
+        self.free = []
+
+        self.created = 0
+        self.reused = 0
+        self.released = 0
+        self.discarded = 0
+        self.in_use = 0
+        self.high_water = 0
+
+    def acquire(self, *args, **kwargs):
+        if self.free:
+            obj = self.free.pop()
+            if self.reset:
+                self.reset(obj, *args, **kwargs)
+            else:
+                obj.reset(*args, **kwargs)
+            self.reused += 1
+        else:
+            obj = self.factory(*args, **kwargs)
+            self.created += 1
+
+        obj._pool = self
+        obj._pool_free = False
+        self.in_use += 1
+        self.high_water = max(self.high_water, self.in_use)
+        return obj
+
+    def release(self, obj):
+        if getattr(obj, '_pool', None) is not self or obj._pool_free:
+            return False
+
+        obj._pool_free = True
+        self.in_use -= 1
+        self.released += 1
+        if hasattr(obj, 'on_release'):
+            obj.on_release()
+
+        if self.max_size is not None and len(self.free) >= self.max_size:
+            obj._pool = None
+            self.discarded += 1
+        else:
+            self.free.append(obj)
+        return True
+
+    def prewarm(self, count, *args, **kwargs):
+        objects = [self.acquire(*args, **kwargs) for _ in range(count)]
+        for obj in objects:
+            self.release(obj)
+        self.high_water = 0
+
+    def clear(self):
+        for obj in self.free:
+            obj._pool = None
+        self.free = []
+
+    def stats(self):
+        return {
+            'created': self.created,
+            'reused': self.reused,
+            'released': self.released,
+            'discarded': self.discarded,
+            'in_use': self.in_use,
+            'free': len(self.free),
+            'high_water': self.high_water,
+        }
+
+
+class PoolRegistry:
+    def __init__(self):
+        self.pools = {}
+
+    def pool(self, object_type, reset=None, max_size=None):
+        if object_type not in self.pools:
+            self.pools[object_type] = ObjectPool(object_type, reset=reset, max_size=max_size)
+        return self.pools[object_type]
+
+    def acquire(self, object_type, *args, **kwargs):
+        return self.pool(object_type).acquire(*args, **kwargs)
+
+    def release(self, obj):
+        pool = getattr(obj, '_pool', None)
+        if pool is None:
+            return False
+        return pool.release(obj)
+
+    def stats(self):
+        return {object_type.__name__: pool.stats() for object_type, pool in self.pools.items()}
+
+
+pools = PoolRegistry()
+G.register('pools', pools)
@@ -0,0 +1,134 @@
+import asyncio
+import math
+
+
+class Timer:
+    __slots__ = ('due', 'callback', 'interval', 'cancelled')
+
+    def __init__(self, due, callback, interval=None):
+        self.due = due
+        self.callback = callback
+        self.interval = interval
+        self.cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
+
+
+class TimerWheel:
+    def __init__(self, resolution=1 / 60, slots=256):
+        self.resolution = resolution
+        self.slots = [[] for _ in range(slots)]
+        self.current = 0
+        self.count = 0
+
+    def ticks_for(self, seconds):
+        return max(1, math.ceil(seconds / self.resolution - 1e-9))
+
+    def insert(self, timer):
+        self.slots[timer.due % len(self.slots)].append(timer)
+        self.count += 1
+        return timer
+
+    def schedule(self, seconds, callback, repeat=False):
+        ticks = self.ticks_for(seconds)
+        return self.insert(Timer(self.current + ticks, callback, interval=ticks if repeat else None))
+
+    def advance(self, now):
+        target = int(now / self.resolution + 1e-9)
+        while self.current < target:
+            self.current += 1
+            index = self.current % len(self.slots)
+            slot = self.slots[index]
+            if not slot:
+                continue
+
+            # callbacks may schedule into this slot, so they land in the fresh list
+            self.slots[index] = []
+            for timer in slot:
+                if timer.cancelled:
+                    self.count -= 1
+                elif timer.due > self.current:
+                    self.slots[index].append(timer)
+                else:
+                    self.count -= 1
+                    if timer.interval:
+                        timer.due = self.current + timer.interval
+                        self.insert(timer)
+                    try:
+                        timer.callback()
+                    except Exception as e:
+                        print(f"Exception in timer: {e}")
+
+
+class FrameScheduler:
+    def __init__(self, resolution=1 / 60, slots=256):
+        self.frame = 0
+        self.time = 0.0
+        # target frame -> futures waiting for it
+        self.frame_waiters = {}
+        self.predicates = []
+        self.wheel = TimerWheel(resolution=resolution, slots=slots)
+
+    @property
+    def pending(self):
+        return sum(len(waiters) for waiters in self.frame_waiters.values()) + len(self.predicates) + self.wheel.count
+
+    def _future(self):
+        return asyncio.get_running_loop().create_future()
+
+    def frames(self, n=1):
+        future = self._future()
+        target = self.frame + max(1, n)
+        if target not in self.frame_waiters:
+            self.frame_waiters[target] = []
+        self.frame_waiters[target].append(future)
+        return future
+
+    def next_frame(self):
+        return self.frames(1)
+
+    def until(self, predicate):
+        future = self._future()
+        if predicate():
+            future.set_result(None)
+        else:
+            self.predicates.append((predicate, future))
+        return future
+
+    def while_true(self, predicate):
+        return self.until(lambda: not predicate())
+
+    def sleep(self, seconds):
+        future = self._future()
+        self.wheel.schedule(seconds, lambda: future.done() or future.set_result(None))
+        return future
+
+    def call_later(self, seconds, callback, repeat=False):
+        return self.wheel.schedule(seconds, callback, repeat=repeat)
+
+    def tick(self, dt):
+        self.frame += 1
+        self.time += dt
+
+        for future in self.frame_waiters.pop(self.frame, []):
+            if not future.done():
+                future.set_result(None)
+
+        if self.predicates:
+            waiting = []
+            for predicate, future in self.predicates:
+                if future.done():
+                    continue
+                try:
+                    ready = predicate()
+                except Exception as e:
+                    future.set_exception(e)
+                    continue
+                if ready:
+                    future.set_result(None)
+                else:
+                    waiting.append((predicate, future))
+            self.predicates = waiting
+
+        self.wheel.advance(self.time)
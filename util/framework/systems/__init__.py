@@ -1,5 +1,7 @@
 from util.framework.systems.camera_system import CameraSystem
+from util.framework.systems.physics import BatchPhysicsSystem
 
 __all__ = [
-    'CameraSystem'
+    'CameraSystem',
+    'BatchPhysicsSystem'
 ]
\ No newline at end of file
@@ -0,0 +1,213 @@
+import numpy as np
+
+from util.framework.globals import G
+
+# field name -> (columns, dtype); columns of 0 means a scalar per mover
+BATCH_FIELDS = {
+    'position': (2, np.float64),
+    'prev_pos': (2, np.float64),
+    'speed': (2, np.float64),
+    'acceleration': (2, np.float64),
+    'size': (2, np.float64),
+    'max_speed': (2, np.float64),
+    'friction': (2, np.float64),
+    'delta_move': (2, np.float64),
+    'prev_move': (2, np.float64),
+    'pass_through': (0, np.float64),
+    'walkable_only': (0, np.bool_),
+    'auto_mirror': (0, np.float64),
+    'collision_offsets': (4, np.float64),
+}
+
+COLLISION_SIDES = ('up', 'down', 'right', 'left')
+
+# class -> subclass whose physics fields are views into a BatchPhysicsSystem
+BATCHED_CLASSES = {}
+
+
+class BatchField:
+    def __init__(self, name):
+        self.name = name
+
+    def __get__(self, obj, owner=None):
+        if obj is None:
+            return self
+        return obj._batch.arrays[self.name][obj._batch_index]
+
+    def __set__(self, obj, value):
+        obj._batch.arrays[self.name][obj._batch_index] = value
+
+
+def batched_class(cls):
+    # movers outside a batch keep plain attributes, only registered ones pay for the indirection
+    if cls not in BATCHED_CLASSES:
+        namespace = {name: BatchField(name) for name in BATCH_FIELDS}
+        namespace['collisions'] = property(lambda obj: obj._batch.collisions(obj),
+                                           lambda obj, value: obj._batch.set_collisions(obj, value))
+        namespace['plain_class'] = cls
+        # same name and module, so lookups by class name still find the original
+        namespace['__module__'] = cls.__module__
+        namespace['__qualname__'] = cls.__qualname__
+        BATCHED_CLASSES[cls] = type(cls.__name__, (cls,), namespace)
+    return BATCHED_CLASSES[cls]
+
+
+class BatchPhysicsSystem:
+    def __init__(self, level_map=None, capacity=64):
+        self.e = None
+        self.active = True
+
+        self.priority = 4
+
+        self.level_map = level_map
+        self.objects = []
+        self.arrays = {}
+        self.hits = np.zeros((capacity, 4), dtype=bool)
+        for name, (columns, dtype) in BATCH_FIELDS.items():
+            shape = (capacity, columns) if columns else (capacity,)
+            self.arrays[name] = np.zeros(shape, dtype=dtype)
+
+    @property
+    def count(self):
+        return len(self.objects)
+
+    def _grow(self):
+        capacity = max(1, len(self.hits)) * 2
+        for name, array in self.arrays.items():
+            grown = np.zeros((capacity,) + array.shape[1:], dtype=array.dtype)
+            grown[:len(array)] = array
+            self.arrays[name] = grown
+        hits = np.zeros((capacity, 4), dtype=bool)
+        hits[:len(self.hits)] = self.hits
+        self.hits = hits
+
+    def register(self, obj):
+        if obj._batch is self:
+            return obj._batch_index
+        if not obj.walkable_only:
+            # tile collisions (solid, platforms, ramps) only exist on the per-object path
+            print(f"BatchPhysicsSystem: {obj.kind} is not walkable_only, leaving it to physics_update")
+            return None
+        if obj._batch is not None:
+            obj._batch.unregister(obj)
+
+        if self.count == len(self.hits):
+            self._grow()
+
+        index = self.count
+        values = {name: getattr(obj, name) for name in BATCH_FIELDS}
+        self.objects.append(obj)
+        obj._batch_index = index
+        obj._batch = self
+        obj.__class__ = batched_class(type(obj))
+        for name, value in values.items():
+            self.arrays[name][index] = value
+        self.hits[index] = False
+        return index
+
+    def unregister(self, obj):
+        if obj._batch is not self:
+            return False
+
+        index = obj._batch_index
+        values = {name: self.arrays[name][index].tolist() for name in BATCH_FIELDS}
+        collisions = self.collisions(obj)
+        obj.__class__ = obj.plain_class
+        obj._batch = None
+        obj._batch_index = None
+        for name, value in values.items():
+            setattr(obj, name, value)
+        obj.collisions = collisions
+
+        last = self.count - 1
+        if index != last:
+            moved = self.objects[last]
+            for array in self.arrays.values():
+                array[index] = array[last]
+            self.hits[index] = self.hits[last]
+            self.objects[index] = moved
+            moved._batch_index = index
+        self.objects.pop()
+        return True
+
+    def collisions(self, obj):
+        return {side: bool(hit) for side, hit in zip(COLLISION_SIDES, self.hits[obj._batch_index])}
+
+    def set_collisions(self, obj, collisions):
+        self.hits[obj._batch_index] = [collisions[side] for side in COLLISION_SIDES]
+
+    def walkable_boxes(self, positions, level_map):
+        n = self.count
+        size = self.arrays['size'][:n]
+        offsets = self.arrays['collision_offsets'][:n]
+        left = positions[:, 0] - offsets[:, 0]
+        top = positions[:, 1] - offsets[:, 1]
+        right = positions[:, 0] + size[:, 0] + offsets[:, 2]
+        bottom = positions[:, 1] + size[:, 1] + offsets[:, 3]
+
+        world_width = level_map.dimensions[0] * level_map.tile_size[0]
+        world_height = level_map.dimensions[1] * level_map.tile_size[1]
+        inside = (left >= 0) & (right <= world_width) & (top >= 0) & (bottom <= world_height)
+
+        probes = np.empty((n, 5, 2))
+        probes[:, 0] = np.stack([left, top], axis=1)
+        probes[:, 1] = np.stack([right, top], axis=1)
+        probes[:, 2] = np.stack([left, bottom], axis=1)
+        probes[:, 3] = np.stack([right, bottom], axis=1)
+        probes[:, 4] = positions + size // 2
+
+        walkable = level_map.check_walkable_many(probes.reshape(-1, 2)).reshape(n, 5).all(axis=1)
+        # register() only takes walkable_only movers, so every one of them is held to the walk zone
+        return inside & walkable
+
+    def update(self, dt=None):
+        n = self.count
+        if not self.active or not n or self.level_map is None:
+            return
+
+        if dt is None:
+            dt = G.window.sim_dt
+
+        a = {name: array[:n] for name, array in self.arrays.items()}
+        position = a['position']
+        speed = a['speed']
+        hits = self.hits[:n]
+        hits[:] = False
+
+        delta_move = a['delta_move']
+        # same as physics_update, facing follows the impulses queued before this step
+        facing = delta_move[:, 0] * a['auto_mirror']
+        objects = self.objects
+        for index in np.flatnonzero(facing < 0):
+            objects[index].mirror[0] = True
+        for index in np.flatnonzero(facing > 0):
+            objects[index].mirror[0] = False
+        delta_move += speed * dt
+        a['prev_pos'][:] = position
+
+        for axis, (positive, negative) in ((1, (1, 0)), (0, (2, 3))):
+            moving = delta_move[:, axis] != 0
+            if not moving.any():
+                continue
+            test = position.copy()
+            test[:, axis] += delta_move[:, axis]
+            allowed = self.walkable_boxes(test, self.level_map)
+
+            move = moving & allowed
+            position[move, axis] = test[move, axis]
+
+            blocked = moving & ~allowed
+            speed[blocked, axis] = 0
+            hits[blocked & (delta_move[:, axis] > 0), positive] = True
+            hits[blocked & (delta_move[:, axis] < 0), negative] = True
+
+        a['prev_move'][:] = delta_move / dt
+        speed += a['acceleration'] * dt
+        friction = a['friction'] * dt
+        speed[:] = np.sign(speed) * np.maximum(np.abs(speed) - friction, 0)
+        np.clip(speed, -a['max_speed'], a['max_speed'], out=speed)
+        delta_move[:] = 0
+        np.maximum(a['pass_through'] - dt, 0, out=a['pass_through'])
+
+        for index in np.flatnonzero((position != a['prev_pos']).any(axis=1)):
+            objects[index].report_move()
@@ -0,0 +1,181 @@
+import pygame
+
+
+class AtlasRegion:
+    __slots__ = ('page', 'rect', 'surface')
+
+    def __init__(self, page, rect, surface):
+        self.page = page
+        self.rect = rect
+        self.surface = surface
+
+    def __iter__(self):
+        yield self.page
+        yield self.rect
+
+    def __repr__(self):
+        return f"AtlasRegion(page={self.page}, rect={tuple(self.rect)})"
+
+
+class SkylinePacker:
+    def __init__(self, width, height):
+        self.width = width
+        self.height = height
+        # each segment is [x, y, width], the lowest free y over that span
+        self.skyline = [[0, 0, width]]
+        self.used_area = 0
+
+    @property
+    def occupancy(self):
+        return self.used_area / (self.width * self.height)
+
+    def fit(self, index, w, h):
+        x = self.skyline[index][0]
+        if x + w > self.width:
+            return None
+
+        y = 0
+        remaining = w
+        while remaining > 0:
+            if index >= len(self.skyline):
+                return None
+            y = max(y, self.skyline[index][1])
+            if y + h > self.height:
+                return None
+            remaining -= self.skyline[index][2]
+            index += 1
+        return y
+
+    def insert(self, w, h):
+        best = None
+        for i, (x, _, segment_w) in enumerate(self.skyline):
+            y = self.fit(i, w, h)
+            if y is None:
+                continue
+            score = (y + h, segment_w)
+            if best is None or score < best[0]:
+                best = (score, i, x, y)
+
+        if best is None:
+            return None
+
+        _, index, x, y = best
+        self.add_level(index, x, y, w, h)
+        self.used_area += w * h
+        return pygame.Rect(x, y, w, h)
+
+    def add_level(self, index, x, y, w, h):
+        self.skyline.insert(index, [x, y + h, w])
+
+        i = index + 1
+        while i < len(self.skyline):
+            prev_end = self.skyline[i - 1][0] + self.skyline[i - 1][2]
+            segment = self.skyline[i]
+            if segment[0] >= prev_end:
+                break
+            shrink = prev_end - segment[0]
+            segment[0] += shrink
+            segment[2] -= shrink
+            if segment[2] > 0:
+                break
+            del self.skyline[i]
+
+        i = 0
+        while i < len(self.skyline) - 1:
+            if self.skyline[i][1] == self.skyline[i + 1][1]:
+                self.skyline[i][2] += self.skyline[i + 1][2]
+                del self.skyline[i + 1]
+            else:
+                i += 1
+
+
+class AtlasPage:
+    def __init__(self, index, size, source):
+        self.index = index
+        self.format = surface_format(source)
+        self.surface = pygame.Surface(size, source.get_flags() & pygame.SRCALPHA, source)
+        colorkey = source.get_colorkey()
+        if colorkey:
+            self.surface.fill(colorkey)
+            self.surface.set_colorkey(colorkey)
+        self.packer = SkylinePacker(*size)
+        self.version = 0
+
+
+def surface_format(surf):
+    return (bool(surf.get_flags() & pygame.SRCALPHA), surf.get_colorkey(), surf.get_bitsize())
+
+
+class TextureAtlas:
+    def __init__(self, page_size=(1024, 1024), padding=1):
+        self.page_size = tuple(page_size)
+        self.padding = padding
+        self.pages = []
+        self.regions = {}
+        self.views = {}
+
+    def __getitem__(self, key):
+        return self.regions[key]
+
+    def __contains__(self, key):
+        return key in self.regions
+
+    def region_for(self, surface):
+        return self.views.get(id(surface))
+
+    def new_page(self, source):
+        page = AtlasPage(len(self.pages), self.page_size, source)
+        self.pages.append(page)
+        return page
+
+    def place(self, surf):
+        w = surf.get_width() + self.padding
+        h = surf.get_height() + self.padding
+        if w > self.page_size[0] or h > self.page_size[1]:
+            return None, None
+
+        fmt = surface_format(surf)
+        for page in self.pages:
+            if page.format == fmt:
+                rect = page.packer.insert(w, h)
+                if rect:
+                    return page, rect
+        page = self.new_page(surf)
+        return page, page.packer.insert(w, h)
+
+    def add(self, key, surf):
+        if key in self.regions:
+            return self.regions[key]
+
+        page, rect = self.place(surf)
+        if page is None:
+            return None
+
+        rect = pygame.Rect(rect.x, rect.y, *surf.get_size())
+        if page.format[0]:
+            # an exact copy, a normal blit would blend against the empty page
+            page.surface.blit(surf, rect, special_flags=pygame.BLEND_RGBA_MAX)
+        else:
+            page.surface.blit(surf, rect)
+        page.version += 1
+
+        region = AtlasRegion(page.index, rect, page.surface.subsurface(rect))
+        self.regions[key] = region
+        self.views[id(region.surface)] = region
+        return region
+
+    def pack(self, surfaces):
+        # taller images first keeps the skyline flat
+        order = sorted(surfaces, key=lambda key: (-surfaces[key].get_height(), -surfaces[key].get_width()))
+        return {key: self.add(key, surfaces[key]) for key in order}
+
+    def view(self, key, surf):
+        region = self.add(key, surf)
+        return region.surface if region else surf
+
+    def stats(self):
+        return {
+            'pages': len(self.pages),
+            'regions': len(self.regions),
+            'occupancy': [round(page.packer.occupancy, 3) for page in self.pages],
+        }
@@ -0,0 +1,198 @@
+import math
+import weakref
+
+import numpy as np
+
+from util.framework.utils.pathfinding import PathGrid
+
+# relaxations only count when they beat the stored cost by more than float noise
+EPSILON = 1e-9
+DIRECTIONS = [(1, 0), (-1, 0), (0, 1), (0, -1), (1, 1), (1, -1), (-1, 1), (-1, -1)]
+
+
+class FlowField:
+    def __init__(self, tilemap, diagonal=True):
+        self.tilemap = tilemap
+        self.diagonal = diagonal
+        self.directions = DIRECTIONS if diagonal else DIRECTIONS[:4]
+        self.grid = None
+        self.walk = None
+        self.goal = None
+        self.cost = None
+        self.dirty = True
+
+        self.full_builds = 0
+        self.incremental_builds = 0
+        self.relaxed = 0
+
+        tilemap.add_walk_listener(self.on_walkability_changed)
+
+    def release(self):
+        self.tilemap.remove_walk_listener(self.on_walkability_changed)
+
+    def on_walkability_changed(self, grid_pos, walkable):
+        if grid_pos is None:
+            self.grid = None
+        elif self.grid is not None:
+            self.grid.set(grid_pos, walkable)
+        self.dirty = True
+
+    def grid_pos(self, world_pos):
+        return (int(world_pos[0] // self.tilemap.tile_size[0]), int(world_pos[1] // self.tilemap.tile_size[1]))
+
+    def set_goal(self, world_pos):
+        goal = self.grid_pos(world_pos)
+        if goal == self.goal and not self.dirty:
+            return False
+
+        if self.grid is None:
+            self.grid = PathGrid(self.tilemap.walkability)
+            # shares memory with the grid, so walkability updates show up here too
+            self.walk = np.frombuffer(self.grid.cells, dtype=np.uint8)
+            self.dirty = True
+
+        if not self.grid.in_bounds(goal):
+            self.goal = goal
+            self.cost = np.full(len(self.grid.cells), np.inf)
+            self.build_directions()
+            self.dirty = False
+            return True
+
+        goal_index = self.grid.index(goal)
+        # a blocked old goal only leads outwards, so routes through it are not real bounds
+        reusable = (not self.dirty and self.cost is not None and self.grid.in_bounds(self.goal)
+                    and self.walk[self.grid.index(self.goal)] and math.isfinite(self.cost[goal_index]))
+        if not reusable:
+            cost = np.full(len(self.grid.cells), np.inf)
+            self.full_builds += 1
+        else:
+            # routes through the old goal bound every new cost from above, relaxing only lowers them
+            cost = self.cost + self.cost[goal_index]
+            self.incremental_builds += 1
+
+        cost[goal_index] = 0.0
+        self.integrate(cost, np.array([goal_index]))
+        self.goal = goal
+        self.cost = cost
+        self.build_directions()
+        self.dirty = False
+        return True
+
+    def integrate(self, cost, active):
+        walk = self.walk
+        moves = self.grid.moves(self.diagonal)
+        while active.size:
+            source_cost = cost[active]
+            targets = []
+            costs = []
+            for delta, step, side_a, side_b in moves:
+                target = active + delta
+                open_cells = walk[target] != 0
+                if side_a:
+                    open_cells &= (walk[active + side_a] != 0) & (walk[active + side_b] != 0)
+                targets.append(target[open_cells])
+                costs.append(source_cost[open_cells] + step)
+
+            targets = np.concatenate(targets)
+            costs = np.concatenate(costs)
+            better = costs < cost[targets] - EPSILON
+            targets = targets[better]
+            if not targets.size:
+                break
+            np.minimum.at(cost, targets, costs[better])
+            active = np.unique(targets)
+            self.relaxed += active.size
+
+    def build_directions(self):
+        height, width = self.grid.height, self.grid.width
+        cost = self.cost.reshape(height + 2, width + 2)
+        walk = self.walk.reshape(height + 2, width + 2) != 0
+        inner = cost[1:-1, 1:-1]
+
+        candidates = []
+        for dx, dy in self.directions:
+            neighbor = cost[1 + dy:height + 1 + dy, 1 + dx:width + 1 + dx]
+            if dx and dy:
+                # no cutting corners, same rule the integration used
+                sides = walk[1:-1, 1 + dx:width + 1 + dx] & walk[1 + dy:height + 1 + dy, 1:-1]
+                neighbor = np.where(sides, neighbor, np.inf)
+            candidates.append(neighbor)
+        candidates = np.stack(candidates)
+
+        best = np.argmin(candidates, axis=0)
+        downhill = np.take_along_axis(candidates, best[None], axis=0)[0] < inner
+        vectors = np.array([(dx / math.hypot(dx, dy), dy / math.hypot(dx, dy)) for dx, dy in self.directions])
+        self.direction_x = np.where(downhill, vectors[best, 0], 0.0)
+        self.direction_y = np.where(downhill, vectors[best, 1], 0.0)
+        self.distance = inner
+
+    def direction_at(self, world_pos):
+        if self.goal is None:
+            return (0.0, 0.0)
+        x, y = self.grid_pos(world_pos)
+        if not self.grid.in_bounds((x, y)):
+            return (0.0, 0.0)
+        return (float(self.direction_x[y, x]), float(self.direction_y[y, x]))
+
+    def directions_at(self, positions):
+        positions = np.asarray(positions, dtype=np.float64).reshape(-1, 2)
+        result = np.zeros((len(positions), 2))
+        if self.goal is None:
+            return result
+        grid_x = np.floor_divide(positions[:, 0], self.tilemap.tile_size[0]).astype(np.intp)
+        grid_y = np.floor_divide(positions[:, 1], self.tilemap.tile_size[1]).astype(np.intp)
+        inside = (grid_x >= 0) & (grid_x < self.grid.width) & (grid_y >= 0) & (grid_y < self.grid.height)
+        result[inside, 0] = self.direction_x[grid_y[inside], grid_x[inside]]
+        result[inside, 1] = self.direction_y[grid_y[inside], grid_x[inside]]
+        return result
+
+    def distance_at(self, world_pos):
+        if self.goal is None:
+            return math.inf
+        x, y = self.grid_pos(world_pos)
+        if not self.grid.in_bounds((x, y)):
+            return math.inf
+        return float(self.distance[y, x])
+
+
+class FlowFieldManager:
+    def __init__(self, tilemap, diagonal=True):
+        self.tilemap = tilemap
+        self.diagonal = diagonal
+        # weakref to the target -> field, every agent chasing the same target reads the same field and the
+        # field goes away with the target
+        self.fields = {}
+
+    def follow(self, target):
+        field = self.fields.get(weakref.ref(target))
+        if field is None:
+            field = FlowField(self.tilemap, diagonal=self.diagonal)
+            field.set_goal(target.center)
+            self.fields[weakref.ref(target, self.forget)] = field
+        return field
+
+    def forget(self, key):
+        field = self.fields.pop(key, None)
+        if field:
+            field.release()
+
+    def unfollow(self, target):
+        self.forget(weakref.ref(target))
+
+    def clear(self):
+        for field in self.fields.values():
+            field.release()
+        self.fields = {}
+
+    def update(self):
+        for key, field in list(self.fields.items()):
+            target = key()
+            if target is not None:
+                field.set_goal(target.center)
+
+    def stats(self):
+        return {
+            'fields': len(self.fields),
+            'full_builds': sum(field.full_builds for field in self.fields.values()),
+            'incremental_builds': sum(field.incremental_builds for field in self.fields.values()),
+        }
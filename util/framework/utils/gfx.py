@@ -1,3 +1,5 @@
+from collections import OrderedDict
+
 import pygame
 
 def smooth_approach(current, target, slowness=10, min_speed=0.1):
@@ -40,4 +42,33 @@ def palette_swap(surf, colors):
         dest.blit(surf, (0, 0))
         surf = dest
     surf.set_colorkey(colorkey)
-    return surf
\ No newline at end of file
+    return surf
+
+class SurfaceCache:
+    # LRU of derived surfaces, each entry remembers its source so a recycled id() never matches
+    def __init__(self, max_entries=512):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, source, key):
+        entry = self.entries.get((id(source), key))
+        if entry is None or entry[0] is not source:
+            self.misses += 1
+            return None
+        self.entries.move_to_end((id(source), key))
+        self.hits += 1
+        return entry[1]
+
+    def put(self, source, key, surf):
+        self.entries[(id(source), key)] = (source, surf)
+        self.entries.move_to_end((id(source), key))
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+        return surf
+
+    def clear(self):
+        self.entries.clear()
+        self.hits = 0
+        self.misses = 0
@@ -0,0 +1,290 @@
+import heapq
+import math
+from itertools import count
+
+import numpy as np
+
+from util.framework.utils.pathfinding import PathGrid, SQRT2, astar, distances, octile
+
+# openings shorter than this get one transition in the middle, longer ones get one at each end
+LONG_ENTRANCE = 6
+START = 'start'
+GOAL = 'goal'
+
+
+def path_cost(path):
+    return sum(1.0 if a[0] == b[0] or a[1] == b[1] else SQRT2 for a, b in zip(path, path[1:]))
+
+
+def entrance_offsets(open_cells):
+    edges = np.flatnonzero(np.diff(np.concatenate(([0], open_cells.astype(np.int8), [0]))))
+    offsets = []
+    for start, end in zip(edges[::2], edges[1::2]):
+        if end - start < LONG_ENTRANCE:
+            offsets.append(int(start + end - 1) // 2)
+        else:
+            offsets.extend((int(start), int(end - 1)))
+    return offsets
+
+
+class HierarchicalPathfinder:
+    def __init__(self, tilemap, cluster_size=16, diagonal=True):
+        self.tilemap = tilemap
+        self.cluster_size = cluster_size
+        self.diagonal = diagonal
+
+        self.walk = None
+        self.clusters = (0, 0)
+        # border key -> [(cell, cell)], keys are ('v', cx, cy) for the border right of a cluster, ('h', cx, cy) below it
+        self.transitions = {}
+        # cell -> {cell: cost} across cluster borders
+        self.inter = {}
+        # cluster -> {cell: {cell: cost}} inside the cluster, filled on first use
+        self.intra = {}
+        self.cluster_grids = {}
+        self.dirty = set()
+
+        self.rebuilds = 0
+        tilemap.add_walk_listener(self.on_walkability_changed)
+
+    def release(self):
+        self.tilemap.remove_walk_listener(self.on_walkability_changed)
+
+    def on_walkability_changed(self, grid_pos, walkable):
+        if grid_pos is None:
+            self.walk = None
+        elif self.walk is not None:
+            self.dirty.add(self.cluster_of(grid_pos))
+
+    def cluster_of(self, pos):
+        return (pos[0] // self.cluster_size, pos[1] // self.cluster_size)
+
+    def cluster_rect(self, cluster):
+        size = self.cluster_size
+        height, width = self.walk.shape
+        return (cluster[0] * size, cluster[1] * size,
+                min((cluster[0] + 1) * size, width), min((cluster[1] + 1) * size, height))
+
+    def borders_of(self, cluster):
+        cx, cy = cluster
+        borders = []
+        if cx > 0:
+            borders.append((('v', cx - 1, cy), (cx - 1, cy)))
+        if cx + 1 < self.clusters[0]:
+            borders.append((('v', cx, cy), (cx + 1, cy)))
+        if cy > 0:
+            borders.append((('h', cx, cy - 1), (cx, cy - 1)))
+        if cy + 1 < self.clusters[1]:
+            borders.append((('h', cx, cy), (cx, cy + 1)))
+        return borders
+
+    def refresh(self):
+        if self.walk is None:
+            self.walk = self.tilemap.walkability
+            height, width = self.walk.shape
+            self.clusters = (math.ceil(width / self.cluster_size), math.ceil(height / self.cluster_size))
+            self.transitions = {}
+            self.inter = {}
+            self.intra = {}
+            self.cluster_grids = {}
+            self.dirty = set()
+            for cy in range(self.clusters[1]):
+                for cx in range(self.clusters[0]):
+                    if cx + 1 < self.clusters[0]:
+                        self.scan_border(('v', cx, cy))
+                    if cy + 1 < self.clusters[1]:
+                        self.scan_border(('h', cx, cy))
+            return
+
+        if not self.dirty:
+            return
+
+        borders = set()
+        touched = set()
+        for cluster in self.dirty:
+            touched.add(cluster)
+            self.cluster_grids.pop(cluster, None)
+            for key, neighbor in self.borders_of(cluster):
+                borders.add(key)
+                touched.add(neighbor)
+        for key in borders:
+            self.scan_border(key)
+        for cluster in touched:
+            self.intra.pop(cluster, None)
+        self.rebuilds += len(self.dirty)
+        self.dirty = set()
+
+    def scan_border(self, key):
+        for a, b in self.transitions.pop(key, []):
+            self.unlink(a, b)
+
+        kind, cx, cy = key
+        x0, y0, x1, y1 = self.cluster_rect((cx, cy))
+        if kind == 'v':
+            x = x1 - 1
+            open_cells = self.walk[y0:y1, x] & self.walk[y0:y1, x + 1]
+            pairs = [((x, y0 + i), (x + 1, y0 + i)) for i in entrance_offsets(open_cells)]
+        else:
+            y = y1 - 1
+            open_cells = self.walk[y, x0:x1] & self.walk[y + 1, x0:x1]
+            pairs = [((x0 + i, y), (x0 + i, y + 1)) for i in entrance_offsets(open_cells)]
+
+        self.transitions[key] = pairs
+        for a, b in pairs:
+            self.inter.setdefault(a, {})[b] = 1.0
+            self.inter.setdefault(b, {})[a] = 1.0
+
+    def unlink(self, a, b):
+        for cell, other in ((a, b), (b, a)):
+            links = self.inter.get(cell)
+            if links:
+                links.pop(other, None)
+                if not links:
+                    del self.inter[cell]
+
+    def cluster_nodes(self, cluster):
+        nodes = set()
+        for key, _ in self.borders_of(cluster):
+            for a, b in self.transitions.get(key, ()):
+                nodes.add(a if self.cluster_of(a) == cluster else b)
+        return nodes
+
+    def cluster_grid(self, cluster):
+        if cluster not in self.cluster_grids:
+            x0, y0, x1, y1 = self.cluster_rect(cluster)
+            self.cluster_grids[cluster] = (PathGrid(self.walk[y0:y1, x0:x1]), (x0, y0))
+        return self.cluster_grids[cluster]
+
+    def costs_from(self, cluster, cell, targets):
+        grid, origin = self.cluster_grid(cluster)
+        indices = {grid.index((target[0] - origin[0], target[1] - origin[1])): target for target in targets}
+        settled = distances(grid, (cell[0] - origin[0], cell[1] - origin[1]), targets=indices, diagonal=self.diagonal)
+        return {target: settled[index] for index, target in indices.items() if index in settled}
+
+    def intra_edges(self, cluster):
+        if cluster not in self.intra:
+            nodes = sorted(self.cluster_nodes(cluster))
+            edges = {node: {} for node in nodes}
+            # costs are symmetric, so each search only needs the nodes after it
+            for i, node in enumerate(nodes):
+                for other, cost in self.costs_from(cluster, node, nodes[i + 1:]).items():
+                    edges[node][other] = cost
+                    edges[other][node] = cost
+            self.intra[cluster] = edges
+        return self.intra[cluster]
+
+    def precompute(self):
+        self.refresh()
+        for cy in range(self.clusters[1]):
+            for cx in range(self.clusters[0]):
+                self.intra_edges((cx, cy))
+
+    def local_path(self, cluster, a, b):
+        grid, origin = self.cluster_grid(cluster)
+        path = astar(grid, (a[0] - origin[0], a[1] - origin[1]), (b[0] - origin[0], b[1] - origin[1]),
+                     diagonal=self.diagonal)
+        if path is None:
+            return None
+        return [(x + origin[0], y + origin[1]) for x, y in path]
+
+    def abstract_search(self, start, goal, stats=None):
+        start_cluster = self.cluster_of(start)
+        goal_cluster = self.cluster_of(goal)
+        start_edges = self.costs_from(start_cluster, start, self.cluster_nodes(start_cluster))
+        goal_edges = self.costs_from(goal_cluster, goal, self.cluster_nodes(goal_cluster))
+        if not (start_edges and goal_edges):
+            return None, math.inf
+
+        def heuristic(cell):
+            return octile(abs(cell[0] - goal[0]), abs(cell[1] - goal[1]))
+
+        tie = count()
+        g_score = {START: 0.0}
+        parents = {START: None}
+        heap = [(heuristic(start), next(tie), START)]
+        closed = set()
+        expanded = 0
+        while heap:
+            _, _, node = heapq.heappop(heap)
+            if node == GOAL:
+                break
+            if node in closed:
+                continue
+            closed.add(node)
+            expanded += 1
+            cost = g_score[node]
+
+            if node == START:
+                edges = start_edges.items()
+            else:
+                edges = list(self.intra_edges(self.cluster_of(node))[node].items())
+                edges.extend(self.inter.get(node, {}).items())
+                if node in goal_edges:
+                    edges.append((GOAL, goal_edges[node]))
+
+            for neighbor, step in edges:
+                new_cost = cost + step
+                if new_cost < g_score.get(neighbor, math.inf) - 1e-9:
+                    g_score[neighbor] = new_cost
+                    parents[neighbor] = node
+                    h = 0.0 if neighbor == GOAL else heuristic(neighbor)
+                    heapq.heappush(heap, (new_cost + h, next(tie), neighbor))
+
+        if stats is not None:
+            stats['expanded'] = expanded
+        if GOAL not in parents:
+            return None, math.inf
+
+        nodes = []
+        node = parents[GOAL]
+        while node != START:
+            nodes.append(node)
+            node = parents[node]
+        nodes.reverse()
+        return [start] + nodes + [goal], g_score[GOAL]
+
+    def refine(self, waypoints):
+        path = [waypoints[0]]
+        for a, b in zip(waypoints, waypoints[1:]):
+            if a == b:
+                continue
+            cluster = self.cluster_of(a)
+            if cluster == self.cluster_of(b):
+                segment = self.local_path(cluster, a, b)
+                if segment is None:
+                    return None
+                path.extend(segment[1:])
+            else:
+                path.append(b)
+        return path
+
+    def find_path(self, start, goal, stats=None):
+        self.refresh()
+        start = tuple(start)
+        goal = tuple(goal)
+        height, width = self.walk.shape
+        for x, y in (start, goal):
+            if not (0 <= x < width and 0 <= y < height and self.walk[y, x]):
+                return None
+
+        best = None
+        best_cost = math.inf
+        if self.cluster_of(start) == self.cluster_of(goal):
+            best = self.local_path(self.cluster_of(start), start, goal)
+            if best:
+                best_cost = path_cost(best)
+
+        waypoints, cost = self.abstract_search(start, goal, stats=stats)
+        if waypoints and cost < best_cost - 1e-9:
+            best = self.refine(waypoints)
+        return best
+
+    def stats(self):
+        return {
+            'clusters': self.clusters[0] * self.clusters[1],
+            'nodes': len(self.inter),
+            'inter_edges': sum(len(links) for links in self.inter.values()) // 2,
+            'intra_edges': sum(len(links) for edges in self.intra.values() for links in edges.values()) // 2,
+            'built_clusters': len(self.intra),
+            'rebuilds': self.rebuilds,
+        }
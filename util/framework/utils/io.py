@@ -1,5 +1,24 @@
 import json
 import os
+import re
+from json.encoder import encode_basestring_ascii
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# precompiled so the hooks don't rebuild them for every key
+TUPLE_KEY = re.compile(r't\0\((\d+(?:,\d+)+)\)')
+LOOSE_TUPLE_KEY = re.compile(r'(?:t\0)?\(?(\d+(?:,\d+)+)\)?')
+KEY_STRIP = str.maketrans('', '', ' (),t\0')
+KEY_STRIP_PARENS = str.maketrans('', '', ' ()t\0')
+# orjson turns integers past 64 bits into floats, a float that big sends the text through json instead
+LONG_NUMBER = 2.0 ** 63
+INFINITY = float('inf')
+CONTAINERS = {dict, list}
+
+plain_encode = json.JSONEncoder(check_circular=False).encode
 
 def read_json(path):
     try:
@@ -8,22 +27,57 @@ def read_json(path):
     except (FileNotFoundError, json.JSONDecodeError):
         return {}
 
+def tuple_key(key, loose=False):
+    match = (LOOSE_TUPLE_KEY if loose else TUPLE_KEY).fullmatch(key)
+    if match:
+        return tuple(map(int, match.group(1).split(',')))
+    # spaced or otherwise odd keys keep the original, more forgiving rules
+    if (key.find(',') != -1) and (loose or key[:2] == 't\0') and key.translate(KEY_STRIP).isalnum():
+        return tuple(int(v) for v in key.translate(KEY_STRIP_PARENS).split(','))
+    return None
+
+def convert_keys(obj, loose=False):
+    converted = None
+    for key in obj:
+        if (type(key) == str) and (loose or key[:2] == 't\0') and (key.find(',') != -1):
+            new_key = tuple_key(key, loose)
+            if new_key is not None:
+                if converted is None:
+                    converted = []
+                converted.append((key, new_key))
+    # converted keys move to the end, same order the old hooks left them in
+    if converted:
+        for key, new_key in converted:
+            obj[new_key] = obj.pop(key)
+    return obj
+
 def tjson_hook(obj):
     if type(obj) == dict:
-        for key in list(obj):
-            if (type(key) == str) and (key.translate({ord(k): None for k in ' (),t\0'}).isalnum()) and (key.find(',') != -1) and (key[:2] == 't\0'):
-                new_key = tuple(int(v) for v in key.translate({ord(k): None for k in ' ()t\0'}).split(','))
-                obj[new_key] = obj[key]
-                del obj[key]
+        return convert_keys(obj)
     return obj
 
 def tjson_hook_loose(obj):
     if type(obj) == dict:
-        for key in list(obj):
-            if (type(key) == str) and (key.translate({ord(k): None for k in ' (),t\0'}).isalnum()) and (key.find(',') != -1):
-                new_key = tuple(int(v) for v in key.translate({ord(k): None for k in ' ()t\0'}).split(','))
-                obj[new_key] = obj[key]
-                del obj[key]
+        return convert_keys(obj, loose=True)
+    return obj
+
+def convert_tree(obj, loose=False):
+    # orjson has no object hook, so the keys are converted in one walk afterwards
+    if type(obj) == dict:
+        values = obj.values()
+    elif type(obj) == list:
+        values = obj
+    else:
+        values = (obj,)
+    for value in values:
+        if value.__class__ in CONTAINERS:
+            convert_tree(value, loose)
+        elif (value.__class__ == float) and not (-LONG_NUMBER < value < LONG_NUMBER):
+            raise ValueError('number out of orjson range')
+    if type(obj) == dict:
+        for key in obj:
+            if (loose or key[:2] == 't\0') and (key.find(',') != -1):
+                return convert_keys(obj, loose)
     return obj
 
 def tuple_change_keys(obj, convert):
@@ -44,10 +98,65 @@ def tuplestrkey(obj):
         obj = 't\0' + str(obj).replace(' ', '')
     return obj
 
+def encode_key(key):
+    # the same conversions json.dumps applies to non-string keys
+    if isinstance(key, str):
+        return encode_basestring_ascii(key)
+    if type(key) == tuple:
+        return encode_basestring_ascii(tuplestrkey(key))
+    if key is True:
+        return '"true"'
+    if key is False:
+        return '"false"'
+    if key is None:
+        return '"null"'
+    if isinstance(key, int):
+        return '"' + int.__repr__(key) + '"'
+    if isinstance(key, float):
+        if key != key:
+            return '"NaN"'
+        if key in (INFINITY, -INFINITY):
+            return '"Infinity"' if key > 0 else '"-Infinity"'
+        return '"' + float.__repr__(key) + '"'
+    raise TypeError(f'keys must be str, int, float, bool or None, not {key.__class__.__name__}')
+
+def encode_parts(obj, parts):
+    # the C encoder takes every subtree without tuple keys in one go, only dicts holding them are walked here
+    try:
+        parts.append(plain_encode(obj))
+        return
+    except TypeError:
+        if not isinstance(obj, (dict, list, tuple)):
+            raise
+    if isinstance(obj, dict):
+        separator = '{'
+        for key, value in obj.items():
+            parts.append(separator)
+            parts.append(encode_key(key))
+            parts.append(': ')
+            encode_parts(value, parts)
+            separator = ', '
+        parts.append('}')
+    else:
+        separator = '['
+        for value in obj:
+            parts.append(separator)
+            encode_parts(value, parts)
+            separator = ', '
+        parts.append(']')
+
 def tjson_encode(data):
-    return json.dumps(tuple_change_keys(data, tuplestrkey))
+    parts = []
+    encode_parts(data, parts)
+    return ''.join(parts)
 
 def tjson_decode(data, loose=False):
+    if orjson:
+        try:
+            return convert_tree(orjson.loads(data), loose)
+        except ValueError:
+            # NaN, huge numbers and bad keys are left to json, which also raises the usual errors
+            pass
     if loose:
         return json.loads(data, object_hook=tjson_hook_loose)
     else:
@@ -0,0 +1,200 @@
+import mmap
+import os
+import struct
+
+import numpy as np
+
+from util.framework.utils.io import read_tjson
+
+COMPILED_EXT = '.pmapc'
+MAGIC = b'PMPC'
+VERSION = 1
+
+# magic, version, tile size, dimensions, grid origin, grid size, strings, layers, offgrid tiles, custom entries
+HEADER = struct.Struct('<4sHHHIIiiIIIIII')
+STR_LEN = struct.Struct('<H')
+LAYER_ID = struct.Struct('<i')
+CELL = struct.Struct('<Hhh')
+OFFGRID = struct.Struct('<Hhhddii')
+CUSTOM = struct.Struct('<Iiii')
+CELL_DTYPE = np.dtype([('group', '<u2'), ('tx', '<i2'), ('ty', '<i2')])
+
+EMPTY = 0xFFFF
+
+
+def compiled_path(path):
+    return os.path.splitext(path)[0] + COMPILED_EXT
+
+
+def write_compiled(path, data):
+    strings = []
+    string_ids = {}
+
+    def string_id(value):
+        if value not in string_ids:
+            string_ids[value] = len(strings)
+            strings.append(value)
+        return string_ids[value]
+
+    grid_tiles = data['grid_tiles']
+    offgrid_tiles = list(data['offgrid_tiles']['objects'].values()) if data.get('offgrid_tiles') else []
+    dimensions = tuple(data['dimensions'])
+
+    min_x, min_y = 0, 0
+    max_x, max_y = dimensions[0] - 1, dimensions[1] - 1
+    layers = set()
+    for loc, loc_tiles in grid_tiles.items():
+        min_x, min_y = min(min_x, loc[0]), min(min_y, loc[1])
+        max_x, max_y = max(max_x, loc[0]), max(max_y, loc[1])
+        for tile_data in loc_tiles.values():
+            layers.add(tile_data['layer'])
+    layers = sorted(layers)
+    layer_index = {layer: i for i, layer in enumerate(layers)}
+    grid_w, grid_h = max_x - min_x + 1, max_y - min_y + 1
+
+    cells = [bytearray(CELL.pack(EMPTY, 0, 0) * (grid_w * grid_h)) for _ in layers]
+    custom = []
+    for loc, loc_tiles in grid_tiles.items():
+        for tile_data in loc_tiles.values():
+            index = (loc[1] - min_y) * grid_w + (loc[0] - min_x)
+            tile_id = tile_data['tile_id']
+            CELL.pack_into(cells[layer_index[tile_data['layer']]], index * CELL.size,
+                           string_id(tile_data['group']), tile_id[0], tile_id[1])
+            if tile_data.get('c'):
+                custom.append(CUSTOM.pack(layer_index[tile_data['layer']], loc[0], loc[1], string_id(tile_data['c'])))
+
+    offgrid = []
+    for tile_data in offgrid_tiles:
+        tile_id = tile_data['tile_id']
+        offgrid.append(OFFGRID.pack(string_id(tile_data['group']), tile_id[0], tile_id[1],
+                                    tile_data['pos'][0], tile_data['pos'][1], tile_data['layer'],
+                                    string_id(tile_data['c']) if tile_data.get('c') else -1))
+
+    encoded = [s.encode('utf-8') for s in strings]
+    parts = [HEADER.pack(MAGIC, VERSION, *data['tile_size'], *dimensions, min_x, min_y, grid_w, grid_h,
+                         len(strings), len(layers), len(offgrid), len(custom))]
+    for s in encoded:
+        parts.append(STR_LEN.pack(len(s)))
+        parts.append(s)
+    for layer in layers:
+        parts.append(LAYER_ID.pack(layer))
+    parts.extend(cells)
+    parts.extend(offgrid)
+    parts.extend(custom)
+
+    if os.path.dirname(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as f:
+        f.write(b''.join(parts))
+    return path
+
+
+def compile_pmap(src, dst=None):
+    return write_compiled(dst or compiled_path(src), read_tjson(src))
+
+
+class CompiledMap:
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, 'rb')
+        self.buffer = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        header = HEADER.unpack_from(self.buffer, 0)
+        if header[0] != MAGIC or header[1] != VERSION:
+            self.close()
+            raise ValueError(f"{path} is not a compiled map (version {VERSION})")
+
+        self.tile_size = (header[2], header[3])
+        self.dimensions = (header[4], header[5])
+        self.origin = (header[6], header[7])
+        self.grid_size = (header[8], header[9])
+        string_count, layer_count, offgrid_count, custom_count = header[10:14]
+
+        offset = HEADER.size
+        self.strings = []
+        for _ in range(string_count):
+            length = STR_LEN.unpack_from(self.buffer, offset)[0]
+            offset += STR_LEN.size
+            self.strings.append(self.buffer[offset:offset + length].decode('utf-8'))
+            offset += length
+
+        self.layers = [LAYER_ID.unpack_from(self.buffer, offset + i * LAYER_ID.size)[0] for i in range(layer_count)]
+        offset += layer_count * LAYER_ID.size
+
+        self.layer_stride = self.grid_size[0] * self.grid_size[1] * CELL.size
+        self.cells_offset = offset
+        offset += layer_count * self.layer_stride
+
+        self.offgrid = [OFFGRID.unpack_from(self.buffer, offset + i * OFFGRID.size) for i in range(offgrid_count)]
+        offset += offgrid_count * OFFGRID.size
+
+        self.custom = {}
+        for i in range(custom_count):
+            layer_i, x, y, string_i = CUSTOM.unpack_from(self.buffer, offset + i * CUSTOM.size)
+            self.custom[(layer_i, x, y)] = self.strings[string_i]
+
+    def close(self):
+        self.buffer.close()
+        self.file.close()
+
+    def cell(self, layer_i, grid_pos):
+        x, y = grid_pos[0] - self.origin[0], grid_pos[1] - self.origin[1]
+        if not (0 <= x < self.grid_size[0] and 0 <= y < self.grid_size[1]):
+            return None
+        group, tx, ty = CELL.unpack_from(self.buffer, self.cells_offset + layer_i * self.layer_stride
+                                         + (y * self.grid_size[0] + x) * CELL.size)
+        if group == EMPTY:
+            return None
+        return self.strings[group], (tx, ty)
+
+    def layer_cells(self, layer_i):
+        # a view into the mapped file, it has to be gone before close()
+        return np.frombuffer(self.buffer, dtype=CELL_DTYPE, count=self.grid_size[0] * self.grid_size[1],
+                             offset=self.cells_offset + layer_i * self.layer_stride).reshape(self.grid_size[1],
+                                                                                            self.grid_size[0])
+
+    def map_window(self, dimensions):
+        # (rows, cols) slices into a dimensions sized map and the matching slices into the cell arrays
+        x0, y0 = max(0, self.origin[0]), max(0, self.origin[1])
+        x1 = min(dimensions[0], self.origin[0] + self.grid_size[0])
+        y1 = min(dimensions[1], self.origin[1] + self.grid_size[1])
+        if x1 <= x0 or y1 <= y0:
+            return None
+        return ((slice(y0, y1), slice(x0, x1)),
+                (slice(y0 - self.origin[1], y1 - self.origin[1]), slice(x0 - self.origin[0], x1 - self.origin[0])))
+
+    def iter_grid(self, area=None):
+        # area is (x0, y0, x1, y1) in grid coords, end exclusive
+        if area is None:
+            x0, y0 = self.origin
+            x1, y1 = x0 + self.grid_size[0], y0 + self.grid_size[1]
+        else:
+            x0, y0 = max(area[0], self.origin[0]), max(area[1], self.origin[1])
+            x1 = min(area[2], self.origin[0] + self.grid_size[0])
+            y1 = min(area[3], self.origin[1] + self.grid_size[1])
+        if x1 <= x0 or y1 <= y0:
+            return
+
+        strings = self.strings
+        row_bytes = (x1 - x0) * CELL.size
+        for layer_i, layer in enumerate(self.layers):
+            base = self.cells_offset + layer_i * self.layer_stride
+            for y in range(y0, y1):
+                start = base + ((y - self.origin[1]) * self.grid_size[0] + (x0 - self.origin[0])) * CELL.size
+                x = x0
+                for group, tx, ty in CELL.iter_unpack(self.buffer[start:start + row_bytes]):
+                    if group != EMPTY:
+                        tile_data = {'group': strings[group], 'tile_id': (tx, ty), 'pos': (x, y), 'layer': layer}
+                        if (layer_i, x, y) in self.custom:
+                            tile_data['c'] = self.custom[(layer_i, x, y)]
+                        yield tile_data
+                    x += 1
+
+    def iter_offgrid(self, rect=None):
+        for group, tx, ty, x, y, layer, custom in self.offgrid:
+            if rect and not rect.collidepoint(x, y):
+                continue
+            tile_data = {'group': self.strings[group], 'tile_id': (tx, ty), 'pos': (x, y), 'layer': layer}
+            if custom != -1:
+                tile_data['c'] = self.strings[custom]
+            yield tile_data
@@ -0,0 +1,543 @@
+import heapq
+import math
+import time
+from collections import OrderedDict, deque
+
+import numpy as np
+
+from util.framework.globals import G
+
+SQRT2 = math.sqrt(2)
+DIAGONAL_EXTRA = SQRT2 - 2
+
+
+def octile(dx, dy):
+    return dx + dy + DIAGONAL_EXTRA * min(dx, dy)
+
+
+class PathGrid:
+    def __init__(self, walkable):
+        walkable = np.asarray(walkable, dtype=bool)
+        self.height, self.width = walkable.shape
+        # a blocked border on every side, so neighbour lookups never need a bounds check
+        self.stride = self.width + 2
+        padded = np.zeros((self.height + 2, self.width + 2), dtype=np.uint8)
+        padded[1:-1, 1:-1] = walkable
+        self.cells = bytearray(padded.tobytes())
+        self.version = 0
+
+    def in_bounds(self, pos):
+        return 0 <= pos[0] < self.width and 0 <= pos[1] < self.height
+
+    def index(self, pos):
+        return (pos[1] + 1) * self.stride + pos[0] + 1
+
+    def pos(self, index):
+        y, x = divmod(index, self.stride)
+        return (x - 1, y - 1)
+
+    def walkable(self, pos):
+        return self.in_bounds(pos) and bool(self.cells[self.index(pos)])
+
+    def set(self, pos, walkable):
+        if self.in_bounds(pos):
+            self.cells[self.index(pos)] = 1 if walkable else 0
+            self.version += 1
+
+    def moves(self, diagonal=True):
+        stride = self.stride
+        # (index delta, cost, side a, side b), diagonals need both sides open so corners are never cut
+        moves = [(1, 1.0, 0, 0), (-1, 1.0, 0, 0), (stride, 1.0, 0, 0), (-stride, 1.0, 0, 0)]
+        if diagonal:
+            for dx in (-1, 1):
+                for dy in (-1, 1):
+                    moves.append((dx + dy * stride, SQRT2, dx, dy * stride))
+        return moves
+
+
+def build_path(grid, parents, index):
+    path = []
+    while index is not None:
+        path.append(grid.pos(index))
+        index = parents[index]
+    path.reverse()
+    return path
+
+
+def astar(grid, start, goal, diagonal=True, stats=None):
+    if not (grid.walkable(start) and grid.walkable(goal)):
+        return None
+
+    cells = grid.cells
+    stride = grid.stride
+    moves = grid.moves(diagonal)
+    start_index = grid.index(start)
+    goal_index = grid.index(goal)
+    goal_x, goal_y = goal[0] + 1, goal[1] + 1
+
+    g_score = {start_index: 0.0}
+    parents = {start_index: None}
+    # ties go to the deeper node, which keeps the frontier narrow on open ground
+    heap = [(0.0, 0.0, start_index)]
+    expanded = 0
+
+    while heap:
+        _, cost, current = heapq.heappop(heap)
+        cost = -cost
+        if cost > g_score[current]:
+            continue
+        if current == goal_index:
+            if stats is not None:
+                stats['expanded'] = expanded
+            return build_path(grid, parents, current)
+        expanded += 1
+
+        for delta, step, side_a, side_b in moves:
+            neighbor = current + delta
+            if not cells[neighbor]:
+                continue
+            if side_a and not (cells[current + side_a] and cells[current + side_b]):
+                continue
+            new_cost = cost + step
+            if new_cost < g_score.get(neighbor, math.inf):
+                g_score[neighbor] = new_cost
+                parents[neighbor] = current
+                y, x = divmod(neighbor, stride)
+                dx = abs(x - goal_x)
+                dy = abs(y - goal_y)
+                h = octile(dx, dy) if diagonal else dx + dy
+                heapq.heappush(heap, (new_cost + h, -new_cost, neighbor))
+
+    if stats is not None:
+        stats['expanded'] = expanded
+    return None
+
+
+def distances(grid, start, targets=None, diagonal=True):
+    # dijkstra from start, stops early once every target index is settled
+    cells = grid.cells
+    moves = grid.moves(diagonal)
+    start_index = grid.index(start)
+    remaining = set(targets) if targets is not None else None
+
+    settled = {}
+    best = {start_index: 0.0}
+    heap = [(0.0, start_index)]
+    while heap:
+        cost, current = heapq.heappop(heap)
+        if current in settled:
+            continue
+        settled[current] = cost
+        if remaining is not None:
+            remaining.discard(current)
+            if not remaining:
+                break
+
+        for delta, step, side_a, side_b in moves:
+            neighbor = current + delta
+            if not cells[neighbor] or neighbor in settled:
+                continue
+            if side_a and not (cells[current + side_a] and cells[current + side_b]):
+                continue
+            new_cost = cost + step
+            if new_cost < best.get(neighbor, math.inf):
+                best[neighbor] = new_cost
+                heapq.heappush(heap, (new_cost, neighbor))
+    return settled
+
+
+def jump_straight(cells, stride, index, dx, dy, goal):
+    if dx:
+        back = -dx
+        while True:
+            if not cells[index]:
+                return None
+            if index == goal:
+                return index
+            if (cells[index - stride] and not cells[index - stride + back]) or \
+                    (cells[index + stride] and not cells[index + stride + back]):
+                return index
+            index += dx
+    else:
+        step = dy * stride
+        while True:
+            if not cells[index]:
+                return None
+            if index == goal:
+                return index
+            if (cells[index - 1] and not cells[index - 1 - step]) or \
+                    (cells[index + 1] and not cells[index + 1 - step]):
+                return index
+            index += step
+
+
+def jump(cells, stride, index, dx, dy, goal):
+    if not (dx and dy):
+        return jump_straight(cells, stride, index, dx, dy, goal)
+
+    step_y = dy * stride
+    while True:
+        if not cells[index]:
+            return None
+        if index == goal:
+            return index
+        if jump_straight(cells, stride, index + dx, dx, 0, goal) is not None or \
+                jump_straight(cells, stride, index + step_y, 0, dy, goal) is not None:
+            return index
+        if not (cells[index + dx] and cells[index + step_y]):
+            return None
+        index += dx + step_y
+
+
+def jps_directions(cells, stride, index, parent):
+    if parent is None:
+        directions = []
+        for dx, dy in ((1, 0), (-1, 0), (0, 1), (0, -1)):
+            if cells[index + dx + dy * stride]:
+                directions.append((dx, dy))
+        for dx in (-1, 1):
+            for dy in (-1, 1):
+                if cells[index + dx] and cells[index + dy * stride]:
+                    directions.append((dx, dy))
+        return directions
+
+    y, x = divmod(index, stride)
+    parent_y, parent_x = divmod(parent, stride)
+    dx = (x > parent_x) - (x < parent_x)
+    dy = (y > parent_y) - (y < parent_y)
+
+    directions = []
+    if dx and dy:
+        open_y = cells[index + dy * stride]
+        open_x = cells[index + dx]
+        if open_y:
+            directions.append((0, dy))
+        if open_x:
+            directions.append((dx, 0))
+        if open_x and open_y:
+            directions.append((dx, dy))
+    elif dx:
+        ahead = cells[index + dx]
+        below = cells[index + stride]
+        above = cells[index - stride]
+        if ahead:
+            directions.append((dx, 0))
+            if below:
+                directions.append((dx, 1))
+            if above:
+                directions.append((dx, -1))
+        if below:
+            directions.append((0, 1))
+        if above:
+            directions.append((0, -1))
+    else:
+        ahead = cells[index + dy * stride]
+        right = cells[index + 1]
+        left = cells[index - 1]
+        if ahead:
+            directions.append((0, dy))
+            if right:
+                directions.append((1, dy))
+            if left:
+                directions.append((-1, dy))
+        if right:
+            directions.append((1, 0))
+        if left:
+            directions.append((-1, 0))
+    return directions
+
+
+def expand_jumps(points):
+    if not points:
+        return points
+    path = [points[0]]
+    for (x0, y0), (x1, y1) in zip(points, points[1:]):
+        sx = (x1 > x0) - (x1 < x0)
+        sy = (y1 > y0) - (y1 < y0)
+        for i in range(1, max(abs(x1 - x0), abs(y1 - y0)) + 1):
+            path.append((x0 + sx * i, y0 + sy * i))
+    return path
+
+
+def jps(grid, start, goal, stats=None):
+    if not (grid.walkable(start) and grid.walkable(goal)):
+        return None
+
+    cells = grid.cells
+    stride = grid.stride
+    start_index = grid.index(start)
+    goal_index = grid.index(goal)
+    goal_y, goal_x = divmod(goal_index, stride)
+
+    g_score = {start_index: 0.0}
+    parents = {start_index: None}
+    heap = [(0.0, 0.0, start_index)]
+    expanded = 0
+
+    while heap:
+        _, cost, current = heapq.heappop(heap)
+        cost = -cost
+        if cost > g_score[current]:
+            continue
+        if current == goal_index:
+            if stats is not None:
+                stats['expanded'] = expanded
+            return expand_jumps(build_path(grid, parents, current))
+        expanded += 1
+
+        y, x = divmod(current, stride)
+        for dx, dy in jps_directions(cells, stride, current, parents[current]):
+            point = jump(cells, stride, current + dx + dy * stride, dx, dy, goal_index)
+            if point is None:
+                continue
+            point_y, point_x = divmod(point, stride)
+            new_cost = cost + octile(abs(point_x - x), abs(point_y - y))
+            if new_cost < g_score.get(point, math.inf):
+                g_score[point] = new_cost
+                parents[point] = current
+                h = octile(abs(point_x - goal_x), abs(point_y - goal_y))
+                heapq.heappush(heap, (new_cost + h, -new_cost, point))
+
+    if stats is not None:
+        stats['expanded'] = expanded
+    return None
+
+
+def line_cells(a, b):
+    # every cell the segment between the two cell centres touches, both sides when it passes through a corner
+    x, y = a
+    dx = abs(b[0] - x)
+    dy = abs(b[1] - y)
+    sx = 1 if b[0] > x else -1
+    sy = 1 if b[1] > y else -1
+    error = dx - dy
+    remaining = dx + dy
+
+    cells = [(x, y)]
+    while remaining > 0:
+        if error > 0:
+            x += sx
+            error -= dy * 2
+            remaining -= 1
+        elif error < 0:
+            y += sy
+            error += dx * 2
+            remaining -= 1
+        else:
+            cells.append((x + sx, y))
+            cells.append((x, y + sy))
+            x += sx
+            y += sy
+            error += (dx - dy) * 2
+            remaining -= 2
+        cells.append((x, y))
+    return cells
+
+
+def line_of_sight(grid, a, b):
+    cells = grid.cells
+    for pos in line_cells(a, b):
+        if not (grid.in_bounds(pos) and cells[grid.index(pos)]):
+            return False
+    return True
+
+
+def smooth_path(grid, path):
+    if not path or len(path) < 3:
+        return path
+
+    smoothed = [path[0]]
+    anchor = path[0]
+    for i in range(2, len(path)):
+        if not line_of_sight(grid, anchor, path[i]):
+            anchor = path[i - 1]
+            smoothed.append(anchor)
+    smoothed.append(path[-1])
+    return smoothed
+
+
+def path_cells(path):
+    cells = set()
+    for a, b in zip(path, path[1:]):
+        cells.update(line_cells(a, b))
+    cells.update(path)
+    return cells
+
+
+class PathRequest:
+    __slots__ = ('start', 'goal', 'callback', 'path', 'done', 'cancelled')
+
+    def __init__(self, start, goal, callback=None):
+        self.start = tuple(start)
+        self.goal = tuple(goal)
+        self.callback = callback
+        self.path = None
+        self.done = False
+        self.cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
+
+    def resolve(self, path):
+        self.path = path
+        self.done = True
+        if self.callback and not self.cancelled:
+            try:
+                self.callback(path)
+            except Exception as e:
+                print(f"Exception in path callback: {e}")
+
+
+class Pathfinder:
+    def __init__(self, tilemap, algorithm='jps', diagonal=True, smooth=True, budget=0.002, cache_size=256,
+                 cluster_size=16):
+        self.tilemap = tilemap
+        self.algorithm = algorithm
+        self.diagonal = diagonal
+        self.smooth = smooth
+        # seconds of search time per update, at least one queued request is always served
+        self.budget = budget
+        self.cache_size = cache_size
+
+        self.grid = None
+        self.cluster_size = cluster_size
+        self.hierarchy = None
+        self.queue = deque()
+        # (start, goal) -> path, failed searches are cached as None until a cell opens up
+        self.cache = OrderedDict()
+        self.cell_paths = {}
+
+        self.searches = 0
+        self.cache_hits = 0
+        self.invalidated = 0
+
+        tilemap.add_walk_listener(self.on_walkability_changed)
+
+    def release(self):
+        self.tilemap.remove_walk_listener(self.on_walkability_changed)
+        if self.hierarchy:
+            self.hierarchy.release()
+
+    @property
+    def path_grid(self):
+        if self.grid is None:
+            self.grid = PathGrid(self.tilemap.walkability)
+        return self.grid
+
+    def grid_pos(self, world_pos):
+        return (int(world_pos[0] // self.tilemap.tile_size[0]), int(world_pos[1] // self.tilemap.tile_size[1]))
+
+    def world_pos(self, grid_pos):
+        return ((grid_pos[0] + 0.5) * self.tilemap.tile_size[0], (grid_pos[1] + 0.5) * self.tilemap.tile_size[1])
+
+    def world_path(self, path):
+        return [self.world_pos(pos) for pos in path] if path else path
+
+    def search(self, start, goal, stats=None):
+        grid = self.path_grid
+        self.searches += 1
+        if self.algorithm == 'hpa':
+            if self.hierarchy is None:
+                from util.framework.utils.hierarchy import HierarchicalPathfinder
+                self.hierarchy = HierarchicalPathfinder(self.tilemap, cluster_size=self.cluster_size,
+                                                        diagonal=self.diagonal)
+            path = self.hierarchy.find_path(start, goal, stats=stats)
+        elif self.algorithm == 'jps' and self.diagonal:
+            path = jps(grid, start, goal, stats=stats)
+        else:
+            path = astar(grid, start, goal, diagonal=self.diagonal, stats=stats)
+        if path and self.smooth:
+            path = smooth_path(grid, path)
+        return path
+
+    def find_path(self, start, goal):
+        key = (tuple(start), tuple(goal))
+        if key in self.cache:
+            self.cache.move_to_end(key)
+            self.cache_hits += 1
+            return self.cache[key]
+
+        path = self.search(*key)
+        self.store(key, path)
+        return path
+
+    def store(self, key, path):
+        self.cache[key] = path
+        if path:
+            for pos in path_cells(path):
+                self.cell_paths.setdefault(pos, set()).add(key)
+        while len(self.cache) > self.cache_size:
+            self.forget(next(iter(self.cache)))
+
+    def forget(self, key):
+        path = self.cache.pop(key, None)
+        if path:
+            for pos in path_cells(path):
+                keys = self.cell_paths.get(pos)
+                if keys:
+                    keys.discard(key)
+                    if not keys:
+                        del self.cell_paths[pos]
+
+    def clear_cache(self):
+        self.cache.clear()
+        self.cell_paths.clear()
+
+    def on_walkability_changed(self, grid_pos, walkable):
+        if grid_pos is None:
+            self.grid = None
+            self.invalidated += len(self.cache)
+            self.clear_cache()
+            return
+
+        if self.grid is not None:
+            self.grid.set(grid_pos, walkable)
+
+        if walkable:
+            # existing routes stay valid, only searches that found nothing can change
+            stale = [key for key, path in self.cache.items() if path is None]
+        else:
+            stale = list(self.cell_paths.get(grid_pos, ()))
+        for key in stale:
+            self.forget(key)
+        self.invalidated += len(stale)
+
+    def request(self, start, goal, callback=None):
+        request = PathRequest(start, goal, callback=callback)
+        key = (request.start, request.goal)
+        if key in self.cache:
+            self.cache.move_to_end(key)
+            self.cache_hits += 1
+            request.resolve(self.cache[key])
+        else:
+            self.queue.append(request)
+        return request
+
+    async def path(self, start, goal):
+        request = self.request(start, goal)
+        if not request.done:
+            await G.scheduler.until(lambda: request.done)
+        return request.path
+
+    def update(self, budget=None):
+        budget = self.budget if budget is None else budget
+        deadline = time.perf_counter() + budget
+        served = 0
+        while self.queue:
+            request = self.queue.popleft()
+            if request.cancelled:
+                continue
+            request.resolve(self.find_path(request.start, request.goal))
+            served += 1
+            if time.perf_counter() >= deadline:
+                break
+        return served
+
+    def stats(self):
+        return {
+            'queued': len(self.queue),
+            'cached': len(self.cache),
+            'searches': self.searches,
+            'cache_hits': self.cache_hits,
+            'invalidated': self.invalidated,
+        }
@@ -0,0 +1,175 @@
+import functools
+import json
+import os
+import time
+from collections import deque
+
+import pygame
+
+from util.framework.globals import G
+
+perf_counter = time.perf_counter
+
+
+class NullSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+NULL_SPAN = NullSpan()
+
+
+class Span:
+    __slots__ = ('profiler', 'name', 'start', 'depth')
+
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self):
+        self.depth = self.profiler.depth
+        self.profiler.depth += 1
+        self.start = perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        end = perf_counter()
+        self.profiler.depth -= 1
+        self.profiler.spans.append((self.name, self.start, end, self.depth))
+        return False
+
+
+class Profiler:
+    def __init__(self, enabled=False, capacity=300):
+        self.enabled = enabled
+        self.overlay = False
+        # each frame is (index, start, end, [(name, start, end, depth), ...])
+        self.frames = deque(maxlen=capacity)
+        self.spans = []
+        self.depth = 0
+        self.frame_index = 0
+        self.frame_start = None
+        self.origin = perf_counter()
+        self.font = None
+
+    def enable(self, overlay=None):
+        self.enabled = True
+        if overlay is not None:
+            self.overlay = overlay
+
+    def disable(self):
+        self.enabled = False
+        self.overlay = False
+        self.spans = []
+        self.depth = 0
+        self.frame_start = None
+
+    def toggle(self):
+        if self.enabled:
+            self.disable()
+        else:
+            self.enable(overlay=True)
+
+    def span(self, name):
+        if not self.enabled:
+            return NULL_SPAN
+        return Span(self, name)
+
+    def profile(self, name=None):
+        def decorator(func):
+            span_name = name or func.__qualname__
+
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return func(*args, **kwargs)
+                with Span(self, span_name):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def begin_frame(self):
+        if not self.enabled:
+            return
+        self.frame_start = perf_counter()
+        self.spans = []
+        self.depth = 0
+
+    def end_frame(self):
+        if not self.enabled or self.frame_start is None:
+            return
+        self.frames.append((self.frame_index, self.frame_start, perf_counter(), self.spans))
+        self.frame_index += 1
+        self.spans = []
+        self.frame_start = None
+
+    def clear(self):
+        self.frames.clear()
+        self.spans = []
+        self.frame_index = 0
+
+    def stats(self, frames=None):
+        frames = list(self.frames)[-frames:] if frames else list(self.frames)
+        totals = {}
+        for _, frame_start, frame_end, spans in frames:
+            per_frame = {'frame': frame_end - frame_start}
+            for name, start, end, _ in spans:
+                per_frame[name] = per_frame.get(name, 0) + end - start
+            for name, duration in per_frame.items():
+                if name not in totals:
+                    totals[name] = []
+                totals[name].append(duration)
+
+        return {name: {'mean_ms': sum(samples) / len(frames) * 1000, 'max_ms': max(samples) * 1000}
+                for name, samples in totals.items()}
+
+    def chrome_trace(self):
+        events = []
+        for index, frame_start, frame_end, spans in self.frames:
+            events.append({'name': 'frame', 'ph': 'X', 'pid': 0, 'tid': 0,
+                           'ts': (frame_start - self.origin) * 1e6, 'dur': (frame_end - frame_start) * 1e6,
+                           'args': {'frame': index}})
+            for name, start, end, depth in spans:
+                events.append({'name': name, 'ph': 'X', 'pid': 0, 'tid': 0,
+                               'ts': (start - self.origin) * 1e6, 'dur': (end - start) * 1e6,
+                               'args': {'frame': index, 'depth': depth}})
+        return {'traceEvents': events, 'displayTimeUnit': 'ms'}
+
+    def export_chrome_trace(self, path):
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w') as f:
+            json.dump(self.chrome_trace(), f)
+        return path
+
+    def draw_overlay(self, surface, pos=(2, 2), frames=60, budget_ms=1000 / 60):
+        if not (self.enabled and self.overlay and self.frames):
+            return None
+
+        if self.font is None:
+            if not pygame.font.get_init():
+                pygame.font.init()
+            self.font = pygame.font.Font(None, 12)
+
+        stats = self.stats(frames=frames)
+        names = ['frame'] + sorted((name for name in stats if name != 'frame'), key=lambda name: -stats[name]['mean_ms'])
+        y = pos[1]
+        drawn = pygame.Rect(pos, (0, 0))
+        for name in names:
+            mean = stats[name]['mean_ms']
+            width = max(1, int(min(mean / budget_ms, 1) * 40))
+            pygame.draw.rect(surface, (255, 80, 80) if mean > budget_ms else (80, 255, 120), (pos[0], y + 2, width, 4))
+            text = self.font.render(f"{name} {mean:.2f}ms", False, (255, 255, 255))
+            drawn.union_ip(surface.blit(text, (pos[0] + 44, y)))
+            drawn.union_ip((pos[0], y + 2, width, 4))
+            y += text.get_height()
+        return drawn
+
+
+profiler = Profiler()
+G.register('profiler', profiler)
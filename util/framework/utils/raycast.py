@@ -0,0 +1,243 @@
+import math
+from collections import OrderedDict
+
+import numpy as np
+
+RAY_SOLID = 1
+RAY_PLATFORM = 2
+RAY_UNWALKABLE = 4
+# movement is confined to the walk zone, so by default that is what blocks sight too
+RAY_BLOCKING = RAY_UNWALKABLE
+RAY_ALL = RAY_SOLID | RAY_PLATFORM | RAY_UNWALKABLE
+
+# quadrant transforms for shadowcasting, (row dx, row dy, column dx, column dy) for north, south, east, west
+QUADRANTS = [(0, -1, 1, 0), (0, 1, 1, 0), (1, 0, 0, 1), (-1, 0, 0, 1)]
+
+
+class SolidGrid:
+    def __init__(self, width, height, fill=0):
+        self.width = width
+        self.height = height
+        self.cells = bytearray([fill]) * (width * height)
+        # a view on the same bytes for the batched queries
+        self.array = np.frombuffer(self.cells, dtype=np.uint8).reshape(height, width)
+        self.version = 0
+
+    def in_bounds(self, cell):
+        return 0 <= cell[0] < self.width and 0 <= cell[1] < self.height
+
+    def get(self, cell):
+        if not self.in_bounds(cell):
+            return 0
+        return self.cells[cell[1] * self.width + cell[0]]
+
+    def set(self, cell, flags):
+        if not self.in_bounds(cell):
+            return
+        index = cell[1] * self.width + cell[0]
+        if self.cells[index] != flags:
+            self.cells[index] = flags
+            self.version += 1
+
+
+class RayHit:
+    __slots__ = ('distance', 'point', 'cell', 'normal', 'flags')
+
+    def __init__(self, distance, point, cell, normal, flags):
+        self.distance = distance
+        self.point = point
+        self.cell = cell
+        self.normal = normal
+        self.flags = flags
+
+    def __repr__(self):
+        return f"RayHit(distance={self.distance:.2f}, cell={self.cell}, normal={self.normal})"
+
+
+def normalize(direction):
+    length = math.hypot(direction[0], direction[1])
+    if not length:
+        return None
+    return (direction[0] / length, direction[1] / length)
+
+
+def raycast(grid, tile_size, origin, direction, max_dist, mask=RAY_BLOCKING):
+    direction = normalize(direction)
+    if direction is None:
+        return None
+
+    tile_w, tile_h = tile_size
+    dx, dy = direction
+    x = int(origin[0] // tile_w)
+    y = int(origin[1] // tile_h)
+    step_x = 1 if dx > 0 else -1
+    step_y = 1 if dy > 0 else -1
+    # distance along the ray to the next vertical / horizontal cell boundary, and between boundaries
+    t_max_x = (((x + (dx > 0)) * tile_w - origin[0]) / dx) if dx else math.inf
+    t_max_y = (((y + (dy > 0)) * tile_h - origin[1]) / dy) if dy else math.inf
+    t_delta_x = tile_w / abs(dx) if dx else math.inf
+    t_delta_y = tile_h / abs(dy) if dy else math.inf
+
+    cells = grid.cells
+    width = grid.width
+    height = grid.height
+    t = 0.0
+    normal = (0, 0)
+    while t <= max_dist:
+        if not (0 <= x < width and 0 <= y < height):
+            return None
+        flags = cells[y * width + x]
+        if flags & mask:
+            return RayHit(t, (origin[0] + dx * t, origin[1] + dy * t), (x, y), normal, flags)
+        if t_max_x < t_max_y:
+            t = t_max_x
+            t_max_x += t_delta_x
+            x += step_x
+            normal = (-step_x, 0)
+        else:
+            t = t_max_y
+            t_max_y += t_delta_y
+            y += step_y
+            normal = (0, -step_y)
+    return None
+
+
+def raycast_many(grid, tile_size, origins, directions, max_dist, mask=RAY_BLOCKING):
+    origins = np.asarray(origins, dtype=np.float64).reshape(-1, 2)
+    directions = np.asarray(directions, dtype=np.float64).reshape(-1, 2)
+    count = len(origins)
+    max_dist = np.broadcast_to(np.asarray(max_dist, dtype=np.float64), (count,))
+    tile_w, tile_h = tile_size
+
+    lengths = np.hypot(directions[:, 0], directions[:, 1])
+    moving = lengths > 0
+    dx = np.zeros(count)
+    dy = np.zeros(count)
+    dx[moving] = directions[moving, 0] / lengths[moving]
+    dy[moving] = directions[moving, 1] / lengths[moving]
+
+    cell_x = np.floor_divide(origins[:, 0], tile_w).astype(np.intp)
+    cell_y = np.floor_divide(origins[:, 1], tile_h).astype(np.intp)
+    step_x = np.where(dx > 0, 1, -1)
+    step_y = np.where(dy > 0, 1, -1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        t_max_x = np.where(dx != 0, ((cell_x + (dx > 0)) * tile_w - origins[:, 0]) / dx, np.inf)
+        t_max_y = np.where(dy != 0, ((cell_y + (dy > 0)) * tile_h - origins[:, 1]) / dy, np.inf)
+        t_delta_x = np.where(dx != 0, tile_w / np.abs(dx), np.inf)
+        t_delta_y = np.where(dy != 0, tile_h / np.abs(dy), np.inf)
+    t = np.zeros(count)
+    normal_x = np.zeros(count, dtype=np.int8)
+    normal_y = np.zeros(count, dtype=np.int8)
+
+    distances = np.full(count, np.inf)
+    hit_cells = np.full((count, 2), -1, dtype=np.intp)
+    normals = np.zeros((count, 2), dtype=np.int8)
+
+    # every pass moves each live ray one cell, so the work scales with rays in flight rather than the map
+    active = np.flatnonzero(moving)
+    solid = grid.array
+    while active.size:
+        x = cell_x[active]
+        y = cell_y[active]
+        inside = (x >= 0) & (x < grid.width) & (y >= 0) & (y < grid.height) & (t[active] <= max_dist[active])
+        flags = np.zeros(active.size, dtype=np.uint8)
+        flags[inside] = solid[y[inside], x[inside]]
+        hit = inside & ((flags & mask) != 0)
+
+        done = active[hit]
+        distances[done] = t[done]
+        hit_cells[done, 0] = cell_x[done]
+        hit_cells[done, 1] = cell_y[done]
+        normals[done, 0] = normal_x[done]
+        normals[done, 1] = normal_y[done]
+
+        active = active[inside & ~hit]
+        if not active.size:
+            break
+
+        along_x = t_max_x[active] < t_max_y[active]
+        ax = active[along_x]
+        ay = active[~along_x]
+        t[ax] = t_max_x[ax]
+        t_max_x[ax] += t_delta_x[ax]
+        cell_x[ax] += step_x[ax]
+        normal_x[ax] = -step_x[ax]
+        normal_y[ax] = 0
+        t[ay] = t_max_y[ay]
+        t_max_y[ay] += t_delta_y[ay]
+        cell_y[ay] += step_y[ay]
+        normal_x[ay] = 0
+        normal_y[ay] = -step_y[ay]
+
+    points = origins + np.stack((dx, dy), axis=1) * np.where(np.isfinite(distances), distances, 0)[:, None]
+    return distances, hit_cells, normals, points
+
+
+def shadowcast(grid, origin, radius, mask=RAY_BLOCKING):
+    # symmetric shadowcasting, an open cell sees another open cell exactly when it is seen back from there;
+    # opaque cells that are seen are part of the result
+    visible = {origin} if grid.in_bounds(origin) else set()
+    for quadrant in QUADRANTS:
+        scan_row(grid, origin, radius, mask, quadrant, 1, (-1, 1), (1, 1), visible)
+    return visible
+
+
+def scan_row(grid, origin, radius, mask, quadrant, depth, start, end, visible):
+    if depth > radius:
+        return
+    ox, oy = origin
+    row_x, row_y, col_x, col_y = quadrant
+    cells = grid.cells
+    width = grid.width
+    radius_squared = radius * radius
+    # slopes are (numerator, denominator) so the edge tests stay exact, columns on a tie round towards the row
+    min_col = (2 * depth * start[0] + start[1]) // (2 * start[1])
+    max_col = -((end[1] - 2 * depth * end[0]) // (2 * end[1]))
+    prev_opaque = None
+    for col in range(min_col, max_col + 1):
+        x = ox + depth * row_x + col * col_x
+        y = oy + depth * row_y + col * col_y
+        inside = grid.in_bounds((x, y))
+        opaque = not inside or bool(cells[y * width + x] & mask)
+        # open cells need their centre inside the lit sector, that is what makes the result symmetric
+        if inside and depth * depth + col * col <= radius_squared and (
+                opaque or (col * start[1] >= depth * start[0] and col * end[1] <= depth * end[0])):
+            visible.add((x, y))
+        if prev_opaque and not opaque:
+            start = (2 * col - 1, 2 * depth)
+        elif prev_opaque is False and opaque:
+            scan_row(grid, origin, radius, mask, quadrant, depth + 1, start, (2 * col - 1, 2 * depth), visible)
+        prev_opaque = opaque
+    if prev_opaque is False:
+        scan_row(grid, origin, radius, mask, quadrant, depth + 1, start, end, visible)
+
+
+class VisibilityCache:
+    def __init__(self, capacity=256):
+        self.capacity = capacity
+        self.entries = OrderedDict()
+        self.version = None
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, grid, origin, radius, mask=RAY_BLOCKING):
+        # results only hold while the map is unchanged, any solidity edit drops them all
+        if self.version != grid.version:
+            self.entries.clear()
+            self.version = grid.version
+
+        key = (origin, radius, mask)
+        if key in self.entries:
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return self.entries[key]
+
+        self.misses += 1
+        visible = frozenset(shadowcast(grid, origin, radius, mask))
+        self.entries[key] = visible
+        if len(self.entries) > self.capacity:
+            self.entries.popitem(last=False)
+        return visible
+
+    def clear(self):
+        self.entries.clear()
@@ -0,0 +1,165 @@
+from collections import OrderedDict
+
+import pygame
+
+from util.framework.globals import G
+
+
+class TileChunk:
+    __slots__ = ('loc', 'layers', 'dynamic', 'dirty')
+
+    def __init__(self, loc):
+        self.loc = loc
+        self.layers = {}
+        self.dynamic = {}
+        self.dirty = set()
+
+
+class TileChunkCache:
+    def __init__(self, tilemap, chunk_size=8, max_chunks=64, skip_groups=('walk_zone',)):
+        self.tilemap = tilemap
+        self.chunk_size = chunk_size
+        self.max_chunks = max_chunks
+        self.skip_groups = set(skip_groups)
+        self.reset()
+
+    def reset(self):
+        self.chunks = OrderedDict()
+        self.bakes = 0
+
+    def chunk_loc(self, grid_pos):
+        return (grid_pos[0] // self.chunk_size, grid_pos[1] // self.chunk_size)
+
+    def chunk_cells(self, loc):
+        base_x = loc[0] * self.chunk_size
+        base_y = loc[1] * self.chunk_size
+        return [(base_x + x, base_y + y) for y in range(self.chunk_size) for x in range(self.chunk_size)]
+
+    def invalidate(self, grid_pos, layer=None):
+        loc = self.chunk_loc(grid_pos)
+        if loc not in self.chunks:
+            return
+
+        if layer is None:
+            del self.chunks[loc]
+        else:
+            self.chunks[loc].dirty.add(layer)
+
+    def invalidate_rect(self, rect, layer=None):
+        tile_size = self.tilemap.tile_size
+        topleft = self.chunk_loc((rect.x // tile_size[0], rect.y // tile_size[1]))
+        bottomright = self.chunk_loc((rect.right // tile_size[0], rect.bottom // tile_size[1]))
+
+        for y in range(topleft[1], bottomright[1] + 1):
+            for x in range(topleft[0], bottomright[0] + 1):
+                if (x, y) not in self.chunks:
+                    continue
+                if layer is None:
+                    del self.chunks[(x, y)]
+                else:
+                    self.chunks[(x, y)].dirty.add(layer)
+
+    def is_static(self, tile):
+        return tile.group not in G.assets.custom_tile_renderers
+
+    def bake_layer(self, chunk, layer, tiles):
+        static = []
+        dynamic = []
+        for tile in tiles:
+            if tile.group in self.skip_groups:
+                continue
+            if self.is_static(tile):
+                static.append(tile)
+            else:
+                dynamic.append(tile)
+
+        chunk.layers.pop(layer, None)
+        chunk.dynamic.pop(layer, None)
+
+        if dynamic:
+            chunk.dynamic[layer] = dynamic
+
+        if static:
+            bounds = None
+            for tile in static:
+                tile_rect = tile.img.get_rect(topleft=(tile.raw_pos[0] + tile.offset[0],
+                                                       tile.raw_pos[1] + tile.offset[1]))
+                bounds = tile_rect if bounds is None else bounds.union(tile_rect)
+
+            surf = pygame.Surface(bounds.size, pygame.SRCALPHA)
+            surf.blits([(tile.img, (tile.raw_pos[0] + tile.offset[0] - bounds.x,
+                                    tile.raw_pos[1] + tile.offset[1] - bounds.y)) for tile in static], doreturn=False)
+            chunk.layers[layer] = (surf, bounds.topleft)
+
+        self.bakes += 1
+
+    def build(self, loc):
+        chunk = TileChunk(loc)
+        grid_tiles = self.tilemap.grid_tiles
+        layers = {}
+
+        for cell in self.chunk_cells(loc):
+            if cell in grid_tiles:
+                for layer, tile in grid_tiles[cell].items():
+                    if layer not in layers:
+                        layers[layer] = []
+                    layers[layer].append(tile)
+
+        for layer, tiles in layers.items():
+            self.bake_layer(chunk, layer, tiles)
+
+        return chunk
+
+    def rebuild_dirty(self, chunk):
+        grid_tiles = self.tilemap.grid_tiles
+        for layer in chunk.dirty:
+            tiles = []
+            for cell in self.chunk_cells(chunk.loc):
+                if cell in grid_tiles and layer in grid_tiles[cell]:
+                    tiles.append(grid_tiles[cell][layer])
+            self.bake_layer(chunk, layer, tiles)
+        chunk.dirty.clear()
+
+    def get(self, loc):
+        if loc in self.chunks:
+            chunk = self.chunks[loc]
+            self.chunks.move_to_end(loc)
+            if chunk.dirty:
+                self.rebuild_dirty(chunk)
+        else:
+            chunk = self.build(loc)
+            self.chunks[loc] = chunk
+        return chunk
+
+    def visible_chunks(self, rect):
+        tile_size = self.tilemap.tile_size
+        topleft = self.chunk_loc((rect.x // tile_size[0], rect.y // tile_size[1]))
+        bottomright = self.chunk_loc((rect.right // tile_size[0], rect.bottom // tile_size[1]))
+        return [(x, y) for y in range(topleft[1], bottomright[1] + 1)
+                for x in range(topleft[0], bottomright[0] + 1)]
+
+    def evict(self, keep):
+        while len(self.chunks) > self.max_chunks:
+            oldest = next(iter(self.chunks))
+            if oldest in keep:
+                break
+            del self.chunks[oldest]
+
+    def renderz(self, rect, offset=(0, 0), group='default'):
+        visible = self.visible_chunks(rect)
+        baked = []
+
+        for loc in visible:
+            chunk = self.get(loc)
+            for layer, (surf, origin) in chunk.layers.items():
+                baked.append((layer, surf, origin))
+            for tiles in chunk.dynamic.values():
+                for tile in tiles:
+                    tile.render(offset=offset, group=group)
+
+        # chunk images can overhang their neighbours, so keep layers ordered across chunks
+        baked.sort(key=lambda entry: entry[0])
+        for layer, surf, origin in baked:
+            G.render.blit(surf, (origin[0] - offset[0], origin[1] - offset[1]), z=layer, group=group)
+
+        self.evict(set(visible))
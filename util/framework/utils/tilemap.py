@@ -1,9 +1,20 @@
 import pygame, copy
+import numpy as np
 from .. import Component
 from ..utils.io import read_tjson, write_tjson
 from util.framework.core.object.ObjectSectors import Sectors
+from util.framework.core.object.objectBase import WALKABLE_TILES
+from util.framework.utils.tilechunks import TileChunkCache
+from util.framework.utils.mapfile import COMPILED_EXT, CompiledMap, write_compiled
+from util.framework.utils.profiler import profiler
+from util.framework.utils.raycast import (RAY_BLOCKING, RAY_PLATFORM, RAY_SOLID, RAY_UNWALKABLE, SolidGrid,
+                                          VisibilityCache, raycast, raycast_many)
+from util.framework.core.pool import pools
 from .. import G
 
+# only these groups take part in tile physics
+PHYSICS_GROUPS = ('grass', 'bridge', '01')
+
 BORDERS = [(-1, 0), (-1, -1), (0, -1), (1, -1), (1, 0), (1, 1), (0, 1), (-1, 1), (0, 0)]
 
 NON_WALKABLE_TILES = [
@@ -41,6 +52,21 @@ class Tile(Component):
         self.custom_data = custom_data
         self.walkable = True if self.group not in NON_WALKABLE_TILES else False
 
+    def reset(self, group, tile_id=(0, 0), pos=(0, 0), layer=0, custom_data=''):
+        if group != self.group or tuple(tile_id) != tuple(self.tile_id):
+            self.group = group
+            self.render_func = basic_tile_render
+            self.change_id(tile_id)
+            self.flags = set(self.config['flags'] if 'flags' in self.config else ['solid'])
+            self.walkable = True if self.group not in NON_WALKABLE_TILES else False
+        self.grid_pos = tuple(pos)
+        self.raw_pos = tuple(pos)
+        self.layer = layer
+        self.rect.update(*pos, *self.img.get_size())
+        self.map = None
+        self.physics_type = None
+        self.custom_data = custom_data
+
     def render(self, offset=(0, 0), group='default'):
         self.render_func(self, offset=offset, group=group)
 
@@ -49,11 +75,12 @@ class Tile(Component):
                   (self.raw_pos[0] + self.offset[0] - offset[0], self.raw_pos[1] + self.offset[1] - offset[1]))
 
     def shift_clone(self, pos):
-        return Tile(self.group, tile_id=self.tile_id, pos=pos, layer=self.layer)
+        return pools.acquire(Tile, self.group, tile_id=self.tile_id, pos=pos, layer=self.layer)
 
     def change_id(self, tile_id):
         self.tile_id = tile_id
         self.img = G.assets.spritesheets[self.group]['assets'][tile_id]
+        self.region = G.assets.spritesheets[self.group].get('regions', {}).get(tile_id)
         self.config = G.assets.spritesheets[self.group]['config'][tile_id]
         if self.group in G.assets.custom_tile_renderers:
             self.render_func = G.assets.custom_tile_renderers[self.group]
@@ -87,12 +114,18 @@ class Tile(Component):
 
 
 class Tilemap(Component):
-    def __init__(self, tile_size=(16, 16), dimensions=(16, 16)):
+    def __init__(self, tile_size=(16, 16), dimensions=(16, 16), chunk_size=8, max_chunks=64):
         super().__init__()
         self.tile_size = tuple(tile_size)
         self.physics_priority = {'solid': 1.0, 'dropthrough': 0.9, 'rampr': 0.8, 'rampl': 0.7}
         self.dimensions = tuple(dimensions)
         self.demensional_lock = True
+        self.chunk_cache = TileChunkCache(self, chunk_size=chunk_size, max_chunks=max_chunks)
+        self.use_chunk_cache = True
+        self.compiled = None
+        self.compiled_hook = None
+        # callbacks(grid_pos, walkable) on walkability changes, grid_pos is None when the whole grid was rebuilt
+        self.walk_listeners = []
         self.reset()
 
     @property
@@ -104,8 +137,15 @@ class Tilemap(Component):
         self.physics_map = {}
         self.offgrid_tiles = Sectors((self.tile_size[0] + self.tile_size[1]) * 3)
         self.i = 0
+        self.chunk_cache.reset()
+        self.streamed_chunks = set()
+        self.walk_grid = None
+        self.solid_grid = None
+        self.visibility_cache = VisibilityCache()
+        self.notify_walkability(None)
 
-    def save(self, path):
+    def export(self):
+        self.stream_all()
         output = {
             'tile_size': self.tile_size,
             'grid_tiles': {},
@@ -117,7 +157,13 @@ class Tilemap(Component):
             output['grid_tiles'][loc] = {layer: self.grid_tiles[loc][layer].export()
                                          for layer in self.grid_tiles[loc]}
 
-        write_tjson(path, output)
+        return output
+
+    def save(self, path):
+        write_tjson(path, self.export())
+
+    def save_compiled(self, path):
+        return write_compiled(path, self.export())
 
     def in_map(self, gridpos):
         return 0 <= gridpos[0] < self.dimensions[0] and 0 <= gridpos[1] < self.dimensions[1]
@@ -126,6 +172,7 @@ class Tilemap(Component):
         tiles = []
 
         if include_grid:
+            self.stream_all()
             for loc_dict in self.grid_tiles.values():
                 tiles.extend(loc_dict.values())
 
@@ -140,19 +187,34 @@ class Tilemap(Component):
             self.insert(tile, ongrid=ongrid)
 
     def inject(self, tilemap, offset=(0, 0), spawn_hook=lambda tile_data, ongrid: True):
+        tilemap.stream_all()
         for loc in tilemap.grid_tiles:
             for tile in tilemap.grid_tiles[loc].values():
                 tile = tile.shift_clone((tile.grid_pos[0] + offset[0], tile.grid_pos[1] + offset[1]))
                 if spawn_hook(tile.export(), True):
                     self.insert(tile, ongrid=True)
+                else:
+                    pools.release(tile)
 
         for tile in tilemap.offgrid_tiles.objects.values():
             tile = tile.shift_clone(
                 (tile.grid_pos[0] + offset[0] * self.tile_size[0], tile.grid_pos[1] + offset[1] * self.tile_size[1]))
             if spawn_hook(tile.export(), False):
                 self.insert(tile, ongrid=False)
+            else:
+                pools.release(tile)
+
+    def spawn_tile(self, tile_data, ongrid=True):
+        return self.insert(
+            Tile(tile_data['group'], tile_id=tuple(tile_data['tile_id']),
+                 pos=tuple(tile_data['pos']), layer=tile_data['layer'],
+                 custom_data=tile_data.get('c', '')), ongrid=ongrid)
 
     def load(self, path, spawn_hook=lambda tile_data, ongrid: True):
+        if path.endswith(COMPILED_EXT):
+            return self.load_compiled(path, spawn_hook=spawn_hook)
+
+        self.close_compiled()
         data = read_tjson(path)
         self.reset()
         self.tile_size = tuple(data['tile_size'])
@@ -162,24 +224,126 @@ class Tilemap(Component):
             for layer in data['grid_tiles'][loc]:
                 tile_data = data['grid_tiles'][loc][layer]
                 if spawn_hook(tile_data, True):
-                    custom_data = tile_data.get('c', '')
-                    self.insert(
-                        Tile(tile_data['group'], tile_id=tuple(tile_data['tile_id']),
-                             pos=tuple(tile_data['pos']), layer=tile_data['layer'],
-                             custom_data=custom_data))
+                    self.spawn_tile(tile_data)
 
         for tile_data in data['offgrid_tiles']['objects'].values():
             if spawn_hook(tile_data, False):
-                custom_data = tile_data.get('c', '')
-                self.insert(
-                    Tile(tile_data['group'], tile_id=tuple(tile_data['tile_id']),
-                         pos=tuple(tile_data['pos']), layer=tile_data['layer'],
-                         custom_data=custom_data), ongrid=False)
+                self.spawn_tile(tile_data, ongrid=False)
+
+    def load_compiled(self, path, spawn_hook=lambda tile_data, ongrid: True, lazy=True):
+        self.close_compiled()
+        compiled = CompiledMap(path)
+        self.reset()
+        self.tile_size = compiled.tile_size
+        self.dimensions = compiled.dimensions
+
+        for tile_data in compiled.iter_offgrid():
+            if spawn_hook(tile_data, False):
+                self.spawn_tile(tile_data, ongrid=False)
+
+        if lazy:
+            # grid tiles are built chunk by chunk from the mapped file as stream() reaches them, so the spawn
+            # hook runs for a chunk when it first comes into view; stream_all() builds everything up front
+            self.compiled = compiled
+            self.compiled_hook = spawn_hook
+            return
+
+        for tile_data in compiled.iter_grid():
+            if spawn_hook(tile_data, True):
+                self.spawn_tile(tile_data)
+        compiled.close()
+
+    def close_compiled(self):
+        if self.compiled:
+            self.compiled.close()
+            self.compiled = None
+
+    def chunk_area(self, loc):
+        chunk_size = self.chunk_cache.chunk_size
+        return (loc[0] * chunk_size, loc[1] * chunk_size, (loc[0] + 1) * chunk_size, (loc[1] + 1) * chunk_size)
+
+    def stream(self, rect):
+        if not self.compiled:
+            return
+
+        for loc in self.chunk_cache.visible_chunks(rect):
+            self.stream_chunk(loc)
+
+    def stream_chunk(self, loc):
+        if loc in self.streamed_chunks:
+            return
+        self.streamed_chunks.add(loc)
+        area = self.chunk_area(loc)
+        for tile_data in self.compiled.iter_grid(area):
+            if self.compiled_hook(tile_data, True):
+                self.spawn_tile(tile_data)
+
+        # the grids came from the raw cells, the spawn hook may have turned some of them down
+        for y in range(area[1], area[3]):
+            for x in range(area[0], area[2]):
+                self.update_walkability((x, y))
+                self.update_solidity((x, y))
+
+    def stream_cell(self, grid_pos):
+        # anything reading or editing a cell needs its chunk live, or streaming would overwrite the edit later
+        if self.compiled:
+            self.stream_chunk(self.chunk_cache.chunk_loc((int(grid_pos[0]), int(grid_pos[1]))))
+
+    def stream_all(self):
+        if not self.compiled:
+            return
+
+        chunk_size = self.chunk_cache.chunk_size
+        origin, size = self.compiled.origin, self.compiled.grid_size
+        for y in range(origin[1] // chunk_size, (origin[1] + size[1] - 1) // chunk_size + 1):
+            for x in range(origin[0] // chunk_size, (origin[0] + size[0] - 1) // chunk_size + 1):
+                self.stream_chunk((x, y))
+        self.close_compiled()
+
+    def physics_type_of(self, group, tile_id):
+        # what Tile.attach would pick, without building the tile
+        config = G.assets.spritesheets[group]['config'][tile_id]
+        for flag in set(config['flags'] if 'flags' in config else ['solid']):
+            if flag in self.physics_priority:
+                return flag
+        return None
+
+    def compiled_grids(self):
+        # walkability and solidity flags straight from the compiled cells, for chunks that are not streamed yet
+        walk = np.zeros((self.dimensions[1], self.dimensions[0]), dtype=bool)
+        flags = np.zeros((self.dimensions[1], self.dimensions[0]), dtype=np.uint8)
+        window = self.compiled.map_window(self.dimensions)
+        if window:
+            map_slice, cell_slice = window
+            strings = self.compiled.strings
+            walk_ids = [i for i, group in enumerate(strings) if group in WALKABLE_TILES]
+            physics_ids = [i for i, group in enumerate(strings) if group in PHYSICS_GROUPS]
+            for layer_i in range(len(self.compiled.layers)):
+                cells = self.compiled.layer_cells(layer_i)[cell_slice]
+                groups, tile_x, tile_y = cells['group'], cells['tx'], cells['ty']
+                walk[map_slice] |= np.isin(groups, walk_ids)
+                for group_id in physics_ids:
+                    of_group = groups == group_id
+                    for tile_id in set(zip(tile_x[of_group].tolist(), tile_y[of_group].tolist())):
+                        physics_type = self.physics_type_of(strings[group_id], tile_id)
+                        if physics_type:
+                            cell_flag = RAY_SOLID if physics_type == 'solid' else RAY_PLATFORM
+                            hit = of_group & (tile_x == tile_id[0]) & (tile_y == tile_id[1])
+                            flags[map_slice][hit] |= cell_flag
+                del cells, groups, tile_x, tile_y
+        flags[~walk] |= RAY_UNWALKABLE
+        return walk, flags
+
+    def fill_streamed(self, grid, value):
+        for loc in self.streamed_chunks:
+            area = self.chunk_area(loc)
+            grid[max(0, area[1]):max(0, area[3]), max(0, area[0]):max(0, area[2])] = value
 
     def insert(self, tile, ongrid=True):
         tile.attach(self, ongrid=ongrid)
 
         if ongrid:
+            self.stream_cell(tile.grid_pos)
             if self.demensional_lock and not self.in_map(tile.grid_pos):
                 return
 
@@ -187,14 +351,17 @@ class Tilemap(Component):
                 self.grid_tiles[tile.grid_pos] = {}
 
             self.grid_tiles[tile.grid_pos][tile.layer] = tile
+            self.chunk_cache.invalidate(tile.grid_pos, tile.layer)
+            self.update_walkability(tile.grid_pos)
 
-            if tile.group in ('grass', 'bridge', '01') and tile.physics_type:
+            if tile.group in PHYSICS_GROUPS and tile.physics_type:
                 if tile.grid_pos not in self.physics_map:
                     self.physics_map[tile.grid_pos] = []
 
                 self.physics_map[tile.grid_pos].append((self.physics_priority[tile.physics_type], self.i, tile))
                 self.physics_map[tile.grid_pos].sort(reverse=True)
                 self.i += 1
+            self.update_solidity(tile.grid_pos)
         else:
             pos = (tile.raw_pos[0] / self.tile_size[0], tile.raw_pos[1] / self.tile_size[1])
             if self.demensional_lock and not self.in_map(pos):
@@ -208,6 +375,7 @@ class Tilemap(Component):
         if not self.in_map(grid_pos):
             return False
 
+        self.stream_cell(grid_pos)
         if grid_pos not in self.grid_tiles:
             return True
 
@@ -234,6 +402,124 @@ class Tilemap(Component):
                 walkable_positions.append(loc)
         return walkable_positions
 
+    @property
+    def walkability(self):
+        if self.walk_grid is None or self.walk_grid.shape != (self.dimensions[1], self.dimensions[0]):
+            self.refresh_walkability()
+        return self.walk_grid
+
+    def add_walk_listener(self, callback):
+        if callback not in self.walk_listeners:
+            self.walk_listeners.append(callback)
+
+    def remove_walk_listener(self, callback):
+        if callback in self.walk_listeners:
+            self.walk_listeners.remove(callback)
+
+    def notify_walkability(self, grid_pos, walkable=None):
+        for callback in self.walk_listeners[:]:
+            callback(grid_pos, walkable)
+
+    def cell_walkable(self, grid_pos):
+        for tile in self.grid_tiles.get(grid_pos, {}).values():
+            if tile.group in WALKABLE_TILES:
+                return True
+        return False
+
+    def refresh_walkability(self):
+        if self.compiled:
+            # chunks not streamed yet come from the file, streamed ones from their live tiles
+            self.walk_grid = self.compiled_grids()[0]
+            self.fill_streamed(self.walk_grid, False)
+        else:
+            self.walk_grid = np.zeros((self.dimensions[1], self.dimensions[0]), dtype=bool)
+        for loc in self.grid_tiles:
+            if self.in_map(loc) and self.cell_walkable(loc):
+                self.walk_grid[loc[1], loc[0]] = True
+        self.notify_walkability(None)
+
+    def update_walkability(self, grid_pos):
+        if self.walk_grid is None or not self.in_map(grid_pos):
+            return
+        if self.walk_grid.shape != (self.dimensions[1], self.dimensions[0]):
+            self.walk_grid = None
+            self.notify_walkability(None)
+            return
+
+        walkable = self.cell_walkable(grid_pos)
+        if self.walk_grid[grid_pos[1], grid_pos[0]] != walkable:
+            self.walk_grid[grid_pos[1], grid_pos[0]] = walkable
+            self.notify_walkability(grid_pos, walkable)
+
+    def cell_solidity(self, grid_pos):
+        flags = 0 if self.cell_walkable(grid_pos) else RAY_UNWALKABLE
+        for _, _, tile in self.physics_map.get(grid_pos, ()):
+            flags |= RAY_SOLID if tile.physics_type == 'solid' else RAY_PLATFORM
+        return flags
+
+    @property
+    def solidity(self):
+        if self.solid_grid is None or (self.solid_grid.width, self.solid_grid.height) != self.dimensions:
+            self.refresh_solidity()
+        return self.solid_grid
+
+    def refresh_solidity(self):
+        # cells without tiles are outside the walk zone, so they start out blocked
+        self.solid_grid = SolidGrid(self.dimensions[0], self.dimensions[1], fill=RAY_UNWALKABLE)
+        if self.compiled:
+            self.solid_grid.array[:] = self.compiled_grids()[1]
+            self.fill_streamed(self.solid_grid.array, RAY_UNWALKABLE)
+        for loc in set(self.grid_tiles) | set(self.physics_map):
+            if self.in_map(loc):
+                self.solid_grid.set(loc, self.cell_solidity(loc))
+
+    def update_solidity(self, grid_pos):
+        if self.solid_grid is None or not self.in_map(grid_pos):
+            return
+        if (self.solid_grid.width, self.solid_grid.height) != self.dimensions:
+            self.solid_grid = None
+            return
+        self.solid_grid.set(grid_pos, self.cell_solidity(grid_pos))
+
+    def raycast(self, origin, direction, max_dist, mask=RAY_BLOCKING):
+        return raycast(self.solidity, self.tile_size, origin, direction, max_dist, mask=mask)
+
+    def raycast_many(self, origins, directions, max_dist, mask=RAY_BLOCKING):
+        return raycast_many(self.solidity, self.tile_size, origins, directions, max_dist, mask=mask)
+
+    def line_of_sight(self, start, end, mask=RAY_BLOCKING):
+        direction = (end[0] - start[0], end[1] - start[1])
+        distance = (direction[0] ** 2 + direction[1] ** 2) ** 0.5
+        if not distance:
+            return not self.solidity.get(self.world_to_grid(start)) & mask
+        # a hair short, so an end point sitting on a cell boundary does not count the cell beyond it
+        return self.raycast(start, direction, distance - 1e-6, mask=mask) is None
+
+    def field_of_view(self, world_pos, radius, mask=RAY_BLOCKING):
+        return self.visibility_cache.get(self.solidity, self.world_to_grid(world_pos), radius, mask=mask)
+
+    def world_to_grid(self, world_pos):
+        return (int(world_pos[0] // self.tile_size[0]), int(world_pos[1] // self.tile_size[1]))
+
+    def walkable_at(self, world_pos):
+        grid = self.walkability
+        grid_x = int(world_pos[0] // self.tile_size[0])
+        grid_y = int(world_pos[1] // self.tile_size[1])
+        if 0 <= grid_x < grid.shape[1] and 0 <= grid_y < grid.shape[0]:
+            return bool(grid[grid_y, grid_x])
+        return False
+
+    def check_walkable_many(self, positions):
+        grid = self.walkability
+        positions = np.asarray(positions, dtype=np.float64).reshape(-1, 2)
+        grid_x = np.floor_divide(positions[:, 0], self.tile_size[0]).astype(np.intp)
+        grid_y = np.floor_divide(positions[:, 1], self.tile_size[1]).astype(np.intp)
+
+        inside = (grid_x >= 0) & (grid_x < grid.shape[1]) & (grid_y >= 0) & (grid_y < grid.shape[0])
+        result = np.zeros(len(positions), dtype=bool)
+        result[inside] = grid[grid_y[inside], grid_x[inside]]
+        return result
+
     def area_masks(self, rect):
         surfs = {}
         for loc in self.rect_grid_locs(rect):
@@ -248,6 +534,7 @@ class Tilemap(Component):
         return {layer: pygame.mask.from_surface(surfs[layer]) for layer in surfs}
 
     def optimize_area(self, rect, layer=0):
+        self.stream(rect)
         masks = self.area_masks(rect)
         layer_ids = sorted(list(masks))
 
@@ -274,11 +561,14 @@ class Tilemap(Component):
 
     def autotile(self, rect=None, layer=0):
         if rect:
+            # neighbours just outside the rect decide the edge tiles
+            self.stream(rect.inflate(self.tile_size[0] * 2, self.tile_size[1] * 2))
             locs = []
             for loc in self.rect_grid_locs(rect):
                 if loc in self.grid_tiles:
                     locs.append(self.grid_tiles[loc])
         else:
+            self.stream_all()
             locs = list(self.grid_tiles.values())
 
         for loc in locs:
@@ -320,8 +610,9 @@ class Tilemap(Component):
                         if valid:
                             new_type = tile_type
 
-                    if new_type:
+                    if new_type and new_type != tile.tile_id:
                         tile.change_id(new_type)
+                        self.chunk_cache.invalidate(tile.grid_pos, layer)
 
     def floodfill(self, tile):
         check_locs = {tile.grid_pos}
@@ -330,6 +621,7 @@ class Tilemap(Component):
 
         while check_locs and len(fill_locs) <= 2048:
             loc = check_locs.pop()
+            self.stream_cell(loc)
 
             valid = True
             if loc in self.grid_tiles and tile.layer in self.grid_tiles[loc]:
@@ -347,18 +639,35 @@ class Tilemap(Component):
         for loc in fill_locs:
             self.insert(tile.shift_clone(loc))
 
+    def unlink_physics(self, grid_pos, tile):
+        # has to happen before the tile goes back to the pool, a reused tile would otherwise collide elsewhere
+        if grid_pos in self.physics_map:
+            self.physics_map[grid_pos] = [entry for entry in self.physics_map[grid_pos] if entry[2] is not tile]
+            if not self.physics_map[grid_pos]:
+                del self.physics_map[grid_pos]
+
     def grid_delete(self, grid_pos, layer=None):
+        self.stream_cell(grid_pos)
         if grid_pos in self.grid_tiles:
+            self.chunk_cache.invalidate(grid_pos, layer)
             if layer is None:
+                for tile in self.grid_tiles[grid_pos].values():
+                    pools.release(tile)
                 del self.grid_tiles[grid_pos]
                 if grid_pos in self.physics_map:
                     del self.physics_map[grid_pos]
             elif layer in self.grid_tiles[grid_pos]:
+                self.unlink_physics(grid_pos, self.grid_tiles[grid_pos][layer])
+                pools.release(self.grid_tiles[grid_pos][layer])
                 del self.grid_tiles[grid_pos][layer]
                 if not self.grid_tiles[grid_pos]:
                     del self.grid_tiles[grid_pos]
+            self.update_walkability(grid_pos)
+            self.update_solidity(grid_pos)
 
     def rect_delete(self, rect, layer=None):
+        self.stream(rect)
+        self.chunk_cache.invalidate_rect(rect, layer)
         topleft = (rect.x // self.tile_size[0], rect.y // self.tile_size[1])
         bottomright = (rect.right // self.tile_size[0], rect.bottom // self.tile_size[1])
 
@@ -371,29 +680,31 @@ class Tilemap(Component):
                     if tile_r.colliderect(rect):
                         if layer is not None:
                             if layer in self.grid_tiles[grid_pos]:
-                                if grid_pos in self.physics_map:
-                                    for tile in self.physics_map[grid_pos][:]:
-                                        if tile[1] == self.grid_tiles[grid_pos][layer]:
-                                            self.physics_map[grid_pos].remove(tile)
-                                            if not self.physics_map[grid_pos]:
-                                                del self.physics_map[grid_pos]
+                                self.unlink_physics(grid_pos, self.grid_tiles[grid_pos][layer])
+                                pools.release(self.grid_tiles[grid_pos][layer])
                                 del self.grid_tiles[grid_pos][layer]
                                 if not self.grid_tiles[grid_pos]:
                                     del self.grid_tiles[grid_pos]
                         else:
+                            for tile in self.grid_tiles[grid_pos].values():
+                                pools.release(tile)
                             del self.grid_tiles[grid_pos]
                             if grid_pos in self.physics_map:
                                 del self.physics_map[grid_pos]
+                        self.update_walkability(grid_pos)
+                        self.update_solidity(grid_pos)
 
         tiles = self.offgrid_tiles.query(rect)
         if layer is not None:
             for tile in tiles:
                 if tile.layer == layer and tile.rect.colliderect(rect):
                     self.offgrid_tiles.delete(tile)
+                    pools.release(tile)
         else:
             for tile in tiles:
                 if tile.rect.colliderect(rect):
                     self.offgrid_tiles.delete(tile)
+                    pools.release(tile)
 
     def nearby_grid_physics(self, pos):
         grid_pos = (pos[0] // self.tile_size[0], pos[1] // self.tile_size[1])
@@ -401,22 +712,27 @@ class Tilemap(Component):
 
         for border in BORDERS:
             check_pos = (grid_pos[0] + border[0], grid_pos[1] + border[1])
+            self.stream_cell(check_pos)
             if check_pos in self.physics_map:
                 tiles.append(self.physics_map[check_pos][0][2])
 
         return tiles
 
     def gridtile(self, pos):
+        self.stream_cell(pos)
         return self.grid_tiles.get(pos, {})
 
     def physics_ongridtile(self, pos):
+        self.stream_cell(pos)
         return self.physics_map[pos][0][2] if pos in self.physics_map else None
 
     def physics_gridtile(self, pos):
         grid_pos = (pos[0] // self.tile_size[0], pos[1] // self.tile_size[1])
+        self.stream_cell(grid_pos)
         return self.physics_map[grid_pos][0][2] if grid_pos in self.physics_map else None
 
     def count_tiles(self):
+        self.stream_all()
         count = {'grid': 0, 'offgrid': len(self.offgrid_tiles.objects)}
 
         for loc in self.grid_tiles:
@@ -458,7 +774,16 @@ class Tilemap(Component):
 
         return blits
 
+    @profiler.profile('tilemap.renderz')
     def renderz(self, rect, offset=(0, 0), group='default'):
+        self.stream(rect)
+
+        if self.use_chunk_cache:
+            self.chunk_cache.renderz(rect, offset=offset, group=group)
+            for tile in self.offgrid_tiles.query(rect):
+                tile.render(offset=offset, group=group)
+            return
+
         topleft = (rect.x // self.tile_size[0], rect.y // self.tile_size[1])
         bottomright = (rect.right // self.tile_size[0], rect.bottom // self.tile_size[1])
 
@@ -1,16 +1,110 @@
 import yaml
 import os
+import atexit
 import datetime
+import tempfile
+import threading
+import time
 from typing import Any, Dict, List
 import pygame
-from util.framework import G
+from util.framework.globals import G
+
+try:
+    from yaml import CSafeLoader as SafeLoader, CDumper as Dumper
+except ImportError:
+    from yaml import SafeLoader, Dumper
 
 _serializable_registry = {}
 _auto_save_classes = []
+_load_cache = {}
 
 DEFAULT_SAVE_PATH = "data/saves"
 
 
+def _write_yaml_atomic(filepath, data):
+    folder = os.path.dirname(filepath) or '.'
+    os.makedirs(folder, exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(dir=folder, prefix='.' + os.path.basename(filepath), suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'w') as f:
+            yaml.dump(data, f, Dumper=Dumper, default_flow_style=False)
+        os.replace(temp_path, filepath)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+    _load_cache[filepath] = (os.stat(filepath).st_mtime_ns, data)
+
+
+def _read_yaml(filepath):
+    pending = persistence.pending_data(filepath)
+    if pending is not None:
+        return pending
+
+    try:
+        mtime = os.stat(filepath).st_mtime_ns
+    except FileNotFoundError:
+        return None
+
+    cached = _load_cache.get(filepath)
+    if cached and cached[0] == mtime:
+        return cached[1]
+
+    with open(filepath, 'r') as f:
+        data = yaml.load(f, Loader=SafeLoader)
+    _load_cache[filepath] = (mtime, data)
+    return data
+
+
+class YamlPersistence:
+    def __init__(self, delay=0.25):
+        self.delay = delay
+        self.pending = {}
+        self.lock = threading.Lock()
+        self.io_lock = threading.Lock()
+        self.wake = threading.Event()
+        self.thread = None
+        self.writes = 0
+        self.coalesced = 0
+
+    def save(self, filepath, data):
+        with self.lock:
+            if filepath in self.pending:
+                self.coalesced += 1
+            self.pending[filepath] = data
+            if self.thread is None or not self.thread.is_alive():
+                self.thread = threading.Thread(target=self._worker, name='yaml-persistence', daemon=True)
+                self.thread.start()
+        self.wake.set()
+
+    def pending_data(self, filepath):
+        with self.lock:
+            return self.pending.get(filepath)
+
+    def _worker(self):
+        while True:
+            self.wake.wait()
+            self.wake.clear()
+            # give rapid successive saves a moment to land on the same pending entry
+            time.sleep(self.delay)
+            self.flush()
+
+    def flush(self):
+        with self.io_lock:
+            with self.lock:
+                pending, self.pending = self.pending, {}
+            for filepath, data in pending.items():
+                try:
+                    _write_yaml_atomic(filepath, data)
+                    self.writes += 1
+                except Exception as e:
+                    print(f"Could not save {filepath}: {e}")
+
+
+persistence = YamlPersistence()
+atexit.register(persistence.flush)
+
+
 def yaml_serializable(cls=None, *, auto_save=True, folder=None):
     def decorator(cls):
         _serializable_registry[cls.__name__] = cls
@@ -27,9 +121,8 @@ def yaml_serializable(cls=None, *, auto_save=True, folder=None):
 
             try:
                 filepath = os.path.join(save_folder, f"{cls.__name__}.yaml")
-                if os.path.exists(filepath):
-                    with open(filepath, 'r') as f:
-                        data = yaml.safe_load(f)
+                data = _read_yaml(filepath)
+                if data is not None:
                     if data.get('__class__') == cls.__name__:
                         for field, value in data.items():
                             if not field.startswith('__'):
@@ -51,11 +144,17 @@ def yaml_serializable(cls=None, *, auto_save=True, folder=None):
 
         def to_yaml(self, filepath=None):
             if filepath is None:
-                os.makedirs(save_folder, exist_ok=True)
                 filepath = os.path.join(save_folder, f"{self.__class__.__name__}.yaml")
-            os.makedirs(os.path.dirname(filepath), exist_ok=True)
-            with open(filepath, 'w') as f:
-                yaml.dump(self.to_dict(), f, default_flow_style=False)
+            with persistence.lock:
+                persistence.pending.pop(filepath, None)
+            with persistence.io_lock:
+                _write_yaml_atomic(filepath, self.to_dict())
+            return filepath
+
+        def mark_dirty(self, filepath=None):
+            if filepath is None:
+                filepath = os.path.join(save_folder, f"{self.__class__.__name__}.yaml")
+            persistence.save(filepath, self.to_dict())
             return filepath
 
         def from_dict(cls_param, data):
@@ -74,14 +173,14 @@ def yaml_serializable(cls=None, *, auto_save=True, folder=None):
         def from_yaml(cls_param, filepath=None):
             if filepath is None:
                 filepath = os.path.join(save_folder, f"{cls_param.__name__}.yaml")
-            if not os.path.exists(filepath):
+            data = _read_yaml(filepath)
+            if data is None:
                 return cls_param()
-            with open(filepath, 'r') as f:
-                data = yaml.safe_load(f)
             return from_dict(cls_param, data)
 
         cls.to_dict = to_dict
         cls.to_yaml = to_yaml
+        cls.mark_dirty = mark_dirty
         cls.from_dict = classmethod(from_dict)
         cls.from_yaml = classmethod(from_yaml)
         return cls